@@ -5,11 +5,17 @@ from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 from fastapi import FastAPI
 
+from call_journal import CALL_JOURNAL_ENABLED, call_journal
+from db_utils import close_db_pool, get_db_pool_stats, init_db_pool
+from logger import get_logger
 from prompt import System_message
+from telephony_transfer import TRANSFER_STATE, async_client
 from telephony_transfer import router as transfer_router
 
 load_dotenv(override=True)
 
+log = get_logger("app")
+
 
 # === Environment & Configuration ===
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
@@ -17,9 +23,14 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 PORT = int(os.getenv("PORT", 5050))
 TEMPERATURE = float(os.getenv("TEMPERATURE", 0.8))
 VOICE = os.getenv("VOICE", "marin")
+OPENAI_REALTIME_URL = os.getenv(
+    "OPENAI_REALTIME_URL", "wss://api.openai.com/v1/realtime?model=gpt-realtime"
+)
 
 SYSTEM_MESSAGE = System_message
 SHOW_TIMING_MATH = True
+# Forward Realtime audio deltas to Twilio untouched in a pre-serialized frame
+AUDIO_PASSTHROUGH = os.getenv("AUDIO_PASSTHROUGH", "true").lower() != "false"
 LOG_EVENT_TYPES = {
     "error",
     "response.content.done",
@@ -39,39 +50,65 @@ if not OPENAI_API_KEY:
     raise ValueError("Missing the OpenAI API key. Set it in .env or environment.")
 
 if not DATABASE_URL:
-    print("[WARN] DATABASE_URL is not set. Database writes will fail.", flush=True)
+    log.warning("[WARN] DATABASE_URL is not set. Database writes will fail.")
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Handle application lifespan events."""
     # --- Startup ---
-    print("[STARTUP] Initializing Princeton Insurance application...", flush=True)
-    print(f"[STARTUP] Port: {PORT}", flush=True)
-    print(f"[STARTUP] Voice: {VOICE}", flush=True)
-    print(f"[STARTUP] Temperature: {TEMPERATURE}", flush=True)
+    log.info("[STARTUP] Initializing Princeton Insurance application...")
+    log.info("[STARTUP] Port: %s", PORT)
+    log.info("[STARTUP] Voice: %s", VOICE)
+    log.info("[STARTUP] Temperature: %s", TEMPERATURE)
 
-    # Test database connection
+    # Open the shared database pool (also verifies connectivity)
     if DATABASE_URL:
         try:
-            import psycopg2
-
-            conn = psycopg2.connect(DATABASE_URL)
-            with conn.cursor() as cur:
-                cur.execute("SELECT 1")
-            conn.close()
-            print("[STARTUP] Database connection successful", flush=True)
+            await init_db_pool()
+            log.info(
+                "[STARTUP] Database connection successful: %s", get_db_pool_stats()
+            )
         except Exception as e:
-            print(f"[STARTUP] Database connection failed: {e}", flush=True)
+            log.error("[STARTUP] Database connection failed: %s", e)
+
+    # Write-behind journal for call records (replays anything left over)
+    if CALL_JOURNAL_ENABLED:
+        try:
+            await call_journal.start()
+        except OSError as e:
+            log.error("[STARTUP] Call journal unavailable, inserting directly: %s", e)
+
+    # Transfer-state backend (binds the cross-worker wakeup socket for sqlite)
+    await TRANSFER_STATE.start()
+    log.info(
+        "[STARTUP] Transfer state backend: %s", type(TRANSFER_STATE).__name__
+    )
+
+    # Serialize the session config once, then pre-warm Realtime sessions
+    # (imported here: both modules import this one)
+    from realtime_pool import realtime_pool
+    from session_setup import compiled_session_update
+
+    compiled_session_update()
+    await realtime_pool.start()
 
-    print("[STARTUP] Application initialized successfully", flush=True)
+    log.info("[STARTUP] Application initialized successfully")
 
     # Yield to run the app
     yield
 
     # --- Shutdown ---
-    print("[SHUTDOWN] Shutting down Princeton Insurance application...", flush=True)
-    print("[SHUTDOWN] Done", flush=True)
+    log.info("[SHUTDOWN] Shutting down Princeton Insurance application...")
+    await realtime_pool.close()
+    from recording import recording_writer
+
+    recording_writer.stop()  # finish any recordings still being written
+    await call_journal.close()  # last flush needs the DB pool
+    await close_db_pool()
+    await TRANSFER_STATE.close()
+    await async_client.close()
+    log.info("[SHUTDOWN] Done")
 
 
 # Create the FastAPI app
@@ -0,0 +1,263 @@
+# audio_utils.py
+"""μ-law / PCM16 helpers for working on raw call audio.
+
+Twilio and the Realtime API both carry 8 kHz G.711 μ-law. Recording, silence
+detection, gain and resampling need the samples as PCM16 (little-endian
+int16). Every conversion here is table-driven, so nothing runs a per-sample
+Python branch:
+
+- decoding (both backends): ``bytes.translate`` for the low and high byte
+  of each sample, interleaved by extended-slice assignment, all in C. It is
+  as fast as NumPy at one second of audio and faster for single frames
+- NumPy backend: the 65536-entry encode table indexed by the whole frame at
+  once, and array math for RMS, peak and resampling
+- stdlib backend: a single ``map`` over the encode table, and ``array``
+  based loops elsewhere
+
+The backend is NumPy when it is installed, else the stdlib; force one with
+AUDIO_BACKEND=numpy|stdlib. Both give identical results.
+
+``frames`` slices a buffer into fixed-size memoryviews without copying.
+"""
+
+import math
+import operator
+import os
+import sys
+from array import array
+from itertools import chain
+from typing import Iterator, Union
+
+AUDIO_BACKEND = os.getenv("AUDIO_BACKEND", "auto").lower()
+
+SAMPLE_RATE = 8000  # G.711 on both legs of the bridge
+PCM16_FULL_SCALE = 32768
+
+Buffer = Union[bytes, bytearray, memoryview]
+
+_ULAW_BIAS = 0x84
+_ULAW_BIAS_14 = 0x21  # the same bias on the 14-bit scale
+_ULAW_CLIP = 8159
+_LITTLE_ENDIAN = sys.byteorder == "little"
+
+
+# =======================
+# Lookup tables
+# =======================
+def ulaw_magnitude(code: int) -> int:
+    """PCM16 magnitude (0..32124) of a μ-law byte, ignoring sign."""
+    u = ~code & 0xFF
+    exponent = (u >> 4) & 0x07
+    mantissa = u & 0x0F
+    return (((mantissa << 3) + _ULAW_BIAS) << exponent) - _ULAW_BIAS
+
+
+def ulaw_to_linear(code: int) -> int:
+    """PCM16 sample for one μ-law byte (G.711)."""
+    magnitude = ulaw_magnitude(code)
+    return magnitude if code & 0x80 else -magnitude
+
+
+def linear_to_ulaw(sample: int) -> int:
+    """μ-law byte for one PCM16 sample (G.711, same output as Sun's g711.c)."""
+    value = sample >> 2  # 14-bit
+    mask = 0x7F if value < 0 else 0xFF
+    value = min(abs(value), _ULAW_CLIP) + _ULAW_BIAS_14
+    segment = value.bit_length() - 6
+    if segment >= 8:
+        return 0x7F ^ mask
+    segment = max(0, segment)
+    return ((segment << 4) | ((value >> (segment + 1)) & 0x0F)) ^ mask
+
+
+_DECODED = [ulaw_to_linear(b) for b in range(256)]
+# translate tables: low / high byte of each decoded little-endian sample
+_PCM_LO = bytes(s & 0xFF for s in _DECODED)
+_PCM_HI = bytes((s >> 8) & 0xFF for s in _DECODED)
+# translate tables: high / low byte of each sample's magnitude
+ULAW_MAGNITUDE_HI = bytes(abs(s) >> 8 for s in _DECODED)
+ULAW_MAGNITUDE_LO = bytes(abs(s) & 0xFF for s in _DECODED)
+
+
+def _encode_table() -> bytes:
+    """μ-law byte for every PCM16 sample, indexed by (sample & 0xFFFF)."""
+    # linear_to_ulaw only looks at sample >> 2: compute each 14-bit value once
+    quarter = bytes(
+        map(linear_to_ulaw, (v << 2 for v in chain(range(8192), range(-8192, 0))))
+    )
+    table = bytearray(65536)
+    for low_bits in range(4):
+        table[low_bits::4] = quarter
+    return bytes(table)
+
+
+_ENCODE = _encode_table()
+
+
+def dbfs(level: float) -> float:
+    """Level (RMS or peak, PCM16 scale) in dB relative to full scale."""
+    return 20 * math.log10(level / PCM16_FULL_SCALE) if level > 0 else -math.inf
+
+
+def frames(
+    buf: Buffer, frame_bytes: int, partial: bool = False
+) -> Iterator[memoryview]:
+    """Consecutive `frame_bytes` slices of `buf` as zero-copy memoryviews."""
+    view = memoryview(buf)
+    end = len(view) if partial else len(view) - len(view) % frame_bytes
+    for start in range(0, end, frame_bytes):
+        yield view[start : start + frame_bytes]
+
+
+def _upsample_factor(from_rate: int, to_rate: int) -> int:
+    if to_rate % from_rate or to_rate < from_rate:
+        raise ValueError(
+            f"can only upsample by an integer factor: {from_rate}->{to_rate}"
+        )
+    return to_rate // from_rate
+
+
+# =======================
+# Backends
+# =======================
+class _StdlibAudio:
+    name = "stdlib"
+
+    @staticmethod
+    def _samples(pcm: Buffer) -> array:
+        samples = array("h")
+        samples.frombytes(pcm)
+        if not _LITTLE_ENDIAN:
+            samples.byteswap()
+        return samples
+
+    @staticmethod
+    def _to_bytes(samples: array) -> bytes:
+        if not _LITTLE_ENDIAN:
+            samples.byteswap()
+        return samples.tobytes()
+
+    def ulaw_to_pcm16(self, ulaw: Buffer) -> bytes:
+        ulaw = bytes(ulaw)
+        out = bytearray(2 * len(ulaw))
+        out[0::2] = ulaw.translate(_PCM_LO)
+        out[1::2] = ulaw.translate(_PCM_HI)
+        return bytes(out)
+
+    def pcm16_to_ulaw(self, pcm: Buffer) -> bytes:
+        view = memoryview(pcm)
+        if _LITTLE_ENDIAN:
+            return bytes(map(_ENCODE.__getitem__, view.cast("B").cast("H")))
+        samples = self._samples(view)
+        return bytes(_ENCODE[s & 0xFFFF] for s in samples)
+
+    def rms(self, pcm: Buffer) -> float:
+        samples = self._samples(pcm)
+        if not samples:
+            return 0.0
+        return math.sqrt(sum(map(operator.mul, samples, samples)) / len(samples))
+
+    def peak(self, pcm: Buffer) -> int:
+        samples = self._samples(pcm)
+        if not samples:
+            return 0
+        return max(max(samples), -min(samples))
+
+    def upsample(self, pcm: Buffer, from_rate: int, to_rate: int) -> bytes:
+        factor = _upsample_factor(from_rate, to_rate)
+        samples = self._samples(pcm)
+        if factor == 1 or not samples:
+            return self._to_bytes(samples)
+        following = samples[1:] + samples[-1:]  # hold the last sample
+        out = array("h", bytes(2 * len(samples) * factor))
+        out[0::factor] = samples
+        for step in range(1, factor):
+            out[step::factor] = array(
+                "h",
+                [a + (b - a) * step // factor for a, b in zip(samples, following)],
+            )
+        return self._to_bytes(out)
+
+
+class _NumpyAudio(_StdlibAudio):
+    """Array versions where they win; decoding stays on bytes.translate."""
+
+    name = "numpy"
+
+    def __init__(self):
+        import numpy as np
+
+        self.np = np
+        self._encode = np.frombuffer(_ENCODE, dtype=np.uint8)
+
+    def _samples(self, pcm: Buffer):
+        return self.np.frombuffer(pcm, dtype="<i2")
+
+    def pcm16_to_ulaw(self, pcm: Buffer) -> bytes:
+        return self._encode[self.np.frombuffer(pcm, dtype="<u2")].tobytes()
+
+    def rms(self, pcm: Buffer) -> float:
+        samples = self._samples(pcm).astype(self.np.float64)
+        if not samples.size:
+            return 0.0
+        return math.sqrt(float(samples @ samples) / samples.size)
+
+    def peak(self, pcm: Buffer) -> int:
+        samples = self._samples(pcm)
+        if not samples.size:
+            return 0
+        return max(int(samples.max()), -int(samples.min()))
+
+    def upsample(self, pcm: Buffer, from_rate: int, to_rate: int) -> bytes:
+        np = self.np
+        factor = _upsample_factor(from_rate, to_rate)
+        samples = self._samples(pcm).astype(np.int32)
+        if factor == 1 or not samples.size:
+            return samples.astype("<i2").tobytes()
+        following = np.append(samples[1:], samples[-1])  # hold the last sample
+        out = np.empty(samples.size * factor, dtype=np.int32)
+        out[0::factor] = samples
+        for step in range(1, factor):
+            out[step::factor] = samples + (following - samples) * step // factor
+        return out.astype("<i2").tobytes()
+
+
+def backend(name: str = AUDIO_BACKEND):
+    """A backend instance: 'numpy', 'stdlib', or 'auto' (NumPy if installed)."""
+    if name == "stdlib":
+        return _StdlibAudio()
+    if name == "numpy":
+        return _NumpyAudio()
+    try:
+        return _NumpyAudio()
+    except ImportError:
+        return _StdlibAudio()
+
+
+_backend = backend()
+BACKEND_NAME: str = _backend.name
+
+
+def ulaw_to_pcm16(ulaw: Buffer) -> bytes:
+    """Decode μ-law bytes to little-endian PCM16."""
+    return _backend.ulaw_to_pcm16(ulaw)
+
+
+def pcm16_to_ulaw(pcm: Buffer) -> bytes:
+    """Encode little-endian PCM16 to μ-law bytes."""
+    return _backend.pcm16_to_ulaw(pcm)
+
+
+def rms(pcm: Buffer) -> float:
+    """Root-mean-square level of PCM16 audio (0 for empty input)."""
+    return _backend.rms(pcm)
+
+
+def peak(pcm: Buffer) -> int:
+    """Largest absolute PCM16 sample (0 for empty input)."""
+    return _backend.peak(pcm)
+
+
+def upsample(pcm: Buffer, from_rate: int = SAMPLE_RATE, to_rate: int = 16000) -> bytes:
+    """Linear-interpolation upsampling of PCM16 by an integer factor."""
+    return _backend.upsample(pcm, from_rate, to_rate)
@@ -0,0 +1,71 @@
+"""Per-frame CPU cost of forwarding a Realtime audio delta to Twilio.
+
+Compares the old path (base64 decode + re-encode, build a dict, serialize it
+the way Starlette's send_json does) with the pre-templated passthrough frame.
+
+    python benchmarks/bench_audio_passthrough.py
+"""
+
+import base64
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from twilio_frames import TwilioFrames  # noqa: E402
+
+STREAM_SID = "MZ" + "0" * 32
+FRAME_SIZES_MS = (20, 100, 200)  # μ-law 8 kHz: 8 bytes per ms
+
+
+def legacy(delta: str) -> str:
+    audio_payload = base64.b64encode(base64.b64decode(delta)).decode("utf-8")
+    payload = {
+        "event": "media",
+        "streamSid": STREAM_SID,
+        "media": {"payload": audio_payload},
+    }
+    # starlette.websockets.WebSocket.send_json
+    return json.dumps(payload, separators=(",", ":"), ensure_ascii=False)
+
+
+def legacy_frame_case():
+    delta = base64.b64encode(os.urandom(20 * 8)).decode()
+    return lambda: legacy(delta)
+
+
+def passthrough_frame_case():
+    delta = base64.b64encode(os.urandom(20 * 8)).decode()
+    frames = TwilioFrames(STREAM_SID)
+    return lambda: frames.media(delta)
+
+
+# 20 ms frames, for the suite runner (benchmarks/run.py)
+CASES = {
+    "audio_delta.legacy_frame": legacy_frame_case,
+    "audio_delta.passthrough_frame": passthrough_frame_case,
+}
+
+
+def main(number: int = 50_000) -> None:
+    frames = TwilioFrames(STREAM_SID)
+    print(f"{'frame':>8} {'legacy us':>10} {'passthrough us':>15} {'saved us':>9}")
+    for ms in FRAME_SIZES_MS:
+        delta = base64.b64encode(os.urandom(ms * 8)).decode()
+        assert json.loads(legacy(delta)) == json.loads(frames.media(delta))
+
+        t_legacy = min(timeit.repeat(lambda: legacy(delta), number=number, repeat=5))
+        t_pass = min(
+            timeit.repeat(lambda: frames.media(delta), number=number, repeat=5)
+        )
+        us_legacy = t_legacy / number * 1e6
+        us_pass = t_pass / number * 1e6
+        print(
+            f"{ms:>6}ms {us_legacy:>10.2f} {us_pass:>15.2f} {us_legacy - us_pass:>9.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""audio_utils vs naive per-sample Python.
+
+Each operation is timed three ways: a straightforward per-sample Python
+loop, the stdlib backend, and the NumPy backend (if NumPy is installed).
+Times are for a 20 ms Twilio frame and for one second of audio.
+
+    python benchmarks/bench_audio_utils.py
+"""
+
+import os
+import struct
+import sys
+import timeit
+from typing import Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import audio_utils  # noqa: E402
+from audio_utils import linear_to_ulaw, ulaw_to_linear  # noqa: E402
+
+FRAME_BYTES = 160  # 20 ms of 8 kHz μ-law
+SIZES = {"20ms": FRAME_BYTES, "1s": 50 * FRAME_BYTES}
+
+
+# =======================
+# Naive per-sample versions
+# =======================
+def naive_ulaw_to_pcm16(ulaw: bytes) -> bytes:
+    out = bytearray()
+    for code in ulaw:
+        out += struct.pack("<h", ulaw_to_linear(code))
+    return bytes(out)
+
+
+def naive_pcm16_to_ulaw(pcm: bytes) -> bytes:
+    return bytes(linear_to_ulaw(s) for (s,) in struct.iter_unpack("<h", pcm))
+
+
+def naive_rms(pcm: bytes) -> float:
+    total = 0
+    count = 0
+    for (s,) in struct.iter_unpack("<h", pcm):
+        total += s * s
+        count += 1
+    return (total / count) ** 0.5 if count else 0.0
+
+
+def naive_peak(pcm: bytes) -> int:
+    best = 0
+    for (s,) in struct.iter_unpack("<h", pcm):
+        best = max(best, abs(s))
+    return best
+
+
+def naive_upsample_24k(pcm: bytes) -> bytes:
+    samples = [s for (s,) in struct.iter_unpack("<h", pcm)]
+    out: List[int] = []
+    for i, a in enumerate(samples):
+        b = samples[i + 1] if i + 1 < len(samples) else a
+        for step in range(3):
+            out.append(a + (b - a) * step // 3)
+    return struct.pack(f"<{len(out)}h", *out)
+
+
+def naive_frames(ulaw: bytes) -> List[bytes]:
+    return [ulaw[i : i + FRAME_BYTES] for i in range(0, len(ulaw), FRAME_BYTES)]
+
+
+def _inputs(n_bytes: int):
+    ulaw = os.urandom(n_bytes)
+    return ulaw, audio_utils.ulaw_to_pcm16(ulaw)
+
+
+def operations(impl) -> Dict[str, Callable]:
+    """name -> function(ulaw, pcm) for one implementation (None = naive)."""
+    if impl is None:
+        return {
+            "ulaw_to_pcm16": lambda u, p: naive_ulaw_to_pcm16(u),
+            "pcm16_to_ulaw": lambda u, p: naive_pcm16_to_ulaw(p),
+            "rms": lambda u, p: naive_rms(p),
+            "peak": lambda u, p: naive_peak(p),
+            "upsample_24k": lambda u, p: naive_upsample_24k(p),
+            "frames": lambda u, p: naive_frames(u),
+        }
+    return {
+        "ulaw_to_pcm16": lambda u, p: impl.ulaw_to_pcm16(u),
+        "pcm16_to_ulaw": lambda u, p: impl.pcm16_to_ulaw(p),
+        "rms": lambda u, p: impl.rms(p),
+        "peak": lambda u, p: impl.peak(p),
+        "upsample_24k": lambda u, p: impl.upsample(p, 8000, 24000),
+        "frames": lambda u, p: list(audio_utils.frames(u, FRAME_BYTES)),
+    }
+
+
+def _case(name: str):
+    def setup():
+        ulaw, pcm = _inputs(FRAME_BYTES)
+        fn = operations(audio_utils.backend())[name]
+        return lambda: fn(ulaw, pcm)
+
+    return setup
+
+
+# One 20 ms frame with the active backend, for the suite runner (run.py)
+CASES = {
+    f"audio_utils.{name}": _case(name)
+    for name in ("ulaw_to_pcm16", "pcm16_to_ulaw", "rms", "upsample_24k")
+}
+
+
+def main() -> None:
+    impls = {"naive": None, "stdlib": audio_utils.backend("stdlib")}
+    try:
+        impls["numpy"] = audio_utils.backend("numpy")
+    except ImportError:
+        print("NumPy not installed; skipping the numpy backend\n")
+
+    header = "".join(f"{name + ' us':>12}" for name in impls)
+    print(f"{'operation':<15} {'size':>5}{header} {'best speedup':>13}")
+    for op in operations(None):
+        for label, n_bytes in SIZES.items():
+            ulaw, pcm = _inputs(n_bytes)
+            timings = {}
+            for name, impl in impls.items():
+                fn = operations(impl)[op]
+                timer = timeit.Timer(lambda: fn(ulaw, pcm))
+                number, _ = timer.autorange()
+                best = min(timer.repeat(repeat=5, number=number)) / number
+                timings[name] = best * 1e6
+            cols = "".join(f"{timings[name]:>12.2f}" for name in impls)
+            fastest = min(v for k, v in timings.items() if k != "naive")
+            print(f"{op:<15} {label:>5}{cols} {timings['naive'] / fastest:>12.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""Per-frame operations of the Twilio <-> Realtime bridge.
+
+Each case is a setup function returning a zero-argument callable that does
+one unit of hot-path work the way websocket.py does it. Run them through
+the suite runner to compare against the stored baseline:
+
+    python benchmarks/run.py
+"""
+
+import base64
+import os
+import sys
+from typing import Callable, Dict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from codec import (  # noqa: E402
+    encode_audio_append,
+    loads,
+    parse_audio_delta,
+    parse_twilio_media,
+)
+from frame_queue import FrameQueue  # noqa: E402
+from interruption import InterruptionEngine  # noqa: E402
+from metrics import CallLatency  # noqa: E402
+from playback import PlaybackTracker  # noqa: E402
+
+STREAM_SID = "MZ" + "0" * 32
+ITEM_ID = "item_CSpsBXUTVhhFoa3s"
+
+# One 20 ms inbound Twilio frame, as Twilio serializes it
+TWILIO_PAYLOAD = base64.b64encode(b"\xff" * 160).decode()
+TWILIO_MEDIA = (
+    '{"event":"media","sequenceNumber":"812","media":{"track":"inbound",'
+    '"chunk":"811","timestamp":"16220","payload":"' + TWILIO_PAYLOAD + '"},'
+    '"streamSid":"' + STREAM_SID + '"}'
+)
+
+# One 100 ms outbound Realtime audio delta
+DELTA = base64.b64encode(os.urandom(800)).decode()
+AUDIO_DELTA = (
+    '{"type":"response.output_audio.delta","event_id":"event_CSpsC0nJ0z1AI",'
+    '"response_id":"resp_CSpsBnTxwFyNl","item_id":"' + ITEM_ID + '",'
+    '"output_index":0,"content_index":0,"delta":"' + DELTA + '"}'
+)
+
+ARG_DELTAS = [c for c in '{"caller_phone":"+14155551234","task_type":"Policy"}']
+
+
+def twilio_media_loads() -> Callable[[], object]:
+    return lambda: loads(TWILIO_MEDIA)
+
+
+def twilio_media_fast_path() -> Callable[[], object]:
+    # string slicing; websocket.py only uses it when FAST_FRAME_PARSING is set
+    return lambda: parse_twilio_media(TWILIO_MEDIA)
+
+
+def twilio_media_append_frame() -> Callable[[], object]:
+    return lambda: encode_audio_append(TWILIO_PAYLOAD)
+
+
+def audio_delta_loads() -> Callable[[], object]:
+    return lambda: loads(AUDIO_DELTA)
+
+
+def audio_delta_fast_path() -> Callable[[], object]:
+    return lambda: parse_audio_delta(AUDIO_DELTA)
+
+
+def playback_mark_bookkeeping() -> Callable[[], object]:
+    """begin_audio + audio_sent per delta, with Twilio acking every mark."""
+    tracker = PlaybackTracker()
+
+    def run():
+        tracker.begin_audio(ITEM_ID)
+        mark = tracker.audio_sent(DELTA)
+        if mark is not None:
+            tracker.on_mark(mark)
+
+    return run
+
+
+def function_args_accumulate() -> Callable[[], object]:
+    """Accumulate one tool call's streamed arguments, one character per delta."""
+    buffers: Dict[str, str] = {}
+
+    def run():
+        for delta in ARG_DELTAS:
+            buffers["call_1"] = buffers.get("call_1", "") + delta
+        return buffers.pop("call_1")
+
+    return run
+
+
+def interruption_timing_math() -> Callable[[], object]:
+    """Per-delta item tracking plus the truncate offset computed on barge-in."""
+    playback = PlaybackTracker()
+    engine = InterruptionEngine(None, None, playback)
+    playback.begin_audio(ITEM_ID)
+    playback.audio_sent(DELTA)
+    ts = [0]
+
+    def run():
+        ts[0] += 20
+        engine.on_assistant_audio(ITEM_ID, ts[0])
+        return engine.audio_end_ms(ts[0])
+
+    return run
+
+
+def frame_queue_put_full() -> Callable[[], object]:
+    """put_audio on a full queue: the drop-oldest path under a stalled writer."""
+    queue = FrameQueue("bench", max_audio_frames=250)
+    for _ in range(250):
+        queue.put_audio(AUDIO_DELTA)
+    return lambda: queue.put_audio(AUDIO_DELTA)
+
+
+def call_latency_steady_state() -> Callable[[], object]:
+    """CallLatency.on_output_audio once greeted and with no turn pending."""
+    latency = CallLatency()
+    latency.on_output_audio()
+    return latency.on_output_audio
+
+
+CASES = {
+    "twilio_media.loads": twilio_media_loads,
+    "twilio_media.fast_path": twilio_media_fast_path,
+    "twilio_media.append_frame": twilio_media_append_frame,
+    "audio_delta.loads": audio_delta_loads,
+    "audio_delta.fast_path": audio_delta_fast_path,
+    "playback.mark_bookkeeping": playback_mark_bookkeeping,
+    "function_args.accumulate": function_args_accumulate,
+    "interruption.timing_math": interruption_timing_math,
+    "frame_queue.put_full": frame_queue_put_full,
+    "metrics.call_latency": call_latency_steady_state,
+}
@@ -0,0 +1,127 @@
+"""Caller audio: one append per Twilio frame vs coalesced or gated appends.
+
+For each ``INBOUND_COALESCE_MS`` setting, with and without local silence
+suppression (``INBOUND_VAD_ENABLED``), it pushes a typical stretch of a call
+through ``FrameCoalescer``: the caller talks for 3 s, then listens for 7 s.
+It reports:
+
+- appends and audio bytes per second sent to the Realtime API
+- CPU per second of audio. This counts the coalescer, the masked WebSocket
+  framing of each append, and the socket write. It leaves out the asyncio
+  wake-ups per message, which only make coalescing look better.
+- the worst-case delay added to audio in the middle of speech or silence
+- the delay added at the edges of a turn (speech onset and the silence that
+  ends it). It should stay at 0
+
+    python benchmarks/bench_inbound_coalescing.py
+"""
+
+import base64
+import os
+import socket
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from websockets.frames import Frame, Opcode  # noqa: E402
+
+from inbound_audio import TWILIO_FRAME_MS, FrameCoalescer  # noqa: E402
+
+# (INBOUND_COALESCE_MS, INBOUND_VAD_ENABLED)
+SETTINGS = [(ms, False) for ms in (20, 40, 60, 80, 100)] + [(20, True), (80, True)]
+FRAMES_PER_SEC = 1000 // TWILIO_FRAME_MS
+END_OF_TURN_MS = 500  # server VAD silence_duration_ms
+
+# Near-silent line noise, and speech well above the onset level
+QUIET = base64.b64encode(bytes([0xFE, 0x7E]) * 80).decode()
+SPEECH = base64.b64encode(bytes([0x20, 0xA0, 0x30, 0xB0]) * 40).decode()
+CALL_SECONDS = 10
+CALL = [SPEECH] * (3 * FRAMES_PER_SEC) + [QUIET] * (7 * FRAMES_PER_SEC)
+
+
+def stream(coalescer: FrameCoalescer, sock: socket.socket, sink: socket.socket):
+    def drain():
+        while True:
+            try:
+                sink.recv(1 << 20)
+            except BlockingIOError:
+                return
+
+    def run():
+        for i, payload in enumerate(CALL):
+            frame = coalescer.push(payload)
+            if frame is not None:
+                # what the websockets client does with each message
+                data = Frame(Opcode.TEXT, frame.encode()).serialize(
+                    mask=True, extensions=[]
+                )
+                sock.sendall(data)
+            if i % FRAMES_PER_SEC == 0:
+                drain()  # stand-in for the peer, once per second of audio
+        drain()
+
+    return run
+
+
+def turn_edge_delay_ms(coalesce_ms: int, suppress: bool) -> int:
+    """Audio held back at speech onset or in the silence that ends the turn."""
+    coalescer = FrameCoalescer(coalesce_ms, suppress_silence=suppress)
+    for _ in range(FRAMES_PER_SEC // 2 + 1):
+        coalescer.push(QUIET)
+    held = 0 if coalescer.push(SPEECH) is not None else TWILIO_FRAME_MS
+    for _ in range(END_OF_TURN_MS // TWILIO_FRAME_MS):
+        if coalescer.push(QUIET) is None:
+            held = TWILIO_FRAME_MS
+    return held
+
+
+def off_case():
+    coalescer = FrameCoalescer(TWILIO_FRAME_MS, suppress_silence=False)
+    return lambda: coalescer.push(QUIET)
+
+
+def coalesce_80ms_case():
+    coalescer = FrameCoalescer(80, suppress_silence=False)
+    return lambda: coalescer.push(QUIET)
+
+
+def vad_suppressed_case():
+    """A silent frame once the turn has ended: held back, not sent."""
+    coalescer = FrameCoalescer(80, suppress_silence=True)
+    return lambda: coalescer.push(QUIET)
+
+
+# Per Twilio frame, for the suite runner (benchmarks/run.py)
+CASES = {
+    "inbound.append_per_frame": off_case,
+    "inbound.coalesce_80ms": coalesce_80ms_case,
+    "inbound.vad_suppressed": vad_suppressed_case,
+}
+
+
+def main(number: int = 50) -> None:
+    sock, sink = socket.socketpair()
+    sink.setblocking(False)
+    print(
+        f"{'coalesce':>8} {'vad':>4} {'appends/s':>10} {'bytes/s':>8} "
+        f"{'cpu us/s':>9} {'mid delay':>10} {'edge delay':>11}"
+    )
+    for ms, suppress in SETTINGS:
+        coalescer = FrameCoalescer(ms, suppress_silence=suppress)
+        sent = sum(len(f) for f in map(coalescer.push, CALL) if f is not None)
+        appends = coalescer.appends_out
+
+        coalescer = FrameCoalescer(ms, suppress_silence=suppress)
+        run = stream(coalescer, sock, sink)
+        best = min(timeit.repeat(run, number=number, repeat=7))
+        print(
+            f"{ms:>6}ms {'on' if suppress else 'off':>4} "
+            f"{appends / CALL_SECONDS:>10.1f} {sent / CALL_SECONDS:>8.0f} "
+            f"{best / number / CALL_SECONDS * 1e6:>9.1f} "
+            f"{ms - TWILIO_FRAME_MS:>8}ms {turn_edge_delay_ms(ms, suppress):>9}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
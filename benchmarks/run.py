@@ -0,0 +1,164 @@
+"""Bridge hot-path micro-benchmark suite with a stored baseline.
+
+Collects the ``CASES`` of every benchmark module, times each one (best of
+several ``timeit`` repeats, in ns per operation) and compares the results
+with ``benchmarks/baseline.json``. Exits 1 if any case is slower than its
+baseline by more than ``--threshold``, so it can gate hot-path changes.
+
+    python benchmarks/run.py                 # compare with the baseline
+    python benchmarks/run.py --save          # record a new baseline
+    python benchmarks/run.py -k playback     # only cases matching a substring
+
+Timings depend on the machine and interpreter. Record the baseline on the
+machine you compare on, e.g. ``--save`` on the main branch and then run
+again on your branch.
+
+Baselines are kept per backend combination (JSON codec + audio backend),
+since orjson or NumPy change the numbers far more than any code change.
+A run only compares against the baseline for its own backends, and skips
+the comparison when there isn't one.
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import timeit
+from typing import Callable, Dict
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+import bench_audio_passthrough  # noqa: E402
+import bench_audio_utils  # noqa: E402
+import bench_hotpath  # noqa: E402
+import bench_inbound_coalescing  # noqa: E402
+from audio_utils import BACKEND_NAME as AUDIO_BACKEND  # noqa: E402
+from codec import CODEC_NAME  # noqa: E402
+
+BENCH_MODULES = (
+    bench_hotpath,
+    bench_audio_passthrough,
+    bench_inbound_coalescing,
+    bench_audio_utils,
+)
+BASELINE_PATH = os.path.join(HERE, "baseline.json")
+DEFAULT_THRESHOLD = 0.25  # 25% slower than baseline counts as a regression
+RECHECKS = 2  # re-measure an apparent regression before reporting it (noise)
+
+
+def collect_cases() -> Dict[str, Callable[[], Callable[[], object]]]:
+    cases: Dict[str, Callable[[], Callable[[], object]]] = {}
+    for module in BENCH_MODULES:
+        cases.update(module.CASES)
+    return dict(sorted(cases.items()))
+
+
+def measure(setup: Callable[[], Callable[[], object]], repeat: int = 7) -> float:
+    """Best-of-`repeat` time for one call, in nanoseconds."""
+    fn = setup()
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()  # enough calls for >= 0.2 s per repeat
+    return min(timer.repeat(repeat=repeat, number=number)) / number * 1e9
+
+
+def machine_info() -> Dict[str, str]:
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "system": platform.system(),
+        "json_codec": CODEC_NAME,
+        "audio_backend": AUDIO_BACKEND,
+    }
+
+
+def backend_key(machine: Dict[str, str]) -> str:
+    return f"json={machine.get('json_codec')},audio={machine.get('audio_backend')}"
+
+
+def load_baselines() -> Dict[str, Dict]:
+    """backend key -> {"machine": ..., "results": ...}."""
+    if not os.path.exists(BASELINE_PATH):
+        return {}
+    with open(BASELINE_PATH) as f:
+        data = json.load(f)
+    if "results" in data:  # single-baseline file from before backend keys
+        return {backend_key(data.get("machine", {})): data}
+    return data.get("baselines", {})
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--save", action="store_true", help="write a new baseline")
+    parser.add_argument("-k", "--filter", default="", help="substring of case names")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help="allowed slowdown vs baseline as a fraction (default 0.25)",
+    )
+    parser.add_argument("--repeat", type=int, default=7)
+    args = parser.parse_args(argv)
+
+    cases = {k: v for k, v in collect_cases().items() if args.filter in k}
+    machine = machine_info()
+    key = backend_key(machine)
+    baselines = load_baselines()
+    baseline = baselines.get(key, {})
+    base_results = baseline.get("results", {})
+    if not args.save:
+        if not baseline:
+            recorded = ", ".join(sorted(baselines)) or "none"
+            print(
+                f"note: no baseline for {key} (recorded: {recorded}); "
+                "timing only. Record one with --save\n"
+            )
+        elif baseline.get("machine") != machine:
+            print(
+                f"note: baseline was recorded on {baseline.get('machine')}, "
+                f"this is {machine}; comparisons may be meaningless\n"
+            )
+
+    print(f"{'case':<32} {'ns/op':>10} {'baseline':>10} {'change':>8}")
+    results: Dict[str, float] = {}
+    regressions = []
+    for name, setup in cases.items():
+        ns = results[name] = measure(setup, args.repeat)
+        base = base_results.get(name)
+        if base is None or args.save:
+            print(f"{name:<32} {ns:>10.1f} {'-':>10} {'':>8}")
+            continue
+        for _ in range(RECHECKS):
+            if ns / base - 1 <= args.threshold:
+                break
+            ns = results[name] = min(ns, measure(setup, args.repeat))
+        change = ns / base - 1
+        flag = ""
+        if change > args.threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print(f"{name:<32} {ns:>10.1f} {base:>10.1f} {change:>+7.1%}{flag}")
+
+    if args.save:
+        rounded = {k: round(v, 1) for k, v in results.items()}
+        merged = {**base_results, **rounded} if args.filter else rounded
+        baselines[key] = {"machine": machine, "results": merged}
+        with open(BASELINE_PATH, "w") as f:
+            json.dump({"baselines": dict(sorted(baselines.items()))}, f, indent=2)
+            f.write("\n")
+        print(f"\n{key} baseline written to {os.path.relpath(BASELINE_PATH)}")
+        return 0
+
+    if regressions:
+        print(
+            f"\n{len(regressions)} case(s) more than {args.threshold:.0%} slower "
+            f"than baseline: {', '.join(regressions)}"
+        )
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
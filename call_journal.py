@@ -0,0 +1,345 @@
+# call_journal.py
+"""Write-behind persistence for call records.
+
+``record_call_data`` used to wait for a Postgres round trip before Sally
+could go on, and lost the record if the database was down. Now the record
+is appended to a local journal file and fsynced, and the tool returns at
+once. A background task inserts queued records into post_call_analysis in
+batches (one multi-row INSERT per batch) and retries with backoff while
+the database is unavailable.
+
+Each worker claims its own journal file, ``CALL_JOURNAL_DIR/calls-<n>.jsonl``,
+and holds an flock on it. On startup the worker replays what is still in its
+file and adopts files left behind by workers that are gone. A journal is
+truncated once everything in it has been inserted. Every record carries a
+``journal_id`` with a unique index, so a record replayed after a crash
+between INSERT and truncate is not inserted twice. Records also carry the
+time they were journaled, which becomes the row's ``created_at``.
+"""
+
+import asyncio
+import datetime
+import fcntl
+import glob
+import os
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import count, islice
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+from codec import dumps, loads
+from db_utils import _insert_call_records, insert_call_record, run_db
+from logger import get_logger
+from metrics import (
+    JOURNAL_DEPTH,
+    JOURNAL_FLUSH_SECONDS,
+    JOURNAL_FLUSHED,
+    counter,
+    gauge,
+    observe,
+)
+from response_cache import admin_cache
+
+log = get_logger("journal")
+
+CALL_JOURNAL_ENABLED = os.getenv("CALL_JOURNAL_ENABLED", "true").lower() == "true"
+CALL_JOURNAL_DIR = os.getenv("CALL_JOURNAL_DIR", "journal")
+CALL_JOURNAL_BATCH_SIZE = int(os.getenv("CALL_JOURNAL_BATCH_SIZE", 100))
+CALL_JOURNAL_FLUSH_MS = int(os.getenv("CALL_JOURNAL_FLUSH_MS", 250))
+# Retry delay while the database is down doubles up to this
+CALL_JOURNAL_MAX_BACKOFF_SEC = 30.0
+
+_fsync = getattr(os, "fdatasync", os.fsync)
+
+
+class CallJournal:
+    """Append-only local journal plus the batch flusher that drains it."""
+
+    def __init__(
+        self,
+        directory: str = CALL_JOURNAL_DIR,
+        batch_size: int = CALL_JOURNAL_BATCH_SIZE,
+        flush_ms: int = CALL_JOURNAL_FLUSH_MS,
+    ):
+        self.directory = directory
+        self.batch_size = max(1, batch_size)
+        self.flush_sec = flush_ms / 1000
+        self.path: Optional[str] = None
+
+        self._fd: Optional[int] = None
+        # one thread: appends, fsyncs and truncates run strictly in order
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="call-journal"
+        )
+        self._queue: Deque[Dict[str, Any]] = deque()  # journaled, not inserted
+        self._writes_in_flight = 0
+        self._flush_lock = asyncio.Lock()
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+        self._backoff = 0.0
+
+        # stats
+        self._appended = 0
+        self._flushed = 0
+        self._replayed = 0
+        self._flush_failures = 0
+        self._last_flush_ms = 0.0
+        self._last_error: Optional[str] = None
+
+    # ---------- lifecycle ----------
+    @property
+    def is_open(self) -> bool:
+        return self._fd is not None
+
+    async def start(self) -> None:
+        """Claim a journal file, replay what's left in it, start the flusher."""
+        records = await self._in_executor(self._open)
+        self._closing = False
+        self._queue.extend(records)
+        self._replayed = len(records)
+        self._update_depth()
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+        log.info(
+            "[JOURNAL] Using %s (%d records to replay)", self.path, len(records)
+        )
+        if records:
+            self._wake.set()
+
+    async def close(self) -> None:
+        """Stop the flusher, try one last flush, and release the journal."""
+        # on 3.11 wait_for swallows a cancel that races a wakeup, so the
+        # flusher also checks this flag before waiting again
+        self._closing = True
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        if self._queue:
+            await self.flush()
+        if self._queue:
+            log.warning(
+                "[JOURNAL] %d records left in %s for the next start",
+                len(self._queue),
+                self.path,
+            )
+        if self._fd is not None:
+            await self._in_executor(self._close_fd)
+        self._executor.shutdown(wait=False)
+
+    # ---------- write path (event loop) ----------
+    async def append(self, record: Dict[str, Any]) -> str:
+        """Durably journal one record and queue it for insertion."""
+        if self._fd is None:
+            raise RuntimeError("Call journal is not open")
+        record = {"journal_id": str(uuid.uuid4()), **record}
+        line = (dumps(record) + "\n").encode()
+        self._writes_in_flight += 1
+        try:
+            await self._in_executor(self._write, line)
+        finally:
+            self._writes_in_flight -= 1
+        self._queue.append(record)
+        self._appended += 1
+        self._update_depth()
+        if len(self._queue) >= self.batch_size and not self._backoff:
+            self._wake.set()
+        return record["journal_id"]
+
+    # ---------- flusher ----------
+    async def _run(self) -> None:
+        while not self._closing:
+            try:
+                await asyncio.wait_for(
+                    self._wake.wait(), self._backoff or self.flush_sec
+                )
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            if self._closing or not self._queue:
+                continue
+            if await self.flush():
+                self._backoff = 0.0
+            else:
+                self._backoff = min(
+                    max(2 * self._backoff, 1.0), CALL_JOURNAL_MAX_BACKOFF_SEC
+                )
+
+    async def flush(self) -> bool:
+        """Insert queued records batch by batch. True once the queue is empty."""
+        async with self._flush_lock:
+            while self._queue:
+                batch = list(islice(self._queue, self.batch_size))
+                started = time.monotonic()
+                try:
+                    await run_db(_insert_call_records, batch)
+                except Exception as e:
+                    self._flush_failures += 1
+                    self._last_error = str(e)
+                    log.error(
+                        "[JOURNAL] Flush of %d records failed: %s", len(batch), e
+                    )
+                    return False
+                elapsed = time.monotonic() - started
+                observe(JOURNAL_FLUSH_SECONDS, elapsed)
+                counter(JOURNAL_FLUSHED).inc(len(batch))
+                self._last_flush_ms = round(elapsed * 1000, 3)
+                self._flushed += len(batch)
+                for _ in batch:
+                    self._queue.popleft()
+                admin_cache.invalidate()
+                self._update_depth()
+                log.info(
+                    "[JOURNAL] Inserted %d records in %.1f ms",
+                    len(batch),
+                    elapsed * 1000,
+                )
+            # records still being written aren't in the queue yet: keep them
+            if self._fd is not None and not self._writes_in_flight:
+                await self._in_executor(self._truncate)
+            return True
+
+    # ---------- stats ----------
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.is_open,
+            "path": self.path,
+            "queue_depth": len(self._queue),
+            "appended": self._appended,
+            "flushed": self._flushed,
+            "replayed": self._replayed,
+            "flush_failures": self._flush_failures,
+            "last_flush_ms": self._last_flush_ms,
+            "retry_in_sec": self._backoff,
+            "last_error": self._last_error,
+        }
+
+    def _update_depth(self) -> None:
+        gauge(JOURNAL_DEPTH).set(len(self._queue))
+
+    # ---------- file I/O (journal thread) ----------
+    async def _in_executor(self, fn: Callable[..., Any], *args) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, fn, *args)
+
+    def _open(self) -> List[Dict[str, Any]]:
+        os.makedirs(self.directory, exist_ok=True)
+        for n in count():
+            path = os.path.join(self.directory, f"calls-{n}.jsonl")
+            fd = _lock(path)
+            if fd is not None:
+                break
+        self.path, self._fd = path, fd
+        records = _read_journal(fd, path)
+
+        # adopt journals whose worker is gone (nobody holds their lock)
+        pattern = os.path.join(self.directory, "calls-*.jsonl")
+        for other in sorted(glob.glob(pattern)):
+            if other == path:
+                continue
+            other_fd = _lock(other)
+            if other_fd is None:
+                continue
+            try:
+                orphaned = _read_journal(other_fd, other)
+                if orphaned:
+                    self._write(
+                        b"".join((dumps(r) + "\n").encode() for r in orphaned)
+                    )
+                    os.ftruncate(other_fd, 0)
+                    _fsync(other_fd)
+                    records.extend(orphaned)
+                    log.info(
+                        "[JOURNAL] Adopted %d records from %s", len(orphaned), other
+                    )
+            finally:
+                os.close(other_fd)
+        return records
+
+    def _write(self, data: bytes) -> None:
+        view = memoryview(data)
+        while view:
+            written = os.write(self._fd, view)
+            view = view[written:]
+        _fsync(self._fd)
+
+    def _truncate(self) -> None:
+        if os.fstat(self._fd).st_size:
+            os.ftruncate(self._fd, 0)
+            _fsync(self._fd)
+
+    def _close_fd(self) -> None:
+        fd, self._fd = self._fd, None
+        os.close(fd)  # also releases the flock
+
+
+def _lock(path: str) -> Optional[int]:
+    """Open and exclusively lock a journal file; None if another worker holds it."""
+    fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o600)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        os.close(fd)
+        return None
+    return fd
+
+
+def _read_journal(fd: int, path: str) -> List[Dict[str, Any]]:
+    """Records in a journal file. A torn last line (crash mid-append) is cut off."""
+    with open(path, "rb") as f:
+        data = f.read()
+    complete = data.rfind(b"\n") + 1
+    if complete != len(data):
+        log.warning("[JOURNAL] Dropping a partial record at the end of %s", path)
+        os.ftruncate(fd, complete)
+    records = []
+    for line in data[:complete].splitlines():
+        if not line.strip():
+            continue
+        try:
+            records.append(loads(line))
+        except Exception as e:
+            log.error("[JOURNAL] Skipping unreadable record in %s: %s", path, e)
+    return records
+
+
+call_journal = CallJournal()
+
+
+async def save_call_record(
+    caller_phone, task_type, call_summary, detail_info, recording_path=None
+) -> Dict[str, Any]:
+    """Journal a call record for write-behind insertion.
+
+    Falls back to a direct insert when the journal is disabled or can't be
+    written.
+    """
+    if CALL_JOURNAL_ENABLED and call_journal.is_open:
+        now = datetime.datetime.now().astimezone()
+        try:
+            journal_id = await call_journal.append(
+                {
+                    "caller_phone": caller_phone,
+                    "call_date": now.date().isoformat(),
+                    "call_time": now.time().isoformat(),
+                    "task_type": task_type,
+                    "call_summary": call_summary,
+                    "detail_info": detail_info,
+                    "recording_path": recording_path,
+                    # inserted explicitly: a flush after an outage is much later
+                    "created_at": now.isoformat(),
+                }
+            )
+            log.info("[JOURNAL] Queued call record %s", journal_id)
+            return {"ok": True, "queued": True, "journal_id": journal_id}
+        except (OSError, RuntimeError) as e:
+            log.error("[JOURNAL] Append failed, inserting directly: %s", e)
+    return await insert_call_record(
+        caller_phone, task_type, call_summary, detail_info, recording_path
+    )
@@ -0,0 +1,142 @@
+# codec.py
+"""JSON codec for the Twilio <-> OpenAI bridge.
+
+``loads``/``dumps`` use the fastest backend available (orjson, then msgspec,
+then the stdlib); force one with JSON_CODEC=orjson|msgspec|json. ``dumps``
+always returns ``str`` because both sockets expect text frames.
+
+The high-rate frames (Twilio ``media`` and Realtime
+``response.output_audio.delta``) also have fast paths that slice the few
+fields we need straight out of the raw text without building any dicts.
+They return None for anything unexpected, and callers then fall back to
+``loads``. orjson/msgspec parse a whole frame faster than Python can slice
+it, so callers should only try them when ``FAST_FRAME_PARSING`` is set.
+"""
+
+import json
+import os
+from typing import Any, Callable, NamedTuple, Optional
+
+JSON_CODEC = os.getenv("JSON_CODEC", "auto").lower()
+
+
+def _stdlib_codec():
+    dumps_ = json.JSONEncoder(separators=(",", ":"), ensure_ascii=False).encode
+    return "json", json.loads, dumps_
+
+
+def _orjson_codec():
+    import orjson
+
+    def dumps_(obj: Any) -> str:
+        return orjson.dumps(obj).decode()
+
+    return "orjson", orjson.loads, dumps_
+
+
+def _msgspec_codec():
+    import msgspec
+
+    encode = msgspec.json.Encoder().encode
+
+    def dumps_(obj: Any) -> str:
+        return encode(obj).decode()
+
+    return "msgspec", msgspec.json.Decoder().decode, dumps_
+
+
+_BACKENDS = {"orjson": _orjson_codec, "msgspec": _msgspec_codec, "json": _stdlib_codec}
+
+
+def _select_codec(name: str):
+    if name != "auto":
+        return _BACKENDS[name]()
+    for candidate in ("orjson", "msgspec"):
+        try:
+            return _BACKENDS[candidate]()
+        except ImportError:
+            continue
+    return _stdlib_codec()
+
+
+CODEC_NAME: str
+loads: Callable[[Any], Any]
+dumps: Callable[[Any], str]
+CODEC_NAME, loads, dumps = _select_codec(JSON_CODEC)
+
+
+# =======================
+# Fast paths
+# =======================
+AUDIO_DELTA_EVENT = "response.output_audio.delta"
+
+_AUDIO_DELTA_PREFIX = '{"type":"' + AUDIO_DELTA_EVENT + '"'
+_TWILIO_MEDIA_PREFIX = '{"event":"media"'
+_APPEND_PREFIX = '{"type":"input_audio_buffer.append","audio":"'
+
+
+# Precomputed: building the markers per call cost as much as the search
+_DELTA_MARKER = '"delta":"'
+_ITEM_ID_MARKER = '"item_id":"'
+_MEDIA_MARKER = '"media":{'
+_TIMESTAMP_MARKER = '"timestamp":"'
+_PAYLOAD_MARKER = '"payload":"'
+
+# String slicing only beats loads() on the stdlib backend
+FAST_FRAME_PARSING = CODEC_NAME == "json"
+
+
+def _string_field(message: str, marker: str, start: int = 0) -> Optional[str]:
+    """Value after the first ``marker`` (``"key":"``) at or after start (no escapes)."""
+    i = message.find(marker, start)
+    if i < 0:
+        return None
+    i += len(marker)
+    j = message.find('"', i)
+    if j < 0:
+        return None
+    value = message[i:j]
+    return None if "\\" in value else value
+
+
+class AudioDelta(NamedTuple):
+    item_id: Optional[str]
+    delta: str
+
+
+class TwilioMedia(NamedTuple):
+    timestamp: int
+    payload: str
+
+
+# NamedTuple.__new__ runs Python code; tuple.__new__ builds the same object in C
+_new_tuple = tuple.__new__
+
+
+def parse_audio_delta(message: str) -> Optional[AudioDelta]:
+    """Fast path for Realtime `response.output_audio.delta` frames."""
+    if not message.startswith(_AUDIO_DELTA_PREFIX):
+        return None
+    delta = _string_field(message, _DELTA_MARKER)
+    if delta is None:
+        return None
+    return _new_tuple(AudioDelta, (_string_field(message, _ITEM_ID_MARKER), delta))
+
+
+def parse_twilio_media(message: str) -> Optional[TwilioMedia]:
+    """Fast path for Twilio `media` frames: only the timestamp and payload."""
+    if not message.startswith(_TWILIO_MEDIA_PREFIX):
+        return None
+    media_at = message.find(_MEDIA_MARKER)
+    if media_at < 0:
+        return None
+    timestamp = _string_field(message, _TIMESTAMP_MARKER, media_at)
+    payload = _string_field(message, _PAYLOAD_MARKER, media_at)
+    if timestamp is None or payload is None or not timestamp.isdigit():
+        return None
+    return _new_tuple(TwilioMedia, (int(timestamp), payload))
+
+
+def encode_audio_append(payload_b64: str) -> str:
+    """`input_audio_buffer.append` frame around an already base64 μ-law payload."""
+    return _APPEND_PREFIX + payload_b64 + '"}'
@@ -1,102 +1,486 @@
 # db_utils.py
 """Shared database utilities for Princeton Insurance."""
 
+import asyncio
 import datetime
 import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Sequence
 
 import psycopg2
+import psycopg2.extras
+import psycopg2.pool
 from dotenv import load_dotenv
 
+from logger import get_logger
+from metrics import DB_INSERT_SECONDS, observe
+from response_cache import admin_cache
+
 load_dotenv(override=True)
 
+log = get_logger("db")
+
+# === Pool configuration ===
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", 1))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", 10))
+DB_POOL_ACQUIRE_TIMEOUT = float(os.getenv("DB_POOL_ACQUIRE_TIMEOUT", 5))
+# Connections idle for longer than this are pinged with SELECT 1 before reuse.
+DB_POOL_HEALTH_CHECK_INTERVAL = float(os.getenv("DB_POOL_HEALTH_CHECK_INTERVAL", 30))
+# Rows fetched per round trip by stream_query (server-side cursors)
+DB_STREAM_CHUNK_ROWS = int(os.getenv("DB_STREAM_CHUNK_ROWS", 1000))
+
 
 def get_db_connection():
-    """Get database connection."""
+    """Get a standalone (unpooled) database connection, for scripts and tooling."""
     try:
         database_url = os.getenv("DATABASE_URL")
         if not database_url:
             raise ValueError("DATABASE_URL environment variable is not set")
         return psycopg2.connect(database_url)
     except Exception as e:
-        print(f"Error connecting to database: {e}")
+        log.error("Error connecting to database: %s", e)
         return None
 
 
-def insert_call_record(caller_phone, task_type, call_summary, detail_info):
-    """Insert a call record into the database."""
-    conn = get_db_connection()
-    if not conn:
-        return {"ok": False, "error": "Database connection failed"}
+# =======================
+# Async connection pool
+# =======================
+class PooledConnection:
+    """A psycopg2 connection checked out of the pool for one async caller.
 
-    try:
-        now = datetime.datetime.now()
-        with conn.cursor() as cur:
-            cur.execute(
-                """
-                INSERT INTO post_call_analysis 
-                (caller_phone, call_date, call_time, task_type, call_summary, detail_info)
-                VALUES (%s, %s, %s, %s, %s, %s)
-                RETURNING id
-            """,
-                (
-                    caller_phone,
-                    now.date(),
-                    now.time(),
-                    task_type,
-                    call_summary,
-                    detail_info,
-                ),
+    All work on the connection runs in the pool's thread executor, so the
+    event loop never blocks on Postgres.
+    """
+
+    def __init__(self, pool: "AsyncDBPool", conn):
+        self._pool = pool
+        self.raw = conn
+
+    async def run(self, fn: Callable[..., Any], *args) -> Any:
+        """Run ``fn(conn, *args)`` in the DB executor and return its result."""
+        return await self._pool._in_executor(fn, self.raw, *args)
+
+
+class AsyncDBPool:
+    """Bounded psycopg2 pool with an asyncio front end.
+
+    - at most ``max_size`` connections; callers wait up to ``acquire_timeout``
+    - connections idle longer than ``health_check_interval`` are validated
+      (SELECT 1) on checkout and replaced if broken
+    - every blocking call runs on a dedicated thread executor
+    """
+
+    def __init__(
+        self,
+        dsn: str,
+        min_size: int = DB_POOL_MIN_SIZE,
+        max_size: int = DB_POOL_MAX_SIZE,
+        acquire_timeout: float = DB_POOL_ACQUIRE_TIMEOUT,
+        health_check_interval: float = DB_POOL_HEALTH_CHECK_INTERVAL,
+    ):
+        self.dsn = dsn
+        self.min_size = max(0, min_size)
+        self.max_size = max(1, max_size, self.min_size)
+        self.acquire_timeout = acquire_timeout
+        self.health_check_interval = health_check_interval
+
+        self._pool: Optional[psycopg2.pool.ThreadedConnectionPool] = None
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_size, thread_name_prefix="db-pool"
+        )
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._last_used: Dict[int, float] = {}
+        self._lock = threading.Lock()
+
+        # stats
+        self._in_use = 0
+        self._waiting = 0
+        self._acquired_total = 0
+        self._acquire_timeouts = 0
+        self._health_check_failures = 0
+        self._acquire_wait_total = 0.0
+
+    # ---------- lifecycle ----------
+    async def open(self) -> None:
+        self._slots = asyncio.Semaphore(self.max_size)
+        self._pool = await self._in_executor(
+            psycopg2.pool.ThreadedConnectionPool,
+            self.min_size,
+            self.max_size,
+            self.dsn,
+        )
+
+    async def close(self) -> None:
+        pool, self._pool = self._pool, None
+        if pool is not None:
+            await self._in_executor(pool.closeall)
+        self._executor.shutdown(wait=False)
+
+    @property
+    def is_open(self) -> bool:
+        return self._pool is not None
+
+    # ---------- checkout ----------
+    async def _in_executor(self, fn: Callable[..., Any], *args) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, fn, *args)
+
+    def _checkout(self):
+        """Blocking: take a connection from psycopg2's pool and make sure it's alive.
+
+        A connection that fails the health check is discarded and the next one
+        is checked the same way. After a database restart every idle connection
+        may be dead, so this tries one more than the pool can hold, which ends
+        on a freshly opened connection.
+        """
+        attempts = self.max_size + 1
+        for _ in range(attempts):
+            conn = self._pool.getconn()
+            with self._lock:
+                last_used = self._last_used.get(id(conn), 0.0)
+            if not conn.closed and (
+                time.monotonic() - last_used <= self.health_check_interval
+            ):
+                return conn
+            try:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT 1")
+                conn.rollback()
+                return conn
+            except Exception:
+                with self._lock:
+                    self._health_check_failures += 1
+                    self._last_used.pop(id(conn), None)
+                self._pool.putconn(conn, close=True)
+        raise psycopg2.OperationalError(
+            f"No healthy DB connection after {attempts} attempts"
+        )
+
+    def _checkin(self, conn) -> None:
+        """Blocking: return a connection, discarding it if it was left broken."""
+        broken = bool(conn.closed)
+        if not broken:
+            try:
+                conn.rollback()
+            except Exception:
+                broken = True
+        with self._lock:
+            if broken:
+                self._last_used.pop(id(conn), None)
+            else:
+                self._last_used[id(conn)] = time.monotonic()
+        if self._pool is not None:
+            self._pool.putconn(conn, close=broken)
+        else:
+            conn.close()
+
+    @asynccontextmanager
+    async def connection(self):
+        """Check out a connection for the duration of the ``async with`` block."""
+        if not self.is_open:
+            raise RuntimeError("Database pool is not initialized")
+
+        started = time.monotonic()
+        self._waiting += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.acquire_timeout)
+        except asyncio.TimeoutError:
+            self._acquire_timeouts += 1
+            raise TimeoutError(
+                f"Timed out after {self.acquire_timeout}s waiting for a DB connection"
             )
+        finally:
+            self._waiting -= 1
+
+        # Shielded: if we're cancelled, the thread still finishes getconn(),
+        # and _abandon_checkout puts that connection back
+        checkout = asyncio.get_running_loop().run_in_executor(
+            self._executor, self._checkout
+        )
+        try:
+            conn = await asyncio.shield(checkout)
+        except BaseException:
+            checkout.add_done_callback(self._abandon_checkout)
+            raise
+
+        self._in_use += 1
+        self._acquired_total += 1
+        self._acquire_wait_total += time.monotonic() - started
+        try:
+            yield PooledConnection(self, conn)
+        finally:
+            self._in_use -= 1
+            try:
+                await self._in_executor(self._checkin, conn)
+            finally:
+                self._slots.release()
+
+    def _abandon_checkout(self, checkout: asyncio.Future) -> None:
+        """Return the connection of a checkout whose caller went away, then its slot."""
+        if checkout.cancelled() or checkout.exception() is not None:
+            self._slots.release()
+            return
+        conn = checkout.result()
+        loop = asyncio.get_running_loop()
+        try:
+            checkin = self._executor.submit(self._checkin, conn)
+        except RuntimeError:  # executor already shut down by close()
+            conn.close()
+            self._slots.release()
+            return
+        checkin.add_done_callback(
+            lambda _: loop.call_soon_threadsafe(self._slots.release)
+        )
+
+    async def run(self, fn: Callable[..., Any], *args) -> Any:
+        """Check out a connection, run ``fn(conn, *args)`` off-loop, and release it."""
+        async with self.connection() as conn:
+            return await conn.run(fn, *args)
+
+    # ---------- stats ----------
+    def stats(self) -> Dict[str, Any]:
+        opened = len(self._pool._pool) + len(self._pool._used) if self._pool else 0
+        return {
+            "min_size": self.min_size,
+            "max_size": self.max_size,
+            "open_connections": opened,
+            "in_use": self._in_use,
+            "waiting": self._waiting,
+            "acquired_total": self._acquired_total,
+            "acquire_timeouts": self._acquire_timeouts,
+            "health_check_failures": self._health_check_failures,
+            "avg_acquire_wait_ms": round(
+                1000 * self._acquire_wait_total / self._acquired_total, 3
+            )
+            if self._acquired_total
+            else 0.0,
+        }
+
+
+db_pool: Optional[AsyncDBPool] = None
+
+
+async def init_db_pool() -> Optional[AsyncDBPool]:
+    """Create the shared pool and verify it with a round trip. Called from lifespan."""
+    global db_pool
+    database_url = os.getenv("DATABASE_URL")
+    if not database_url:
+        log.warning("[DB] DATABASE_URL is not set; database pool disabled")
+        return None
+
+    pool = AsyncDBPool(database_url)
+    await pool.open()
+    await pool.run(_ping)
+    db_pool = pool
+    log.info(
+        "[DB] Connection pool ready (min=%d, max=%d)", pool.min_size, pool.max_size
+    )
+    return pool
 
-            record_id = cur.fetchone()[0]
-            conn.commit()
-            print(f"[DB] Inserted call record ID: {record_id}", flush=True)
-            return {"ok": True, "id": record_id}
+
+async def close_db_pool() -> None:
+    global db_pool
+    pool, db_pool = db_pool, None
+    if pool is not None:
+        await pool.close()
+        log.info("[DB] Connection pool closed")
+
+
+async def run_db(fn: Callable[..., Any], *args) -> Any:
+    """Run ``fn(conn, *args)`` on a pooled connection without blocking the loop."""
+    if db_pool is None:
+        raise RuntimeError("Database connection failed")
+    return await db_pool.run(fn, *args)
+
+
+async def stream_query(
+    query: str, params: Sequence[Any] = (), chunk_rows: int = DB_STREAM_CHUNK_ROWS
+) -> AsyncIterator[List[tuple]]:
+    """Yield the rows of ``query`` in chunks from a server-side cursor.
+
+    Only one chunk is in memory at a time. The pooled connection is held until
+    the iteration finishes or the generator is closed.
+    """
+    if db_pool is None:
+        raise RuntimeError("Database connection failed")
+    async with db_pool.connection() as conn:
+        cur = await conn.run(_open_named_cursor, query, params, chunk_rows)
+        try:
+            while True:
+                rows = await conn.run(_fetch_chunk, cur, chunk_rows)
+                if not rows:
+                    return
+                yield rows
+        finally:
+            await conn.run(_close_cursor, cur)
+
+
+def _open_named_cursor(conn, query, params, chunk_rows):
+    cur = conn.cursor(name=f"stream_{uuid.uuid4().hex}")
+    cur.itersize = chunk_rows
+    cur.execute(query, params)
+    return cur
+
+
+def _fetch_chunk(conn, cur, chunk_rows):
+    return cur.fetchmany(chunk_rows)
+
+
+def _close_cursor(conn, cur):
+    if not cur.closed and not conn.closed:
+        cur.close()
+
+
+def get_db_pool_stats() -> Dict[str, Any]:
+    if db_pool is None:
+        return {"enabled": False}
+    return {"enabled": True, **db_pool.stats()}
+
+
+def _ping(conn):
+    with conn.cursor() as cur:
+        cur.execute("SELECT 1")
+
+
+# =======================
+# Call records
+# =======================
+def row_to_record(row) -> Dict[str, Any]:
+    return {
+        "id": row[0],
+        "caller_phone": row[1],
+        "call_date": str(row[2]) if row[2] else None,
+        "call_time": str(row[3]) if row[3] else None,
+        "task_type": row[4],
+        "call_summary": row[5],
+        "detail_info": row[6],
+        "created_at": str(row[7]) if row[7] else None,
+    }
+
+
+def _insert_call_record(
+    conn, caller_phone, task_type, call_summary, detail_info, recording_path=None
+):
+    now = datetime.datetime.now()
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            INSERT INTO post_call_analysis
+            (caller_phone, call_date, call_time, task_type, call_summary,
+             detail_info, recording_path)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+            RETURNING id
+        """,
+            (
+                caller_phone,
+                now.date(),
+                now.time(),
+                task_type,
+                call_summary,
+                detail_info,
+                recording_path,
+            ),
+        )
+        record_id = cur.fetchone()[0]
+    conn.commit()
+    return record_id
+
+
+def _insert_call_records(conn, records):
+    """One multi-row INSERT for a batch of journaled records (see call_journal).
+
+    Records whose journal_id is already in the table are skipped, so replaying
+    a journal never duplicates rows. created_at is the time the call was
+    journaled, not the time of the flush.
+    """
+    rows = [
+        (
+            r["caller_phone"],
+            r["call_date"],
+            r["call_time"],
+            r["task_type"],
+            r["call_summary"],
+            r["detail_info"],
+            r.get("recording_path"),
+            r["journal_id"],
+            r.get("created_at") or _journaled_at(r),
+        )
+        for r in records
+    ]
+    with conn.cursor() as cur:
+        psycopg2.extras.execute_values(
+            cur,
+            """
+            INSERT INTO post_call_analysis
+            (caller_phone, call_date, call_time, task_type, call_summary,
+             detail_info, recording_path, journal_id, created_at)
+            VALUES %s
+            ON CONFLICT (journal_id) DO NOTHING
+        """,
+            rows,
+            # an offset is ignored by a plain TIMESTAMP cast; go via timestamptz
+            template="(%s, %s, %s, %s, %s, %s, %s, %s, %s::timestamptz)",
+            page_size=len(rows),
+        )
+        inserted = cur.rowcount
+    conn.commit()
+    return inserted
+
+
+def _journaled_at(record):
+    """created_at for records journaled before it was stored: the local call time."""
+    local = datetime.datetime.fromisoformat(
+        f"{record['call_date']}T{record['call_time']}"
+    )
+    return local.astimezone().isoformat()
+
+
+def _select_call_records(conn, limit):
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT id, caller_phone, call_date, call_time, task_type,
+                   call_summary, detail_info, created_at
+            FROM post_call_analysis
+            ORDER BY created_at DESC
+            LIMIT %s
+        """,
+            (limit,),
+        )
+        return [row_to_record(row) for row in cur.fetchall()]
+
+
+async def insert_call_record(
+    caller_phone, task_type, call_summary, detail_info, recording_path=None
+):
+    """Insert a call record into the database."""
+    started = time.monotonic()
+    try:
+        record_id = await run_db(
+            _insert_call_record,
+            caller_phone,
+            task_type,
+            call_summary,
+            detail_info,
+            recording_path,
+        )
+        observe(DB_INSERT_SECONDS, time.monotonic() - started)
+        admin_cache.invalidate()
+        log.info("[DB] Inserted call record ID: %s", record_id)
+        return {"ok": True, "id": record_id}
     except Exception as e:
-        conn.rollback()
-        print(f"[DB] Error inserting record: {e}", flush=True)
+        log.error("[DB] Error inserting record: %s", e)
         return {"ok": False, "error": str(e)}
-    finally:
-        conn.close()
 
 
-def get_call_records(limit=10):
+async def get_call_records(limit=10):
     """Get recent call records from the database."""
-    conn = get_db_connection()
-    if not conn:
-        return {"ok": False, "error": "Database connection failed"}
-
     try:
-        with conn.cursor() as cur:
-            cur.execute(
-                """
-                SELECT id, caller_phone, call_date, call_time, task_type, 
-                       call_summary, detail_info, created_at
-                FROM post_call_analysis
-                ORDER BY created_at DESC
-                LIMIT %s
-            """,
-                (limit,),
-            )
-
-            rows = cur.fetchall()
-            records = []
-            for row in rows:
-                records.append(
-                    {
-                        "id": row[0],
-                        "caller_phone": row[1],
-                        "call_date": str(row[2]) if row[2] else None,
-                        "call_time": str(row[3]) if row[3] else None,
-                        "task_type": row[4],
-                        "call_summary": row[5],
-                        "detail_info": row[6],
-                        "created_at": str(row[7]) if row[7] else None,
-                    }
-                )
-
-            return {"ok": True, "records": records, "count": len(records)}
+        records = await run_db(_select_call_records, limit)
+        return {"ok": True, "records": records, "count": len(records)}
     except Exception as e:
         return {"ok": False, "error": str(e)}
-    finally:
-        conn.close()
@@ -0,0 +1,137 @@
+# frame_queue.py
+"""Bounded frame queues between the bridge's socket readers and writers.
+
+Each direction of the bridge is a producer (socket reader) and a consumer
+(socket writer) joined by a ``FrameQueue``, so a stalled socket can only
+ever hold ``max_audio_frames`` audio frames for a call instead of growing
+without bound.
+
+Drop policy:
+- audio frames are droppable: when the queue is full the *oldest* queued
+  audio frame is dropped, keeping playback close to real time
+- control frames (marks, clear) are never dropped
+- ``purge()`` discards everything queued, e.g. Sally's audio after a barge-in
+
+Producers never block, so the Realtime reader always gets to
+``speech_started`` promptly even while Twilio is slow.
+"""
+
+import asyncio
+import os
+from collections import deque
+from typing import Deque, Optional, Tuple
+
+from metrics import (
+    QUEUE_DEPTH,
+    QUEUE_DROPPED,
+    QUEUE_PEAK_DEPTH,
+    counter,
+    gauge,
+    observe,
+)
+
+# 250 frames = 5 s of 20 ms audio
+BRIDGE_QUEUE_MAX_FRAMES = int(os.getenv("BRIDGE_QUEUE_MAX_FRAMES", 250))
+
+
+class FrameQueue:
+    """Single-consumer queue of text frames with a bounded audio backlog."""
+
+    def __init__(self, name: str, max_audio_frames: int = BRIDGE_QUEUE_MAX_FRAMES):
+        self.name = name
+        self.max_audio_frames = max(1, max_audio_frames)
+        self._frames: Deque[Tuple[bool, str]] = deque()  # (is_audio, frame)
+        self._audio = 0
+        self._ready = asyncio.Event()
+        self.closed = False
+
+        # stats
+        self.peak = 0
+        self.dropped_overflow = 0
+        self.dropped_stale = 0
+        self._depth = gauge(QUEUE_DEPTH, queue=name)
+        self._overflow_total = counter(QUEUE_DROPPED, queue=name, reason="overflow")
+        self._stale_total = counter(QUEUE_DROPPED, queue=name, reason="stale")
+
+    def __len__(self) -> int:
+        return len(self._frames)
+
+    # ---------- producer ----------
+    def put_audio(self, frame: str) -> bool:
+        """Queue an audio frame, dropping the oldest one if full. False once closed."""
+        if self.closed:
+            return False
+        if self._audio >= self.max_audio_frames:
+            self._drop_oldest_audio()
+        self._frames.append((True, frame))
+        self._audio += 1
+        self._pushed()
+        return True
+
+    def put_control(self, frame: str) -> bool:
+        """Queue a frame that must not be dropped (marks, clear). False once closed."""
+        if self.closed:
+            return False
+        self._frames.append((False, frame))
+        self._pushed()
+        return True
+
+    def purge(self) -> int:
+        """Drop everything queued (stale after a barge-in). Returns frames dropped."""
+        n = len(self._frames)
+        self.dropped_stale += self._audio
+        self._stale_total.inc(self._audio)
+        self._frames.clear()
+        self._audio = 0
+        self._depth.dec(n)
+        return n
+
+    def close(self) -> None:
+        """No more frames; the consumer drains what is left, then gets None."""
+        self.closed = True
+        self._ready.set()
+
+    def _pushed(self) -> None:
+        self._depth.inc()
+        depth = len(self._frames)
+        if depth > self.peak:
+            self.peak = depth
+        self._ready.set()
+
+    def _drop_oldest_audio(self) -> None:
+        frames = self._frames
+        for i, (is_audio, _) in enumerate(frames):
+            if is_audio:
+                del frames[i]
+                self._audio -= 1
+                self.dropped_overflow += 1
+                self._overflow_total.inc()
+                self._depth.dec()
+                return
+
+    # ---------- consumer ----------
+    async def get(self) -> Optional[str]:
+        """Next frame, or None once the queue is closed and drained."""
+        while not self._frames:
+            if self.closed:
+                return None
+            self._ready.clear()
+            await self._ready.wait()
+        is_audio, frame = self._frames.popleft()
+        if is_audio:
+            self._audio -= 1
+        self._depth.dec()
+        return frame
+
+    # ---------- stats ----------
+    def finish(self) -> dict:
+        """Record the call's peak depth and release its share of the depth gauge."""
+        self._depth.dec(len(self._frames))
+        self._frames.clear()
+        self._audio = 0
+        observe(QUEUE_PEAK_DEPTH, self.peak, queue=self.name)
+        return {
+            "peak": self.peak,
+            "dropped_overflow": self.dropped_overflow,
+            "dropped_stale": self.dropped_stale,
+        }
@@ -0,0 +1,195 @@
+# inbound_audio.py
+"""Caller audio on its way from Twilio to the Realtime API.
+
+Twilio sends one 20 ms μ-law frame per ``media`` event. Forwarding each as its
+own ``input_audio_buffer.append`` costs 50 JSON-encoded WebSocket messages
+per second per call. ``FrameCoalescer`` batches consecutive frames into one
+append of ``INBOUND_COALESCE_MS``. Server VAD only needs low latency at the
+edges of a turn, so frames are flushed at once when the caller starts to
+speak (barge-in). After speech they go out one by one until the silence is
+long enough for server VAD to end the turn. Long silences, such as the
+caller listening to the assistant, and steady speech are batched.
+
+With ``INBOUND_VAD_ENABLED`` the same stage also suppresses long silences.
+Once a turn has ended, silent frames are held back. The exceptions are one
+keepalive frame of real line noise every ``INBOUND_VAD_KEEPALIVE_MS``, and
+the last 300 ms, which are sent ahead of the next speech onset so server
+VAD gets its ``prefix_padding_ms``.
+
+``VoiceActivity`` classifies each frame by its mean absolute level. The
+level comes from ``bytes.translate`` lookups (audio_utils tables) of the
+high and low byte of the decoded PCM16 magnitude, summed in C. There is no
+per-sample Python loop, and the low bytes are only needed for frames close
+to the threshold.
+"""
+
+import binascii
+import math
+import os
+from collections import deque
+from typing import List, Optional
+
+from audio_utils import PCM16_FULL_SCALE, ULAW_MAGNITUDE_HI, ULAW_MAGNITUDE_LO
+from codec import encode_audio_append
+
+TWILIO_FRAME_MS = 20
+ULAW_BYTES_PER_MS = 8  # 8 kHz, 1 byte per sample
+
+# 20 = off (every Twilio frame is forwarded as-is)
+INBOUND_COALESCE_MS = int(os.getenv("INBOUND_COALESCE_MS", 80))
+# Mean frame level that counts as speech
+INBOUND_ONSET_DBFS = float(os.getenv("INBOUND_ONSET_DBFS", -40))
+INBOUND_VAD_ENABLED = os.getenv("INBOUND_VAD_ENABLED", "false").lower() == "true"
+INBOUND_VAD_KEEPALIVE_MS = int(os.getenv("INBOUND_VAD_KEEPALIVE_MS", 1000))
+
+# Quiet frames before the next loud frame counts as a new onset (200 ms)
+_ONSET_GAP_FRAMES = 10
+# Quiet frames after speech that go out unbatched: server VAD's
+# silence_duration_ms (500, see session_setup) plus one batch of margin
+_END_OF_TURN_FRAMES = 30
+# Suppressed frames replayed before an onset: server VAD's prefix_padding_ms
+_PREROLL_FRAMES = 300 // TWILIO_FRAME_MS
+
+# VoiceActivity.update results
+SILENCE = "silence"  # quiet, and the turn (if any) has ended
+HANGOVER = "hangover"  # quiet, but still inside the end-of-turn window
+ONSET = "onset"  # first loud frame after a pause
+SPEECH = "speech"
+
+
+def level_threshold(dbfs: float, samples: int) -> int:
+    """Sum of PCM16 magnitudes of a `samples`-long frame at mean level `dbfs`."""
+    return int(PCM16_FULL_SCALE * math.pow(10, dbfs / 20) * samples)
+
+
+class VoiceActivity:
+    """Energy VAD over 20 ms frames with an end-of-turn hangover."""
+
+    def __init__(self, onset_dbfs: float = INBOUND_ONSET_DBFS):
+        self._threshold = level_threshold(
+            onset_dbfs, TWILIO_FRAME_MS * ULAW_BYTES_PER_MS
+        )
+        self._quiet_frames = _END_OF_TURN_FRAMES
+
+    def is_speech(self, ulaw: bytes) -> bool:
+        """True if the frame's summed PCM16 magnitude reaches the threshold."""
+        # The high bytes alone bound the level to within 255 per sample, which
+        # settles clear silence and clear speech with one lookup.
+        high = sum(ulaw.translate(ULAW_MAGNITUDE_HI)) << 8
+        if high >= self._threshold:
+            return True
+        if high + 255 * len(ulaw) < self._threshold:
+            return False
+        return high + sum(ulaw.translate(ULAW_MAGNITUDE_LO)) >= self._threshold
+
+    def update(self, ulaw: bytes) -> str:
+        if self.is_speech(ulaw):
+            onset = self._quiet_frames >= _ONSET_GAP_FRAMES
+            self._quiet_frames = 0
+            return ONSET if onset else SPEECH
+        self._quiet_frames += 1
+        return HANGOVER if self._quiet_frames <= _END_OF_TURN_FRAMES else SILENCE
+
+    def reset(self) -> None:
+        self._quiet_frames = _END_OF_TURN_FRAMES
+
+
+class FrameCoalescer:
+    """Batches (and optionally gates) Twilio frames into fewer appends."""
+
+    def __init__(
+        self,
+        coalesce_ms: int = INBOUND_COALESCE_MS,
+        onset_dbfs: float = INBOUND_ONSET_DBFS,
+        suppress_silence: bool = INBOUND_VAD_ENABLED,
+        keepalive_ms: int = INBOUND_VAD_KEEPALIVE_MS,
+    ):
+        self.coalesce_ms = max(TWILIO_FRAME_MS, coalesce_ms)
+        self.suppress_silence = suppress_silence
+        self.activity = VoiceActivity(onset_dbfs)
+        self._keepalive_frames = max(1, keepalive_ms // TWILIO_FRAME_MS)
+        self._chunks: List[bytes] = []
+        self._buffered = 0  # bytes
+        self._preroll: deque = deque(maxlen=_PREROLL_FRAMES)
+        self._since_keepalive = 0
+
+        # stats
+        self.frames_in = 0
+        self.appends_out = 0
+        self.onset_flushes = 0
+        self.frames_suppressed = 0
+        self.keepalives = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.coalesce_ms > TWILIO_FRAME_MS or self.suppress_silence
+
+    def push(self, payload_b64: str) -> Optional[str]:
+        """Add one Twilio payload; returns an append frame when one is due."""
+        self.frames_in += 1
+        if not self.enabled:
+            self.appends_out += 1
+            return encode_audio_append(payload_b64)
+
+        ulaw = binascii.a2b_base64(payload_b64)
+        state = self.activity.update(ulaw)
+
+        if state is SILENCE and self.suppress_silence:
+            self._since_keepalive += 1
+            if self._since_keepalive < self._keepalive_frames:
+                self._preroll.append(ulaw)
+                self.frames_suppressed += 1
+                return None
+            self._since_keepalive = 0
+            self.keepalives += 1
+            self._preroll.clear()
+            self._add(ulaw)
+            return self.flush()
+
+        if state is ONSET:
+            self.onset_flushes += 1
+            self._since_keepalive = 0
+            while self._preroll:
+                self.frames_suppressed -= 1
+                self._add(self._preroll.popleft())
+            self._add(ulaw)
+            return self.flush()
+
+        self._add(ulaw)
+        if state is HANGOVER:
+            return self.flush()
+        if self._buffered >= self.coalesce_ms * ULAW_BYTES_PER_MS:
+            return self.flush()
+        return None
+
+    def _add(self, ulaw: bytes) -> None:
+        self._chunks.append(ulaw)
+        self._buffered += len(ulaw)
+
+    def flush(self) -> Optional[str]:
+        """Append frame for whatever is buffered (None if empty)."""
+        if not self._chunks:
+            return None
+        ulaw = self._chunks[0] if len(self._chunks) == 1 else b"".join(self._chunks)
+        self._chunks.clear()
+        self._buffered = 0
+        self.appends_out += 1
+        return encode_audio_append(binascii.b2a_base64(ulaw, newline=False).decode())
+
+    def stats(self) -> dict:
+        return {
+            "frames_in": self.frames_in,
+            "appends_out": self.appends_out,
+            "onset_flushes": self.onset_flushes,
+            "frames_suppressed": self.frames_suppressed,
+            "keepalives": self.keepalives,
+            "coalesce_ms": self.coalesce_ms,
+            "suppress_silence": self.suppress_silence,
+        }
+
+    def reset(self) -> None:
+        self._chunks.clear()
+        self._buffered = 0
+        self._preroll.clear()
+        self._since_keepalive = 0
+        self.activity.reset()
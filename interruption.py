@@ -1,19 +1,135 @@
-import json
+from typing import Optional
 
-from fastapi import WebSocket
+from codec import dumps
+from frame_queue import FrameQueue
+from logger import get_logger
+from playback import PlaybackTracker
+
+log = get_logger("interruption")
+
+# Ignore barge-ins in the first moments of Sally's turn and right after another one
+MIN_SPEAKING_MS = 500
+INTERRUPTION_COOLDOWN_MS = 1000
 
 
 # =======================
-# Smart interruption helper
+# Smart interruption engine
 # =======================
-async def handle_speech_started_event(
-    openai_ws, websocket: WebSocket, stream_sid: str | None
-):
-    """Truncate Sally's audio precisely where caller interrupts."""
-    # Ask the server to use the latest audio input immediately.
-    try:
-        await openai_ws.send(json.dumps({"type": "input_audio_buffer.commit"}))
-        await websocket.send_json({"event": "clear", "streamSid": stream_sid})
-        print("Interruption handled - ready for caller input")
-    except Exception as e:
-        print(f"Interruption handler error: {e}")
+class InterruptionEngine:
+    """
+    Tracks Sally's current audio item and, when the caller barges in, cuts it
+    exactly where the caller stopped hearing it:
+
+    1. drop Sally's audio still queued for Twilio, then Twilio `clear` so the
+       caller stops hearing her immediately
+    2. `response.cancel` so the model stops generating audio nobody will hear
+    3. `conversation.item.truncate` at the played offset so the transcript
+       matches what the caller actually heard
+    """
+
+    def __init__(
+        self,
+        openai_ws,
+        twilio_out: FrameQueue,
+        playback: PlaybackTracker,
+        show_timing_math: bool = False,
+    ):
+        self.openai_ws = openai_ws
+        self.twilio_out = twilio_out
+        self.playback = playback
+        self.show_timing_math = show_timing_math
+        self.reset()
+
+    def reset(self) -> None:
+        self.last_assistant_item: Optional[str] = None
+        self.response_start_timestamp_twilio: Optional[int] = None
+        self.last_interruption_time = 0
+        self.response_active = False
+        self._cut_item: Optional[str] = None
+
+    # ---------- Realtime events ----------
+    def on_response_created(self) -> None:
+        self.response_active = True
+
+    def on_response_done(self) -> None:
+        self.response_active = False
+
+    def on_assistant_audio(self, item_id: Optional[str], latest_media_timestamp: int):
+        """Record when a new assistant item starts playing (Twilio media clock)."""
+        if item_id and item_id != self.last_assistant_item:
+            self.response_start_timestamp_twilio = latest_media_timestamp
+            self.last_assistant_item = item_id
+            if self.show_timing_math:
+                log.debug(
+                    "Sally started new response @ %sms (ID: %s)",
+                    latest_media_timestamp,
+                    item_id,
+                )
+
+    def should_drop(self, item_id: Optional[str]) -> bool:
+        """Audio for an item we already cut is stale; don't forward it."""
+        return item_id is not None and item_id == self._cut_item
+
+    # ---------- barge-in ----------
+    def audio_end_ms(self, latest_media_timestamp: int) -> int:
+        """
+        How much of the current item the caller has heard. Wall-clock elapsed
+        time since the item started, capped by the audio actually sent, and
+        never less than what Twilio has acknowledged via marks.
+        """
+        item_id = self.last_assistant_item
+        elapsed = latest_media_timestamp - (self.response_start_timestamp_twilio or 0)
+        if self.playback.item_id == item_id:
+            elapsed = min(elapsed, self.playback.sent_ms)
+        return int(max(elapsed, self.playback.played_ms(item_id), 0))
+
+    async def on_speech_started(self, latest_media_timestamp: int, frames) -> bool:
+        """Handle `input_audio_buffer.speech_started`. Returns True if Sally was cut."""
+        item_id = self.last_assistant_item
+        if not item_id or not (self.playback.is_playing or self.response_active):
+            return False  # Sally already finished and the caller heard all of it
+
+        speaking_dur = latest_media_timestamp - (
+            self.response_start_timestamp_twilio or 0
+        )
+        since_last = latest_media_timestamp - self.last_interruption_time
+        if speaking_dur <= MIN_SPEAKING_MS or since_last <= INTERRUPTION_COOLDOWN_MS:
+            return False
+
+        self.last_interruption_time = latest_media_timestamp
+        audio_end_ms = self.audio_end_ms(latest_media_timestamp)
+        if self.show_timing_math:
+            log.debug(
+                "Truncating %s at %sms (elapsed %sms, acked %sms)",
+                item_id,
+                audio_end_ms,
+                speaking_dur,
+                self.playback.played_ms(item_id),
+            )
+
+        try:
+            if frames is not None:
+                self.twilio_out.purge()
+                self.twilio_out.put_control(frames.clear)
+            if self.response_active:
+                await self.openai_ws.send(dumps({"type": "response.cancel"}))
+                self.response_active = False
+            await self.openai_ws.send(
+                dumps(
+                    {
+                        "type": "conversation.item.truncate",
+                        "item_id": item_id,
+                        "content_index": 0,
+                        "audio_end_ms": audio_end_ms,
+                    }
+                )
+            )
+            log.info("Interruption handled - ready for caller input")
+        except Exception as e:
+            log.error("Interruption handler error: %s", e)
+
+        self._cut_item = item_id
+        self.playback.clear()
+        self.last_assistant_item = None
+        self.response_start_timestamp_twilio = None
+        return True
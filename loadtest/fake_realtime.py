@@ -0,0 +1,222 @@
+"""Local stand-in for the OpenAI Realtime API, for load tests.
+
+Speaks just enough of the protocol to drive the bridge the way a real
+session does:
+
+- ``session.update`` -> ``session.updated``
+- ``response.create`` -> a response of ``response.output_audio.delta``
+  frames, paced at ``--speed`` x real time
+- every ``--turn-ms`` of caller audio appended: ``speech_started`` (a
+  barge-in if Sally is still talking), ``speech_stopped``, then a new
+  response; every ``--tool-every``-th turn is a ``check_status`` function
+  call instead, streamed as argument deltas
+- ``response.cancel`` stops the current response
+
+Each audio delta is μ-law silence whose first 8 bytes carry the send time
+(``time.monotonic_ns``). The bridge forwards payloads untouched, so the fake
+Twilio client can measure end-to-end forwarding latency on the same host.
+
+    python loadtest/fake_realtime.py --port 9100
+"""
+
+import argparse
+import asyncio
+import base64
+import itertools
+import json
+import struct
+import time
+from typing import Optional
+
+import websockets
+
+ULAW_BYTES_PER_MS = 8
+ULAW_SILENCE = b"\xff"
+
+_encode = json.JSONEncoder(separators=(",", ":")).encode
+
+
+def stamped_audio(ms: int) -> str:
+    """Base64 μ-law silence with the send time (monotonic ns) in the first 8 bytes."""
+    raw = struct.pack(">Q", time.monotonic_ns())
+    raw += ULAW_SILENCE * (ms * ULAW_BYTES_PER_MS - len(raw))
+    return base64.b64encode(raw).decode()
+
+
+class FakeSession:
+    def __init__(self, ws, args: argparse.Namespace):
+        self.ws = ws
+        self.args = args
+        self.ids = itertools.count(1)
+        self.turns = 0
+        self.appended_ms = 0.0
+        self.response: Optional[asyncio.Task] = None
+
+    def _id(self, prefix: str) -> str:
+        return f"{prefix}_{next(self.ids):06d}"
+
+    async def send(self, event: dict) -> None:
+        event.setdefault("event_id", self._id("event"))
+        await self.ws.send(_encode(event))
+
+    async def run(self) -> None:
+        await self.send({"type": "session.created", "session": {}})
+        try:
+            async for message in self.ws:
+                event = json.loads(message)
+                etype = event.get("type")
+                if etype == "input_audio_buffer.append":
+                    n = len(event.get("audio", ""))
+                    self.appended_ms += n * 3 / 4 / ULAW_BYTES_PER_MS
+                    if self.appended_ms >= self.args.turn_ms:
+                        self.appended_ms = 0.0
+                        asyncio.create_task(self.caller_turn())
+                elif etype == "session.update":
+                    await self.send({"type": "session.updated", "session": {}})
+                elif etype == "response.create":
+                    self.start_response(tool_call=False)
+                elif etype == "response.cancel":
+                    self.cancel_response()
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            self.cancel_response()
+
+    def start_response(self, tool_call: bool) -> None:
+        self.cancel_response()
+        self.response = asyncio.create_task(self.respond(tool_call))
+
+    def cancel_response(self) -> None:
+        if self.response is not None and not self.response.done():
+            self.response.cancel()
+        self.response = None
+
+    async def caller_turn(self) -> None:
+        """The caller says something: VAD start/stop, then Sally answers."""
+        try:
+            await self.send({"type": "input_audio_buffer.speech_started"})
+            await asyncio.sleep(self.args.speech_ms / 1000)
+            await self.send({"type": "input_audio_buffer.speech_stopped"})
+            await self.send({"type": "input_audio_buffer.committed"})
+            self.turns += 1
+            tool_call = self.args.tool_every and self.turns % self.args.tool_every == 0
+            self.start_response(tool_call=bool(tool_call))
+        except websockets.ConnectionClosed:
+            pass
+
+    async def respond(self, tool_call: bool) -> None:
+        response_id = self._id("resp")
+        item_id = self._id("item")
+        status = "completed"
+        try:
+            await self.send(
+                {"type": "response.created", "response": {"id": response_id}}
+            )
+            if tool_call:
+                await self._function_call(response_id, item_id)
+            else:
+                await self._audio(response_id, item_id)
+        except asyncio.CancelledError:
+            status = "cancelled"
+        except websockets.ConnectionClosed:
+            return
+        try:
+            await self.send(
+                {
+                    "type": "response.done",
+                    "response": {"id": response_id, "status": status},
+                }
+            )
+        except websockets.ConnectionClosed:
+            pass
+
+    async def _audio(self, response_id: str, item_id: str) -> None:
+        delta_ms = self.args.delta_ms
+        interval = delta_ms / 1000 / self.args.speed
+        next_at = time.monotonic()
+        for _ in range(max(1, self.args.response_ms // delta_ms)):
+            await self.send(
+                {
+                    "type": "response.output_audio.delta",
+                    "response_id": response_id,
+                    "item_id": item_id,
+                    "output_index": 0,
+                    "content_index": 0,
+                    "delta": stamped_audio(delta_ms),
+                }
+            )
+            next_at += interval
+            await asyncio.sleep(max(0.0, next_at - time.monotonic()))
+        await self.send(
+            {
+                "type": "response.output_audio.done",
+                "response_id": response_id,
+                "item_id": item_id,
+            }
+        )
+
+    async def _function_call(self, response_id: str, item_id: str) -> None:
+        call_id = self._id("call")
+        arguments = '{"line_numbers":[1,2,3]}'
+        await self.send(
+            {
+                "type": "conversation.item.created",
+                "item": {
+                    "id": item_id,
+                    "type": "function_call",
+                    "name": "check_status",
+                    "call_id": call_id,
+                },
+            }
+        )
+        for i in range(0, len(arguments), 8):
+            await self.send(
+                {
+                    "type": "response.function_call_arguments.delta",
+                    "response_id": response_id,
+                    "item_id": item_id,
+                    "call_id": call_id,
+                    "delta": arguments[i : i + 8],
+                }
+            )
+        await self.send(
+            {
+                "type": "response.function_call_arguments.done",
+                "response_id": response_id,
+                "item_id": item_id,
+                "call_id": call_id,
+                "name": "check_status",
+                "arguments": arguments,
+            }
+        )
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--delta-ms", type=int, default=100, help="audio per delta")
+    parser.add_argument("--response-ms", type=int, default=5000, help="audio per reply")
+    parser.add_argument("--speed", type=float, default=1.5, help="x real time")
+    parser.add_argument(
+        "--turn-ms", type=int, default=4000, help="caller audio per turn"
+    )
+    parser.add_argument("--speech-ms", type=int, default=700)
+    parser.add_argument("--tool-every", type=int, default=3, help="0 = no tool calls")
+    return parser.parse_args(argv)
+
+
+async def serve(args: argparse.Namespace) -> None:
+    async def handler(ws):
+        await FakeSession(ws, args).run()
+
+    async with websockets.serve(handler, args.host, args.port, max_queue=None):
+        print(f"fake realtime listening on ws://{args.host}:{args.port}", flush=True)
+        await asyncio.Future()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(serve(parse_args()))
+    except KeyboardInterrupt:
+        pass
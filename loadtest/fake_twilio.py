@@ -0,0 +1,189 @@
+"""Simulated Twilio Media Stream clients for load tests.
+
+Each client connects to the bridge's ``/media-stream`` like Twilio does:
+``connected`` and ``start`` events, then one 20 ms μ-law ``media`` frame every
+20 ms on an absolute schedule. It plays outbound audio against a simulated
+playback clock and echoes each ``mark`` once the audio before it has
+"played". On ``clear`` it drops buffered audio and returns any pending
+marks, as Twilio does.
+
+For each outbound media frame, the send time stamped by the fake Realtime
+server gives the forwarding latency through the bridge.
+"""
+
+import asyncio
+import base64
+import json
+import os
+import struct
+import sys
+import time
+import uuid
+from typing import Dict, List
+
+import websockets
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from metrics import Histogram  # noqa: E402
+
+FRAME_MS = 20
+ULAW_BYTES_PER_MS = 8
+_SILENCE_B64 = base64.b64encode(b"\xff" * FRAME_MS * ULAW_BYTES_PER_MS).decode()
+
+_encode = json.JSONEncoder(separators=(",", ":")).encode
+
+
+class LoadStats:
+    """Aggregated over every simulated call in one load step."""
+
+    def __init__(self):
+        self.forward_ms = Histogram()  # fake Realtime send -> Twilio client receive
+        self.send_lag_ms = Histogram()  # how late our own 20 ms sends were
+        self.calls_ok = 0
+        self.calls_failed = 0
+        self.media_received = 0
+        self.marks_echoed = 0
+        self.clears = 0
+        self.errors: List[str] = []
+
+
+class FakeTwilioCall:
+    def __init__(self, url: str, duration_sec: float, stats: LoadStats):
+        self.url = url
+        self.duration_sec = duration_sec
+        self.stats = stats
+        self.stream_sid = "MZ" + uuid.uuid4().hex
+        self.call_sid = "CA" + uuid.uuid4().hex
+        self.play_until = 0.0
+        self.pending_marks: Dict[str, asyncio.TimerHandle] = {}
+
+    async def run(self) -> None:
+        try:
+            async with websockets.connect(self.url, max_queue=None) as ws:
+                self.ws = ws
+                await ws.send(_encode({"event": "connected", "protocol": "Call"}))
+                await ws.send(
+                    _encode(
+                        {
+                            "event": "start",
+                            "sequenceNumber": "1",
+                            "start": {
+                                "streamSid": self.stream_sid,
+                                "callSid": self.call_sid,
+                                "tracks": ["inbound"],
+                                "customParameters": {"caller_phone": "+15555550100"},
+                                "mediaFormat": {
+                                    "encoding": "audio/x-mulaw",
+                                    "sampleRate": 8000,
+                                    "channels": 1,
+                                },
+                            },
+                            "streamSid": self.stream_sid,
+                        }
+                    )
+                )
+                receiver = asyncio.create_task(self._receive())
+                await self._send_media()
+                await ws.send(_encode({"event": "stop", "streamSid": self.stream_sid}))
+                await ws.close()
+                await receiver
+            self.stats.calls_ok += 1
+        except Exception as e:
+            self.stats.calls_failed += 1
+            if len(self.stats.errors) < 10:
+                self.stats.errors.append(repr(e))
+        finally:
+            for handle in self.pending_marks.values():
+                handle.cancel()
+
+    async def _send_media(self) -> None:
+        started = time.monotonic()
+        frames = int(self.duration_sec * 1000 / FRAME_MS)
+        for seq in range(frames):
+            due = started + seq * FRAME_MS / 1000
+            delay = due - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self.stats.send_lag_ms.observe(max(0.0, time.monotonic() - due) * 1000)
+            await self.ws.send(
+                _encode(
+                    {
+                        "event": "media",
+                        "sequenceNumber": str(seq + 2),
+                        "media": {
+                            "track": "inbound",
+                            "chunk": str(seq + 1),
+                            "timestamp": str(seq * FRAME_MS),
+                            "payload": _SILENCE_B64,
+                        },
+                        "streamSid": self.stream_sid,
+                    }
+                )
+            )
+
+    async def _receive(self) -> None:
+        try:
+            async for message in self.ws:
+                event = json.loads(message)
+                kind = event.get("event")
+                if kind == "media":
+                    self._on_media(event["media"]["payload"])
+                elif kind == "mark":
+                    self._on_mark(event["mark"]["name"])
+                elif kind == "clear":
+                    self._on_clear()
+        except websockets.ConnectionClosed:
+            pass
+
+    def _on_media(self, payload: str) -> None:
+        now_ns = time.monotonic_ns()
+        raw = base64.b64decode(payload)
+        if len(raw) >= 8:
+            (sent_ns,) = struct.unpack(">Q", raw[:8])
+            self.stats.forward_ms.observe((now_ns - sent_ns) / 1e6)
+        self.stats.media_received += 1
+        now = now_ns / 1e9
+        duration = len(raw) / ULAW_BYTES_PER_MS / 1000
+        self.play_until = max(self.play_until, now) + duration
+
+    def _on_mark(self, name: str) -> None:
+        delay = max(0.0, self.play_until - time.monotonic())
+        loop = asyncio.get_running_loop()
+        self.pending_marks[name] = loop.call_later(delay, self._echo_mark, name)
+
+    def _on_clear(self) -> None:
+        self.stats.clears += 1
+        self.play_until = 0.0
+        for name, handle in list(self.pending_marks.items()):
+            handle.cancel()
+            self._echo_mark(name)
+
+    def _echo_mark(self, name: str) -> None:
+        if self.pending_marks.pop(name, None) is None:
+            return
+        self.stats.marks_echoed += 1
+        frame = _encode(
+            {"event": "mark", "streamSid": self.stream_sid, "mark": {"name": name}}
+        )
+        asyncio.create_task(self._send_quietly(frame))
+
+    async def _send_quietly(self, frame: str) -> None:
+        try:
+            await self.ws.send(frame)
+        except websockets.ConnectionClosed:
+            pass
+
+
+async def run_calls(
+    url: str, concurrency: int, duration_sec: float, ramp_sec: float = 1.0
+) -> LoadStats:
+    """Run `concurrency` simultaneous calls, started evenly over `ramp_sec`."""
+    stats = LoadStats()
+
+    async def one(i: int) -> None:
+        await asyncio.sleep(ramp_sec * i / max(1, concurrency))
+        await FakeTwilioCall(url, duration_sec, stats).run()
+
+    await asyncio.gather(*(one(i) for i in range(concurrency)))
+    return stats
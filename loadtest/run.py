@@ -0,0 +1,229 @@
+"""How many concurrent calls can one worker carry?
+
+Starts the fake Realtime server and one bridge worker (uvicorn, pointed at
+the fake via OPENAI_REALTIME_URL) as local subprocesses, then runs a step of
+simulated Twilio calls at each concurrency level. Nothing leaves the host.
+
+For each step it reports:
+- p50/p99 forwarding latency (fake Realtime send -> fake Twilio receive)
+- worker CPU per call, as % of one core (from /proc)
+- worker RSS
+- whether audio jittered, i.e. p99 forwarding latency above --jitter-ms
+- CPU used by the fakes themselves (% of one core). If it nears 100%, or
+  the host has fewer free cores than the three processes need, the numbers
+  measure the harness rather than the worker
+
+    python loadtest/run.py --concurrency 10,25,50,100 --duration 20
+
+Run it on a host with at least three free cores so the worker doesn't
+compete with the fakes.
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+from typing import Optional, Tuple
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, HERE)
+
+from fake_twilio import run_calls  # noqa: E402
+
+# Placeholders so the worker starts without real credentials; nothing is called.
+_WORKER_ENV = {
+    "OPENAI_API_KEY": "sk-loadtest",
+    "TWILIO_ACCOUNT_SID": "AC" + "0" * 32,
+    "TWILIO_AUTH_TOKEN": "loadtest",
+    "TRANSFER_WEBHOOK_URL": "http://127.0.0.1/twiml/transfer",
+    "TWILIO_CALLBACK_BASE": "http://127.0.0.1",
+    "LOG_LEVEL": "WARNING",
+}
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for_port(port: int, timeout: float = 20.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"nothing listening on port {port} after {timeout}s")
+
+
+def check_dotenv() -> None:
+    """app_instance loads .env with override=True, which would beat our env."""
+    path = os.path.join(ROOT, ".env")
+    if not os.path.exists(path):
+        return
+    with open(path) as f:
+        keys = {line.split("=", 1)[0].strip() for line in f if "=" in line}
+    if "OPENAI_REALTIME_URL" in keys:
+        sys.exit(
+            ".env sets OPENAI_REALTIME_URL, which would send load-test calls to the "
+            "real API. Comment it out before running the load test."
+        )
+
+
+def cpu_seconds(pid: int) -> Optional[float]:
+    """utime + stime of a process, from /proc (Linux only)."""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def rss_mb(pid: int) -> Optional[float]:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def start_processes(args) -> Tuple[subprocess.Popen, subprocess.Popen, int]:
+    rt_port, app_port = free_port(), free_port()
+    fake = subprocess.Popen(
+        [
+            sys.executable,
+            os.path.join(HERE, "fake_realtime.py"),
+            "--port",
+            str(rt_port),
+            "--delta-ms",
+            str(args.delta_ms),
+        ],
+        stdout=subprocess.DEVNULL,
+    )
+    wait_for_port(rt_port)
+
+    env = {**_WORKER_ENV, **os.environ}
+    env["OPENAI_REALTIME_URL"] = (
+        f"ws://127.0.0.1:{rt_port}/v1/realtime?model=gpt-realtime"
+    )
+    env.pop("DATABASE_URL", None)
+    worker = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "sally:app",
+            "--host",
+            "127.0.0.1",
+            "--port",
+            str(app_port),
+            "--log-level",
+            "warning",
+        ],
+        cwd=ROOT,
+        env=env,
+    )
+    wait_for_port(app_port)
+    return fake, worker, app_port
+
+
+def report_header() -> None:
+    print(
+        f"{'calls':>6} {'ok':>5} {'fail':>5} {'p50 ms':>8} {'p99 ms':>8} "
+        f"{'max ms':>8} {'cpu/call':>9} {'rss MB':>7} {'clears':>7} "
+        f"{'send lag p99':>13} {'fakes cpu':>10}  jitter"
+    )
+
+
+async def main(args) -> None:
+    check_dotenv()
+    fake, worker, app_port = start_processes(args)
+    url = f"ws://127.0.0.1:{app_port}/media-stream"
+    jitter_at = None
+    try:
+        report_header()
+        for n in args.concurrency:
+            cpu_before, started = cpu_seconds(worker.pid), time.monotonic()
+            fakes_before = (cpu_seconds(fake.pid) or 0.0) + time.process_time()
+            stats = await run_calls(url, n, args.duration, ramp_sec=args.ramp)
+            elapsed = time.monotonic() - started
+            cpu_after = cpu_seconds(worker.pid)
+            fakes_after = (cpu_seconds(fake.pid) or 0.0) + time.process_time()
+            fakes_cpu = (fakes_after - fakes_before) / elapsed * 100
+
+            cpu_per_call = "n/a"
+            if cpu_before is not None and cpu_after is not None:
+                share = (cpu_after - cpu_before) / elapsed / n * 100
+                cpu_per_call = f"{share:.2f}%"
+            rss = rss_mb(worker.pid)
+            fwd = stats.forward_ms
+            jittered = fwd.count and fwd.percentile(99) > args.jitter_ms
+            if jittered and jitter_at is None:
+                jitter_at = n
+            print(
+                f"{n:>6} {stats.calls_ok:>5} {stats.calls_failed:>5} "
+                f"{fwd.percentile(50):>8.2f} {fwd.percentile(99):>8.2f} "
+                f"{fwd.max:>8.2f} {cpu_per_call:>9} "
+                f"{(f'{rss:.0f}' if rss is not None else 'n/a'):>7} "
+                f"{stats.clears:>7} "
+                f"{stats.send_lag_ms.percentile(99):>10.2f} ms "
+                f"{fakes_cpu:>9.0f}%  "
+                f"{'YES' if jittered else 'no'}",
+                flush=True,
+            )
+            for err in stats.errors:
+                print(f"       error: {err}")
+            if not fwd.count:
+                print("       no audio came back; is the worker healthy?")
+            await asyncio.sleep(args.cooldown)
+    finally:
+        for proc in (worker, fake):
+            proc.terminate()
+        for proc in (worker, fake):
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+    if jitter_at is None:
+        top = args.concurrency[-1]
+        print(f"\nNo jitter (p99 > {args.jitter_ms} ms) up to {top} calls")
+    else:
+        print(f"\nAudio starts to jitter at {jitter_at} concurrent calls")
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument(
+        "--concurrency",
+        type=lambda s: [int(x) for x in s.split(",")],
+        default=[1, 10, 25, 50, 100],
+        help="comma-separated concurrent call counts, one step each",
+    )
+    parser.add_argument("--duration", type=float, default=15.0, help="seconds per call")
+    parser.add_argument(
+        "--ramp", type=float, default=1.0, help="seconds to start all calls"
+    )
+    parser.add_argument("--cooldown", type=float, default=2.0)
+    parser.add_argument("--delta-ms", type=int, default=100)
+    parser.add_argument(
+        "--jitter-ms",
+        type=float,
+        default=20.0,
+        help="p99 forwarding latency that counts as jitter (one Twilio frame)",
+    )
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
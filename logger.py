@@ -0,0 +1,192 @@
+# logger.py
+"""Non-blocking structured logging for Princeton Sentinel.
+
+Records are handed to a queue on the calling thread (no I/O on the event
+loop); a background QueueListener thread formats and writes them to stdout.
+
+- LOG_LEVEL: DEBUG / INFO / WARNING / ERROR (default INFO)
+- LOG_FORMAT: json (default) or text
+- LOG_SAMPLE_RATES: per-event-type sampling, e.g.
+  "response.output_audio.delta=0.01,response.function_call_arguments.delta=0.1"
+
+Every record carries the call_sid / stream_sid bound with ``bind_call`` for
+the current media stream.
+
+Hot paths should go through ``log_event``, which returns before building
+anything when the level is disabled or the event is sampled out.
+"""
+
+import atexit
+import contextvars
+import datetime
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+from typing import Any, Dict, Optional
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+LOG_SAMPLE_RATES = os.getenv(
+    "LOG_SAMPLE_RATES",
+    "response.output_audio.delta=0.01,response.function_call_arguments.delta=0.1",
+)
+
+ROOT_LOGGER_NAME = "sentinel"
+
+# One mutable dict per media stream. handle_media_stream sets it before it
+# spawns its pump tasks, so all of them (and the tool tasks) share it.
+_call_context: contextvars.ContextVar[Optional[Dict[str, Any]]] = (
+    contextvars.ContextVar("call_log_context", default=None)
+)
+
+
+def new_call_context() -> Dict[str, Any]:
+    """Start a fresh log context for the current task and its children."""
+    ctx: Dict[str, Any] = {}
+    _call_context.set(ctx)
+    return ctx
+
+
+def bind_call(**fields: Any) -> None:
+    """Attach fields (call_sid, stream_sid, ...) to every record of this call."""
+    ctx = _call_context.get()
+    if ctx is None:
+        ctx = new_call_context()
+    ctx.update(fields)
+
+
+# =======================
+# Sampling
+# =======================
+def _parse_sample_rates(spec: str) -> Dict[str, int]:
+    """'evt=0.01,...' -> {'evt': 100} (log one in every N)."""
+    every: Dict[str, int] = {}
+    for part in spec.split(","):
+        if "=" not in part:
+            continue
+        evt, rate = part.split("=", 1)
+        rate = float(rate)
+        every[evt.strip()] = 0 if rate <= 0 else max(1, round(1 / rate))
+    return every
+
+
+class EventSampler:
+    """Deterministic 1-in-N sampling per event type (0 = never, absent = always)."""
+
+    def __init__(self, spec: str = LOG_SAMPLE_RATES):
+        self.every = _parse_sample_rates(spec)
+        self._seen: Dict[str, int] = {}
+
+    def should_log(self, evt_type: str) -> bool:
+        n = self.every.get(evt_type)
+        if n is None:
+            return True
+        if n == 0:
+            return False
+        seen = self._seen.get(evt_type, 0)
+        self._seen[evt_type] = seen + 1
+        return seen % n == 0
+
+
+sampler = EventSampler()
+
+
+# =======================
+# Formatting
+# =======================
+class _ContextFilter(logging.Filter):
+    """Runs on the caller's thread, so the call context is captured correctly."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        ctx = _call_context.get()
+        record.call = dict(ctx) if ctx else {}
+        if not hasattr(record, "fields"):
+            record.fields = {}
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.datetime.fromtimestamp(
+                record.created, datetime.timezone.utc
+            ).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        entry.update(getattr(record, "call", {}))
+        entry.update(getattr(record, "fields", {}))
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        extras = {**getattr(record, "call", {}), **getattr(record, "fields", {})}
+        line = f"{record.levelname:<7} {record.name}: {record.getMessage()}"
+        if extras:
+            line += " " + " ".join(f"{k}={v}" for k, v in extras.items())
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+
+# =======================
+# Setup
+# =======================
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def setup_logging() -> None:
+    """Wire the queue handler and start the writer thread (idempotent)."""
+    global _listener
+    if _listener is not None:
+        return
+
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(TextFormatter() if LOG_FORMAT == "text" else JsonFormatter())
+
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.addFilter(_ContextFilter())
+
+    root = logging.getLogger(ROOT_LOGGER_NAME)
+    root.setLevel(LOG_LEVEL)
+    root.addHandler(queue_handler)
+    root.propagate = False
+
+    _listener = logging.handlers.QueueListener(log_queue, stream)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging() -> None:
+    """Flush queued records and stop the writer thread."""
+    global _listener
+    listener, _listener = _listener, None
+    if listener is not None:
+        listener.stop()
+
+
+def get_logger(name: str) -> logging.Logger:
+    setup_logging()
+    return logging.getLogger(f"{ROOT_LOGGER_NAME}.{name}")
+
+
+def log_event(
+    log: logging.Logger,
+    evt_type: str,
+    msg: str,
+    level: int = logging.INFO,
+    **fields: Any,
+) -> None:
+    """Log a Realtime/Twilio event subject to level and per-event-type sampling."""
+    if not log.isEnabledFor(level) or not sampler.should_log(evt_type):
+        return
+    fields["event_type"] = evt_type
+    log.log(level, msg, extra={"fields": fields})
@@ -0,0 +1,293 @@
+# metrics.py
+"""In-process latency metrics with Prometheus text exposition.
+
+Histograms are HDR-style: values land in log-linear buckets (each power of
+two split into ``SUB_BUCKETS`` linear steps), so a histogram is a small
+sparse dict of counts with bounded relative error (~1/SUB_BUCKETS) from
+microseconds to hours. Percentiles come straight from the buckets, and
+``render()`` folds them into fixed Prometheus ``le`` buckets.
+
+Everything is updated from the event loop, so no locking is needed. Other
+threads hand their updates to the loop with ``call_soon_threadsafe``.
+"""
+
+import math
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+SUB_BUCKETS = 16
+
+# Fixed `le` boundaries (seconds) for the Prometheus exposition
+EXPORT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 0.75,
+    1.0, 1.5, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0,
+)  # fmt: skip
+
+LabelSet = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """Sparse log-linear histogram (HDR-style)."""
+
+    __slots__ = ("counts", "count", "sum", "max")
+
+    def __init__(self):
+        self.counts: Dict[int, int] = {}
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    @staticmethod
+    def _index(value: float) -> int:
+        if value <= 0:
+            return -(1 << 30)  # zero bucket
+        mantissa, exponent = math.frexp(value)  # value = mantissa * 2**exponent
+        sub = int((mantissa - 0.5) * 2 * SUB_BUCKETS)
+        return exponent * SUB_BUCKETS + sub
+
+    @staticmethod
+    def _upper_bound(index: int) -> float:
+        if index == -(1 << 30):
+            return 0.0
+        exponent, sub = divmod(index, SUB_BUCKETS)
+        return math.ldexp(0.5 + (sub + 1) / (2 * SUB_BUCKETS), exponent)
+
+    @staticmethod
+    def _lower_bound(index: int) -> float:
+        if index == -(1 << 30):
+            return 0.0
+        exponent, sub = divmod(index, SUB_BUCKETS)
+        return math.ldexp(0.5 + sub / (2 * SUB_BUCKETS), exponent)
+
+    def observe(self, value: float) -> None:
+        idx = self._index(value)
+        self.counts[idx] = self.counts.get(idx, 0) + 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th percentile (0-100)."""
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(self.count * q / 100))
+        seen = 0
+        for idx in sorted(self.counts):
+            seen += self.counts[idx]
+            if seen >= rank:
+                return min(self._upper_bound(idx), self.max)
+        return self.max
+
+    def cumulative(self, bounds: Iterable[float]) -> List[Tuple[float, int]]:
+        """Counts of observations <= each bound (to within one bucket).
+
+        A bucket counts towards `bound` when it starts at or below it, so exact
+        values such as integer depths land in the right `le` bucket.
+        """
+        ordered = sorted(self.counts.items())
+        out = []
+        i = seen = 0
+        for bound in bounds:
+            while i < len(ordered) and self._lower_bound(ordered[i][0]) <= bound:
+                seen += ordered[i][1]
+                i += 1
+            out.append((bound, seen))
+        return out
+
+    def snapshot(self) -> Dict[str, float]:
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "max": self.max,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+        }
+
+
+class Counter:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+
+class Gauge:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+
+
+# =======================
+# Registry
+# =======================
+class MetricsRegistry:
+    def __init__(self):
+        # name -> (kind, help, {labels: metric})
+        self._families: Dict[str, Tuple[str, str, Dict[LabelSet, object]]] = {}
+        # Export `le` bounds for histograms that aren't latencies in seconds
+        self._buckets: Dict[str, Tuple[float, ...]] = {}
+
+    def _get(self, kind: str, cls, name: str, help_text: str, labels: Dict[str, str]):
+        family = self._families.get(name)
+        if family is None:
+            family = self._families[name] = (kind, help_text, {})
+        elif family[0] != kind:
+            raise ValueError(f"metric {name} already registered as a {family[0]}")
+        key = tuple(sorted((k, str(v)) for k, v in labels.items()))
+        metric = family[2].get(key)
+        if metric is None:
+            metric = family[2][key] = cls()
+        return metric
+
+    def histogram(self, name: str, help_text: str = "", **labels: str) -> Histogram:
+        return self._get("histogram", Histogram, name, help_text, labels)
+
+    def set_buckets(self, name: str, bounds: Iterable[float]) -> None:
+        self._buckets[name] = tuple(sorted(bounds))
+
+    def counter(self, name: str, help_text: str = "", **labels: str) -> Counter:
+        return self._get("counter", Counter, name, help_text, labels)
+
+    def gauge(self, name: str, help_text: str = "", **labels: str) -> Gauge:
+        return self._get("gauge", Gauge, name, help_text, labels)
+
+    def snapshot(self) -> Dict[str, Dict[str, object]]:
+        """JSON-friendly view: histograms as count/sum/max/p50/p90/p99."""
+        out: Dict[str, Dict[str, object]] = {}
+        for name, (kind, _, series) in self._families.items():
+            for labels, metric in series.items():
+                key = _format_labels(labels) or "_"
+                if kind == "histogram":
+                    out.setdefault(name, {})[key] = metric.snapshot()
+                else:
+                    out.setdefault(name, {})[key] = metric.value
+        return out
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        lines: List[str] = []
+        for name, (kind, help_text, series) in sorted(self._families.items()):
+            if help_text:
+                lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, metric in series.items():
+                if kind != "histogram":
+                    lines.append(f"{name}{_format_labels(labels)} {metric.value:g}")
+                    continue
+                bounds = self._buckets.get(name, EXPORT_BUCKETS)
+                for bound, seen in metric.cumulative(bounds):
+                    le = labels + (("le", f"{bound:g}"),)
+                    lines.append(f"{name}_bucket{_format_labels(le)} {seen}")
+                inf = labels + (("le", "+Inf"),)
+                lines.append(f"{name}_bucket{_format_labels(inf)} {metric.count}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {metric.sum:.6f}")
+                lines.append(f"{name}_count{_format_labels(labels)} {metric.count}")
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels: LabelSet) -> str:
+    if not labels:
+        return ""
+    parts = []
+    for key, value in labels:
+        value = value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        parts.append(f'{key}="{value}"')
+    return "{" + ",".join(parts) + "}"
+
+
+metrics = MetricsRegistry()
+
+# Metric names (all latencies in seconds)
+FIRST_GREETING_SECONDS = "sentinel_first_greeting_seconds"
+TURN_LATENCY_SECONDS = "sentinel_turn_latency_seconds"
+TOOL_DURATION_SECONDS = "sentinel_tool_duration_seconds"
+TRANSFER_DURATION_SECONDS = "sentinel_transfer_duration_seconds"
+DB_INSERT_SECONDS = "sentinel_db_insert_seconds"
+CALLS_TOTAL = "sentinel_calls_total"
+ACTIVE_CALLS = "sentinel_active_calls"
+QUEUE_DEPTH = "sentinel_queue_depth"
+QUEUE_PEAK_DEPTH = "sentinel_queue_peak_depth"
+QUEUE_DROPPED = "sentinel_queue_dropped_frames_total"
+INBOUND_FRAMES = "sentinel_inbound_frames_total"
+RECORDING_DROPPED = "sentinel_recording_dropped_frames_total"
+JOURNAL_DEPTH = "sentinel_journal_queue_depth"
+JOURNAL_FLUSH_SECONDS = "sentinel_journal_flush_seconds"
+JOURNAL_FLUSHED = "sentinel_journal_flushed_records_total"
+ADMIN_CACHE_REQUESTS = "sentinel_admin_cache_requests_total"
+
+_HELP = {
+    FIRST_GREETING_SECONDS: "Media stream start to first greeting audio sent to Twilio",
+    TURN_LATENCY_SECONDS: "Caller speech_stopped to first assistant audio delta",
+    TOOL_DURATION_SECONDS: "Tool handler execution time",
+    TRANSFER_DURATION_SECONDS: "Transfer request to final dial status",
+    DB_INSERT_SECONDS: "Call record insert latency",
+    CALLS_TOTAL: "Media streams accepted",
+    ACTIVE_CALLS: "Media streams currently open",
+    QUEUE_DEPTH: "Frames waiting in bridge queues, summed over open calls",
+    QUEUE_PEAK_DEPTH: "Deepest each call's bridge queue got",
+    QUEUE_DROPPED: "Frames dropped from bridge queues",
+    INBOUND_FRAMES: "Caller audio frames received, by forwarded / suppressed",
+    RECORDING_DROPPED: "Audio frames dropped from recordings (disk behind)",
+    JOURNAL_DEPTH: "Call records journaled but not yet in the database",
+    JOURNAL_FLUSH_SECONDS: "Journal batch insert latency",
+    JOURNAL_FLUSHED: "Journaled call records inserted into the database",
+    ADMIN_CACHE_REQUESTS: "Admin read requests, by hit / miss / not_modified",
+}
+metrics.set_buckets(QUEUE_PEAK_DEPTH, (1, 2, 5, 10, 25, 50, 100, 250, 500))
+
+
+def observe(name: str, seconds: float, **labels: str) -> None:
+    metrics.histogram(name, _HELP.get(name, ""), **labels).observe(seconds)
+
+
+def counter(name: str, **labels: str) -> Counter:
+    return metrics.counter(name, _HELP.get(name, ""), **labels)
+
+
+def gauge(name: str, **labels: str) -> Gauge:
+    return metrics.gauge(name, _HELP.get(name, ""), **labels)
+
+
+class CallLatency:
+    """Per-call stopwatch for time-to-greeting and caller-to-Sally turn latency."""
+
+    __slots__ = ("started", "_greeted", "_speech_stopped_at")
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self._greeted = False
+        self._speech_stopped_at: Optional[float] = None
+
+    def on_speech_stopped(self) -> None:
+        self._speech_stopped_at = time.monotonic()
+
+    def on_speech_started(self) -> None:
+        # Caller kept talking; the turn ends at the next speech_stopped
+        self._speech_stopped_at = None
+
+    def on_output_audio(self) -> None:
+        """Call for every assistant audio delta; cheap when nothing is pending."""
+        if self._greeted and self._speech_stopped_at is None:
+            return
+        now = time.monotonic()
+        if not self._greeted:
+            self._greeted = True
+            observe(FIRST_GREETING_SECONDS, now - self.started)
+        if self._speech_stopped_at is not None:
+            observe(TURN_LATENCY_SECONDS, now - self._speech_stopped_at)
+            self._speech_stopped_at = None
@@ -1,7 +1,32 @@
+"""Versioned, non-destructive schema migrations for post_call_analysis.
+
+Each migration runs once and is recorded in ``schema_version``.
+
+    python migration.py                 # apply pending migrations
+    python migration.py --dry-run       # print what would run
+    python migration.py --target 3      # stop after version 3
+    python migration.py status          # applied / pending versions
+    python migration.py rollups         # recount the /admin/stats rollups
+    python migration.py --reset         # DROP every table, then migrate (dev only)
+
+Ordinary migrations run in one transaction, with a lock_timeout so they
+never queue behind a long query while blocking everyone else. Index
+migrations use CREATE/DROP INDEX CONCURRENTLY, so inserts keep flowing
+while they build. Those statements can't run in a transaction, so they
+run one at a time in autocommit. Each is idempotent (IF [NOT] EXISTS), so
+a failed run can simply be repeated. An INVALID index left behind by a
+failed concurrent build is dropped and rebuilt. Concurrent runners take
+turns through a polled advisory lock (see ``acquire_runner_lock``).
+"""
+
 from __future__ import annotations
 
+import argparse
 import os
+import re
 import sys
+import time
+from typing import List, NamedTuple, Optional, Tuple
 
 import psycopg2
 from dotenv import load_dotenv
@@ -60,47 +85,408 @@ def clean_database(conn):
     print("Database cleaned successfully.\n")
 
 
-def create_tables(conn):
-    """Create the post_call_analysis table."""
-    print("Creating table...")
+# =======================
+# Migrations
+# =======================
+class Migration(NamedTuple):
+    version: int
+    name: str
+    statements: Tuple[str, ...]
+    # CREATE/DROP INDEX CONCURRENTLY: autocommit, one statement at a time
+    concurrent: bool = False
+
+
+# Baseline schema, as the original setup script created it
+BASE_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS post_call_analysis (
+        id SERIAL PRIMARY KEY,
+        caller_phone VARCHAR(20) NOT NULL,
+        call_date DATE NOT NULL,
+        call_time TIME,
+        task_type VARCHAR(100),
+        call_summary TEXT,
+        detail_info TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_caller_phone ON post_call_analysis (caller_phone)",
+    "CREATE INDEX IF NOT EXISTS idx_call_date ON post_call_analysis (call_date)",
+)
+
+# Rollups behind /admin/stats, kept current by statement-level triggers on
+# post_call_analysis. One upsert per bucket per INSERT statement, so a batch
+# of journaled records costs a handful of row updates, not one per record.
+ROLLUP_TABLES = (
+    """
+    CREATE TABLE IF NOT EXISTS call_stats_daily (
+        call_date DATE PRIMARY KEY,
+        calls BIGINT NOT NULL DEFAULT 0
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS call_stats_task_daily (
+        call_date DATE NOT NULL,
+        task_type VARCHAR(100) NOT NULL,
+        calls BIGINT NOT NULL DEFAULT 0,
+        PRIMARY KEY (call_date, task_type)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS call_stats_caller (
+        caller_phone VARCHAR(20) PRIMARY KEY,
+        calls BIGINT NOT NULL DEFAULT 0
+    )
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS idx_call_stats_caller_calls
+    ON call_stats_caller (calls DESC)
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS call_stats_hourly (
+        hour TIMESTAMP PRIMARY KEY,
+        calls BIGINT NOT NULL DEFAULT 0
+    )
+    """,
+)
+
+# Runs for both INSERT and DELETE; `changed` is the statement's transition table
+ROLLUP_FUNCTION = """
+    CREATE OR REPLACE FUNCTION call_stats_apply() RETURNS trigger AS $$
+    DECLARE
+        delta INTEGER := CASE TG_OP WHEN 'INSERT' THEN 1 ELSE -1 END;
+    BEGIN
+        INSERT INTO call_stats_daily AS s (call_date, calls)
+        SELECT call_date, delta * COUNT(*) FROM changed
+        GROUP BY call_date ORDER BY call_date
+        ON CONFLICT (call_date) DO UPDATE SET calls = s.calls + EXCLUDED.calls;
+
+        INSERT INTO call_stats_task_daily AS s (call_date, task_type, calls)
+        SELECT call_date, task_type, delta * COUNT(*) FROM changed
+        WHERE task_type IS NOT NULL
+        GROUP BY call_date, task_type ORDER BY call_date, task_type
+        ON CONFLICT (call_date, task_type)
+        DO UPDATE SET calls = s.calls + EXCLUDED.calls;
+
+        INSERT INTO call_stats_caller AS s (caller_phone, calls)
+        SELECT caller_phone, delta * COUNT(*) FROM changed
+        GROUP BY caller_phone ORDER BY caller_phone
+        ON CONFLICT (caller_phone) DO UPDATE SET calls = s.calls + EXCLUDED.calls;
+
+        INSERT INTO call_stats_hourly AS s (hour, calls)
+        SELECT date_trunc('hour', created_at), delta * COUNT(*) FROM changed
+        WHERE created_at IS NOT NULL
+        GROUP BY 1 ORDER BY 1
+        ON CONFLICT (hour) DO UPDATE SET calls = s.calls + EXCLUDED.calls;
+
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+"""
+
+# Created only when missing: replacing a trigger needs an ACCESS EXCLUSIVE lock
+ROLLUP_TRIGGERS = tuple(
+    f"""
+    DO $$ BEGIN
+        IF NOT EXISTS (
+            SELECT 1 FROM pg_trigger
+            WHERE tgname = 'call_stats_{op}'
+              AND tgrelid = 'post_call_analysis'::regclass
+        ) THEN
+            CREATE TRIGGER call_stats_{op} AFTER {op.upper()} ON post_call_analysis
+            REFERENCING {transition} TABLE AS changed
+            FOR EACH STATEMENT EXECUTE FUNCTION call_stats_apply();
+        END IF;
+    END $$
+    """
+    for op, transition in (("insert", "NEW"), ("delete", "OLD"))
+)
+
+# Recount every rollup from post_call_analysis (backfill / repair)
+ROLLUP_REBUILD = (
+    "LOCK TABLE post_call_analysis IN SHARE MODE",
+    # DELETE rather than TRUNCATE: dashboards keep reading the old counts
+    "DELETE FROM call_stats_daily",
+    "DELETE FROM call_stats_task_daily",
+    "DELETE FROM call_stats_caller",
+    "DELETE FROM call_stats_hourly",
+    """
+    INSERT INTO call_stats_daily (call_date, calls)
+    SELECT call_date, COUNT(*) FROM post_call_analysis GROUP BY call_date
+    """,
+    """
+    INSERT INTO call_stats_task_daily (call_date, task_type, calls)
+    SELECT call_date, task_type, COUNT(*) FROM post_call_analysis
+    WHERE task_type IS NOT NULL GROUP BY call_date, task_type
+    """,
+    """
+    INSERT INTO call_stats_caller (caller_phone, calls)
+    SELECT caller_phone, COUNT(*) FROM post_call_analysis GROUP BY caller_phone
+    """,
+    """
+    INSERT INTO call_stats_hourly (hour, calls)
+    SELECT date_trunc('hour', created_at), COUNT(*) FROM post_call_analysis
+    WHERE created_at IS NOT NULL GROUP BY 1
+    """,
+)
 
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "base schema", BASE_SCHEMA),
+    Migration(
+        2,
+        "recording_path and journal_id columns",
+        (
+            "ALTER TABLE post_call_analysis"
+            " ADD COLUMN IF NOT EXISTS recording_path TEXT",
+            "ALTER TABLE post_call_analysis ADD COLUMN IF NOT EXISTS journal_id UUID",
+        ),
+    ),
+    Migration(
+        3,
+        "unique journal_id for write-behind replays",
+        (
+            "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS idx_journal_id"
+            " ON post_call_analysis (journal_id)",
+        ),
+        concurrent=True,
+    ),
+    Migration(
+        4,
+        "stats rollups",
+        ROLLUP_TABLES + (ROLLUP_FUNCTION,) + ROLLUP_TRIGGERS + ROLLUP_REBUILD,
+    ),
+    Migration(
+        5,
+        "indexes for /admin/calls query shapes",
+        (
+            # newest-first pages and exports (keyset on created_at, id)
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_created_at_id"
+            " ON post_call_analysis (created_at DESC, id DESC)",
+            # ?task_type= and ?phone= filters, in the same order
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_task_type_created_at"
+            " ON post_call_analysis (task_type, created_at, id)",
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_caller_phone_created_at"
+            " ON post_call_analysis (caller_phone, created_at, id)",
+            # covered by idx_caller_phone_created_at
+            "DROP INDEX CONCURRENTLY IF EXISTS idx_caller_phone",
+        ),
+        concurrent=True,
+    ),
+    Migration(
+        6,
+        "created_at NOT NULL for keyset pagination",
+        (
+            # NULLs would sort first under DESC and never match a cursor.
+            # Backfill from the call's own date/time; there's no UPDATE
+            # trigger, so count the rows into the hourly rollup here.
+            """
+            WITH filled AS (
+                UPDATE post_call_analysis
+                SET created_at = call_date + COALESCE(call_time, TIME '00:00')
+                WHERE created_at IS NULL
+                RETURNING created_at
+            )
+            INSERT INTO call_stats_hourly AS s (hour, calls)
+            SELECT date_trunc('hour', created_at), COUNT(*) FROM filled
+            GROUP BY 1 ORDER BY 1
+            ON CONFLICT (hour) DO UPDATE SET calls = s.calls + EXCLUDED.calls
+            """,
+            "ALTER TABLE post_call_analysis ALTER COLUMN created_at SET NOT NULL",
+        ),
+    ),
+]
+
+SCHEMA_VERSION_TABLE = """
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        duration_ms INTEGER
+    )
+"""
+
+# Fails a migration instead of letting it queue for a lock (and block others)
+MIGRATION_LOCK_TIMEOUT = os.getenv("MIGRATION_LOCK_TIMEOUT", "5s")
+# Serializes concurrent runners (e.g. several instances deploying at once)
+_ADVISORY_LOCK_ID = 0x5E171E1  # arbitrary, fixed
+# How long a runner waits for another one to finish before giving up
+MIGRATION_WAIT_SEC = float(os.getenv("MIGRATION_WAIT_SEC", 600))
+_LOCK_POLL_SEC = 1.0
+
+_CREATE_INDEX_NAME = re.compile(r"INDEX CONCURRENTLY IF NOT EXISTS (\w+)", re.I)
+
+
+def applied_versions(conn) -> dict:
+    """version -> applied_at for every recorded migration."""
     with conn.cursor() as cur:
-        # Post Call Analysis Table (simplified)
-        cur.execute("""
-            CREATE TABLE post_call_analysis (
-                id SERIAL PRIMARY KEY,
-                caller_phone VARCHAR(20) NOT NULL,
-                call_date DATE NOT NULL,
-                call_time TIME,
-                task_type VARCHAR(100),
-                call_summary TEXT,
-                detail_info TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        cur.execute("SELECT to_regclass('schema_version')")
+        if cur.fetchone()[0] is None:
+            return {}
+        cur.execute("SELECT version, applied_at FROM schema_version")
+        return dict(cur.fetchall())
+
+
+def pending_migrations(conn, target: Optional[int] = None) -> List[Migration]:
+    done = applied_versions(conn)
+    return [
+        m
+        for m in MIGRATIONS
+        if m.version not in done and (target is None or m.version <= target)
+    ]
+
+
+def _drop_invalid_index(cur, statement: str) -> None:
+    """A failed CONCURRENTLY build leaves an INVALID index that IF NOT EXISTS
+    would keep forever; drop it so the build is retried."""
+    match = _CREATE_INDEX_NAME.search(statement)
+    if not match:
+        return
+    cur.execute(
+        """
+        SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE c.relname = %s AND NOT i.indisvalid
+        """,
+        (match.group(1),),
+    )
+    if cur.fetchone():
+        print(f"    Dropping invalid index {match.group(1)} from a failed build")
+        cur.execute(
+            sql.SQL("DROP INDEX CONCURRENTLY IF EXISTS {}").format(
+                sql.Identifier(match.group(1))
             )
-        """)
-        print("  Created table: post_call_analysis")
+        )
 
-        # Create indexes for common query fields
-        print("\nCreating indexes...")
 
-        cur.execute("""
-            CREATE INDEX idx_caller_phone ON post_call_analysis (caller_phone)
-        """)
-        print("  Created index: idx_caller_phone")
+def apply_migration(conn, migration: Migration) -> None:
+    started = time.monotonic()
+    print(f"  Applying {migration.version}: {migration.name}")
 
-        cur.execute("""
-            CREATE INDEX idx_call_date ON post_call_analysis (call_date)
-        """)
-        print("  Created index: idx_call_date")
+    if migration.concurrent:
+        conn.autocommit = True
+        try:
+            with conn.cursor() as cur:
+                for statement in migration.statements:
+                    _drop_invalid_index(cur, statement)
+                    cur.execute(statement)
+        finally:
+            conn.autocommit = False
+    else:
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT set_config('lock_timeout', %s, true)",
+                (MIGRATION_LOCK_TIMEOUT,),
+            )
+            for statement in migration.statements:
+                cur.execute(statement)
 
-        conn.commit()
+    duration_ms = int((time.monotonic() - started) * 1000)
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            INSERT INTO schema_version (version, name, duration_ms)
+            VALUES (%s, %s, %s)
+            """,
+            (migration.version, migration.name, duration_ms),
+        )
+    conn.commit()
+    print(f"    Done in {duration_ms} ms")
+
+
+def migrate(conn, target: Optional[int] = None, dry_run: bool = False) -> int:
+    """Apply pending migrations in order; returns how many ran (or would run)."""
+    pending = pending_migrations(conn, target)
+    if not pending:
+        print("Schema is up to date.")
+        return 0
+
+    if dry_run:
+        print(f"{len(pending)} pending migration(s) (dry run, nothing applied):")
+        for m in pending:
+            mode = "autocommit, CONCURRENTLY" if m.concurrent else "one transaction"
+            print(f"\n-- {m.version}: {m.name} ({mode})")
+            for statement in m.statements:
+                print(_dedent(statement) + ";")
+        return len(pending)
+
+    with conn.cursor() as cur:
+        cur.execute(SCHEMA_VERSION_TABLE)
+    conn.commit()
+    for m in pending:
+        apply_migration(conn, m)
+    return len(pending)
+
+
+def _dedent(statement: str) -> str:
+    lines = statement.strip("\n").splitlines()
+    indent = min(len(line) - len(line.lstrip()) for line in lines if line.strip())
+    return "\n".join(line[indent:] for line in lines).strip()
 
-    print("\nTable created successfully!")
 
+def acquire_runner_lock(conn, wait_sec: float = MIGRATION_WAIT_SEC) -> bool:
+    """Take the session advisory lock that serializes runners.
 
-def run_migration():
+    Polls pg_try_advisory_lock in autocommit instead of blocking in
+    pg_advisory_lock: a waiting runner must not hold a transaction or
+    snapshot, or the other runner's CREATE INDEX CONCURRENTLY waits for it
+    while it waits for the lock.
+    """
+    conn.autocommit = True
+    deadline = time.monotonic() + wait_sec
+    waiting = False
+    try:
+        with conn.cursor() as cur:
+            while True:
+                cur.execute("SELECT pg_try_advisory_lock(%s)", (_ADVISORY_LOCK_ID,))
+                if cur.fetchone()[0]:
+                    return True
+                if time.monotonic() >= deadline:
+                    return False
+                if not waiting:
+                    print("Another migration is running; waiting for it...")
+                    waiting = True
+                time.sleep(_LOCK_POLL_SEC)
+    finally:
+        conn.autocommit = False
+
+
+def print_status(conn) -> None:
+    done = applied_versions(conn)
+    for m in MIGRATIONS:
+        state = f"applied {done[m.version]}" if m.version in done else "pending"
+        print(f"  {m.version:>3}  {m.name:<45} {state}")
+
+
+def rebuild_rollups(conn) -> None:
+    """Recount the /admin/stats rollups from post_call_analysis.
+
+    The recount holds a SHARE lock so no insert lands between the recount and
+    the commit; dashboards keep reading the old counts until then.
+    """
+    print("Recounting stats rollups...")
+    with conn.cursor() as cur:
+        for statement in ROLLUP_REBUILD:
+            cur.execute(statement)
+        cur.execute("SELECT COALESCE(SUM(calls), 0) FROM call_stats_daily")
+        total = cur.fetchone()[0]
+    conn.commit()
+    print(f"  Rollups ready ({total} calls counted)")
+
+
+def run_migration(argv: Optional[List[str]] = None):
     """Main migration function."""
+    parser = argparse.ArgumentParser(description="Princeton Sentinel schema migrations")
+    parser.add_argument(
+        "command", nargs="?", default="up", choices=("up", "status", "rollups")
+    )
+    parser.add_argument("--dry-run", action="store_true", help="print, don't apply")
+    parser.add_argument("--target", type=int, help="stop after this version")
+    parser.add_argument(
+        "--reset", action="store_true", help="drop every table first (dev only)"
+    )
+    args = parser.parse_args(argv)
+
     print("=" * 50)
     print("Starting Database Migration")
     print("=" * 50 + "\n")
@@ -108,8 +494,22 @@ def run_migration():
     conn = get_db_connection()
 
     try:
-        clean_database(conn)
-        create_tables(conn)
+        if args.command == "status":
+            print_status(conn)
+            return
+        if args.command == "rollups":
+            rebuild_rollups(conn)
+            return
+
+        if not acquire_runner_lock(conn):
+            print(
+                f"\nAnother migration still held the lock after "
+                f"{MIGRATION_WAIT_SEC:g}s; not migrating."
+            )
+            sys.exit(1)
+        if args.reset and not args.dry_run:
+            clean_database(conn)
+        migrate(conn, target=args.target, dry_run=args.dry_run)
 
         print("\n" + "=" * 50)
         print("Migration completed successfully!")
@@ -0,0 +1,117 @@
+# playback.py
+"""Twilio playback tracking with coalesced marks.
+
+Twilio echoes a ``mark`` back once every media frame sent before it has been
+played to the caller. One mark after every audio delta would double outbound
+traffic, so marks are coalesced: one per ``MARK_INTERVAL_MS`` of audio,
+plus one at every assistant item boundary. Each outstanding mark remembers
+the item it belongs to and how far into that item's audio it sits, so
+acknowledgements give the exact number of milliseconds the caller heard.
+"""
+
+import os
+from collections import OrderedDict, deque
+from typing import Deque, NamedTuple, Optional
+
+MARK_INTERVAL_MS = int(os.getenv("MARK_INTERVAL_MS", 200))
+ULAW_BYTES_PER_MS = 8  # 8 kHz, 1 byte per sample
+_MAX_TRACKED_ITEMS = 16
+
+
+def b64_audio_ms(payload_b64: str) -> float:
+    """Duration of a base64 μ-law payload without decoding it."""
+    n = len(payload_b64)
+    padding = n - len(payload_b64.rstrip("="))
+    return (n * 3 // 4 - padding) / ULAW_BYTES_PER_MS
+
+
+class _PendingMark(NamedTuple):
+    name: str
+    item_id: Optional[str]
+    end_ms: float  # audio sent for item_id up to and including this mark
+
+
+class PlaybackTracker:
+    """Per-stream bookkeeping of sent vs. played assistant audio."""
+
+    def __init__(self, mark_interval_ms: float = MARK_INTERVAL_MS):
+        self.mark_interval_ms = mark_interval_ms
+        self._pending: Deque[_PendingMark] = deque()
+        self._played: "OrderedDict[str, float]" = OrderedDict()
+        self._seq = 0
+        self.item_id: Optional[str] = None
+        self.sent_ms = 0.0  # audio sent for the current item
+        self._unmarked_ms = 0.0
+
+    # ---------- outbound ----------
+    def begin_audio(self, item_id: Optional[str]) -> Optional[str]:
+        """Call before sending a delta; returns a mark closing the previous item."""
+        if item_id == self.item_id:
+            return None
+        boundary = self.flush()
+        self.item_id = item_id
+        self.sent_ms = 0.0
+        return boundary
+
+    def audio_sent(self, payload_b64: str) -> Optional[str]:
+        """Call after sending a delta; returns a mark once enough audio is unmarked."""
+        ms = b64_audio_ms(payload_b64)
+        self.sent_ms += ms
+        self._unmarked_ms += ms
+        if self._unmarked_ms >= self.mark_interval_ms:
+            return self.flush()
+        return None
+
+    def flush(self) -> Optional[str]:
+        """Mark any audio sent since the last mark (e.g. at the end of a response)."""
+        if self._unmarked_ms <= 0:
+            return None
+        self._seq += 1
+        name = f"m{self._seq}"
+        self._pending.append(_PendingMark(name, self.item_id, self.sent_ms))
+        self._unmarked_ms = 0.0
+        return name
+
+    # ---------- inbound ----------
+    def on_mark(self, name: str) -> None:
+        """Twilio played everything up to `name`."""
+        pending = self._pending
+        if not any(m.name == name for m in pending):
+            return  # stale mark (e.g. echoed back after a clear)
+        while pending:
+            mark = pending.popleft()
+            if mark.item_id is not None:
+                self._record_played(mark.item_id, mark.end_ms)
+            if mark.name == name:
+                return
+
+    def clear(self) -> None:
+        """Twilio's buffer was cleared: forget outstanding marks and start fresh."""
+        self._pending.clear()
+        self._unmarked_ms = 0.0
+        self.item_id = None
+        self.sent_ms = 0.0
+
+    def reset(self) -> None:
+        self.clear()
+        self._played.clear()
+
+    # ---------- queries ----------
+    @property
+    def pending_marks(self) -> int:
+        return len(self._pending)
+
+    @property
+    def is_playing(self) -> bool:
+        """True while Twilio still has unacknowledged assistant audio buffered."""
+        return bool(self._pending) or self._unmarked_ms > 0
+
+    def played_ms(self, item_id: Optional[str]) -> float:
+        """Milliseconds of item_id that Twilio has confirmed as played."""
+        return self._played.get(item_id, 0.0) if item_id else 0.0
+
+    def _record_played(self, item_id: str, end_ms: float) -> None:
+        self._played[item_id] = end_ms
+        self._played.move_to_end(item_id)
+        while len(self._played) > _MAX_TRACKED_ITEMS:
+            self._played.popitem(last=False)
@@ -0,0 +1,236 @@
+# realtime_pool.py
+"""Pool of pre-connected, pre-initialized OpenAI Realtime sessions.
+
+Opening the Realtime WebSocket (DNS + TLS + handshake) and applying the
+session config used to happen after Twilio connected the caller, so it all
+landed on the caller's first second. The pool keeps a few sessions ready:
+
+- each warm session is connected and has its session.update acknowledged
+- sessions idle longer than REALTIME_POOL_MAX_IDLE_SEC are closed and replaced
+- target size follows the recent call rate: enough sessions to cover the
+  calls expected while a replacement warms up, within [min, max]
+- a background task refills the pool after every checkout
+
+``session()`` falls back to a cold connect when the pool is empty.
+"""
+
+import asyncio
+import math
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Deque, Optional, Set
+
+import websockets
+
+from app_instance import OPENAI_API_KEY, OPENAI_REALTIME_URL, TEMPERATURE
+from codec import loads
+from logger import get_logger
+from session_setup import initialize_session
+
+log = get_logger("realtime_pool")
+
+REALTIME_POOL_ENABLED = os.getenv("REALTIME_POOL_ENABLED", "true").lower() != "false"
+REALTIME_POOL_MIN_SIZE = int(os.getenv("REALTIME_POOL_MIN_SIZE", 1))
+REALTIME_POOL_MAX_SIZE = int(os.getenv("REALTIME_POOL_MAX_SIZE", 8))
+REALTIME_POOL_MAX_IDLE_SEC = float(os.getenv("REALTIME_POOL_MAX_IDLE_SEC", 300))
+# How far back call arrivals count towards the rate estimate
+REALTIME_POOL_RATE_WINDOW_SEC = 300.0
+_WARMUP_TIMEOUT_SEC = 10.0
+
+
+async def connect_realtime():
+    """Open a Realtime WebSocket (no session config sent yet)."""
+    sep = "&" if "?" in OPENAI_REALTIME_URL else "?"
+    return await websockets.connect(
+        f"{OPENAI_REALTIME_URL}{sep}temperature={TEMPERATURE}",
+        extra_headers={"Authorization": f"Bearer {OPENAI_API_KEY}"},
+    )
+
+
+class _WarmSession:
+    def __init__(self, ws):
+        self.ws = ws
+        self.ready_at = time.monotonic()
+
+
+class RealtimeSessionPool:
+    def __init__(
+        self,
+        min_size: int = REALTIME_POOL_MIN_SIZE,
+        max_size: int = REALTIME_POOL_MAX_SIZE,
+        max_idle_sec: float = REALTIME_POOL_MAX_IDLE_SEC,
+        rate_window_sec: float = REALTIME_POOL_RATE_WINDOW_SEC,
+    ):
+        self.min_size = max(0, min_size)
+        self.max_size = max(self.min_size, max_size)
+        self.max_idle_sec = max_idle_sec
+        self.rate_window_sec = rate_window_sec
+
+        self._idle: Deque[_WarmSession] = deque()  # newest on the right
+        self._warming: Set[asyncio.Task] = set()
+        self._arrivals: Deque[float] = deque()
+        self._warmup_sec = 2.0  # EWMA of observed warm-up time
+        self._wakeup = asyncio.Event()
+        self._refill_task: Optional[asyncio.Task] = None
+        self._closing = False
+
+        # stats
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.warmup_failures = 0
+
+    # ---------- lifecycle ----------
+    async def start(self) -> None:
+        if self._refill_task is None:
+            self._closing = False
+            self._refill_task = asyncio.create_task(self._refill_loop())
+
+    async def close(self) -> None:
+        # on 3.11 wait_for swallows a cancel that races a wakeup, so the
+        # refill loop also checks this flag before going round again
+        self._closing = True
+        task, self._refill_task = self._refill_task, None
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        for t in list(self._warming):
+            t.cancel()
+        await asyncio.gather(*self._warming, return_exceptions=True)
+        while self._idle:
+            await self._discard(self._idle.pop())
+
+    # ---------- checkout ----------
+    @asynccontextmanager
+    async def session(self):
+        """Yield an initialized Realtime socket (warm if possible), closed on exit."""
+        ws = await self.acquire()
+        try:
+            yield ws
+        finally:
+            try:
+                await ws.close()
+            except Exception:
+                pass
+
+    async def acquire(self):
+        now = time.monotonic()
+        self._arrivals.append(now)
+        self._wakeup.set()
+
+        while self._idle:
+            warm = self._idle.pop()
+            if self._is_fresh(warm, now):
+                self.hits += 1
+                return warm.ws
+            self.expired += 1
+            await self._discard(warm)
+
+        self.misses += 1
+        log.info("Realtime pool empty; connecting cold")
+        ws = await connect_realtime()
+        await initialize_session(ws, greet=False)
+        return ws
+
+    # ---------- sizing ----------
+    def call_rate(self, now: Optional[float] = None) -> float:
+        """Calls per second over the recent window."""
+        now = time.monotonic() if now is None else now
+        while self._arrivals and self._arrivals[0] < now - self.rate_window_sec:
+            self._arrivals.popleft()
+        return len(self._arrivals) / self.rate_window_sec
+
+    def target_size(self) -> int:
+        # Calls expected while one replacement warms up, with 2x headroom
+        expected = self.call_rate() * self._warmup_sec * 2
+        return max(self.min_size, min(self.max_size, math.ceil(expected)))
+
+    def stats(self) -> dict:
+        return {
+            "idle": len(self._idle),
+            "warming": len(self._warming),
+            "target": self.target_size(),
+            "calls_per_min": round(self.call_rate() * 60, 2),
+            "warmup_ms": round(self._warmup_sec * 1000, 1),
+            "hits": self.hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "warmup_failures": self.warmup_failures,
+        }
+
+    # ---------- refill ----------
+    def _is_fresh(self, warm: _WarmSession, now: float) -> bool:
+        return (
+            now - warm.ready_at < self.max_idle_sec and warm.ws.state.name == "OPEN"
+        )
+
+    async def _discard(self, warm: _WarmSession) -> None:
+        try:
+            await warm.ws.close()
+        except Exception:
+            pass
+
+    async def _refill_loop(self) -> None:
+        while not self._closing:
+            now = time.monotonic()
+            # retire sessions that sat idle too long or were dropped by the server
+            for warm in [w for w in self._idle if not self._is_fresh(w, now)]:
+                self._idle.remove(warm)
+                self.expired += 1
+                await self._discard(warm)
+
+            missing = self.target_size() - len(self._idle) - len(self._warming)
+            for _ in range(max(0, missing)):
+                task = asyncio.create_task(self._warm_one())
+                self._warming.add(task)
+                task.add_done_callback(self._warming.discard)
+
+            self._wakeup.clear()
+            try:
+                # re-check at least a few times per idle period
+                await asyncio.wait_for(
+                    self._wakeup.wait(), timeout=min(30.0, self.max_idle_sec / 4)
+                )
+            except asyncio.TimeoutError:
+                pass
+
+    async def _warm_one(self) -> None:
+        started = time.monotonic()
+        ws = None
+        try:
+            ws = await connect_realtime()
+            await initialize_session(ws, greet=False)
+            await asyncio.wait_for(self._await_session_updated(ws), _WARMUP_TIMEOUT_SEC)
+        except asyncio.CancelledError:
+            if ws is not None:
+                await ws.close()
+            raise
+        except Exception as e:
+            self.warmup_failures += 1
+            log.warning("Realtime pool warm-up failed: %s", e)
+            if ws is not None:
+                await ws.close()
+            await asyncio.sleep(1.0)  # don't spin against an outage
+            self._wakeup.set()
+            return
+
+        elapsed = time.monotonic() - started
+        self._warmup_sec = 0.8 * self._warmup_sec + 0.2 * elapsed
+        self._idle.append(_WarmSession(ws))
+
+    @staticmethod
+    async def _await_session_updated(ws) -> None:
+        async for message in ws:
+            event = loads(message)
+            if event.get("type") == "session.updated":
+                return
+            if event.get("type") == "error":
+                raise RuntimeError(event.get("error", {}).get("message", "error"))
+
+
+realtime_pool = RealtimeSessionPool(
+    min_size=REALTIME_POOL_MIN_SIZE if REALTIME_POOL_ENABLED else 0,
+    max_size=REALTIME_POOL_MAX_SIZE if REALTIME_POOL_ENABLED else 0,
+)
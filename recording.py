@@ -0,0 +1,377 @@
+# recording.py
+"""Call recording that stays off the event loop.
+
+``CallRecorder`` is the tap in the media bridge. Each caller frame and each
+assistant audio delta is decoded and copied into a preallocated per-call
+``AudioRing``, which costs about a microsecond per frame. One background
+thread, ``RecordingWriter``, drains every ring a few times a second and
+writes the audio to disk.
+
+Each call becomes one stereo 8 kHz μ-law WAV file: the caller on the left,
+Sally on the right, aligned on the caller's timeline. Sally's audio is
+placed where Twilio would play it, right after whatever is already queued.
+When a barge-in clears Twilio's buffer, the unplayed remainder is dropped.
+
+Memory per call is bounded by ``RECORDING_BUFFER_SEC``. If the disk falls
+behind and a ring fills up, frames are dropped and counted rather than
+stalling the bridge. The gap is recorded as silence, so the two channels
+stay aligned. Drop counts go back to the event loop for the metrics.
+"""
+
+import asyncio
+import binascii
+import datetime
+import os
+import struct
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from logger import get_logger
+from metrics import RECORDING_DROPPED, counter
+
+log = get_logger("recording")
+
+CALL_RECORDING_ENABLED = (
+    os.getenv("CALL_RECORDING_ENABLED", "false").lower() == "true"
+)
+RECORDING_DIR = os.getenv("RECORDING_DIR", "recordings")
+# Audio each call may buffer before the writer catches up
+RECORDING_BUFFER_SEC = float(os.getenv("RECORDING_BUFFER_SEC", 10))
+RECORDING_FLUSH_SEC = 0.2
+
+SAMPLE_RATE = 8000  # μ-law: one byte per sample
+ULAW_SILENCE = b"\xff"
+# Sally can run ahead of the caller by a whole response; cap what we hold
+_MAX_AHEAD_BYTES = 120 * SAMPLE_RATE
+
+# Ring record kinds
+CALLER = 0
+ASSISTANT = 1
+CLEAR = 2
+
+_HEADER = struct.Struct("<BIH")  # kind, position (samples), payload length
+_MAX_PAYLOAD = 0xFFFF
+
+
+class AudioRing:
+    """Preallocated byte ring of (kind, position, payload) records.
+
+    One producer (the event loop) and one consumer (the writer thread).
+    ``put`` copies into the preallocated buffer and never waits on the
+    writer. A record that doesn't fit is dropped and counted.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._buf = bytearray(capacity)
+        self._head = 0  # next write offset
+        self._tail = 0  # next read offset
+        self._used = 0
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    def put(self, kind: int, position: int, payload: bytes = b"") -> bool:
+        size = _HEADER.size + len(payload)
+        with self._lock:
+            if self.capacity - self._used < size:
+                self.dropped += 1
+                return False
+            head = self._head
+        # the consumer never reads past _used, so these bytes are ours
+        offset = self._write(head, _HEADER.pack(kind, position, len(payload)))
+        offset = self._write(offset, payload)
+        with self._lock:
+            self._head = offset
+            self._used += size
+        return True
+
+    def _write(self, offset: int, data: bytes) -> int:
+        end = offset + len(data)
+        if end <= self.capacity:
+            self._buf[offset:end] = data
+            return end % self.capacity
+        split = self.capacity - offset
+        self._buf[offset:] = data[:split]
+        self._buf[: len(data) - split] = data[split:]
+        return len(data) - split
+
+    def drain(self) -> List[Tuple[int, int, bytes]]:
+        """Everything written so far, oldest first."""
+        with self._lock:
+            tail, used = self._tail, self._used
+        if not used:
+            return []
+        end = tail + used
+        if end <= self.capacity:
+            data = bytes(self._buf[tail:end])
+        else:
+            data = bytes(self._buf[tail:]) + bytes(self._buf[: end - self.capacity])
+        with self._lock:
+            self._tail = end % self.capacity
+            self._used -= used
+
+        records = []
+        offset = 0
+        while offset < used:
+            kind, position, length = _HEADER.unpack_from(data, offset)
+            offset += _HEADER.size
+            records.append((kind, position, data[offset : offset + length]))
+            offset += length
+        return records
+
+
+class CallRecorder:
+    """Per-call recording tap. Methods run on the event loop and never block."""
+
+    def __init__(self, path: str, buffer_sec: float = RECORDING_BUFFER_SEC):
+        self.path = path
+        # both channels plus record headers (one per 20 ms frame)
+        capacity = int(buffer_sec * SAMPLE_RATE * 2 * 1.05) + 1024
+        self.ring = AudioRing(capacity)
+        self.closed = False
+        self._caller_pos = 0  # samples of caller audio seen
+        self._assistant_end = 0  # where Sally's queued audio ends
+
+        # writer-thread state
+        self._file = None
+        self._failed = False
+        self._committed = 0  # samples written to disk
+        self._pending = bytearray()  # Sally's audio at/after _committed
+        self._dropped_ahead = 0  # Sally's chunks too far ahead to hold
+
+    # ---- event loop side ----
+    def caller(self, payload_b64: str) -> None:
+        ulaw = binascii.a2b_base64(payload_b64)
+        self.ring.put(CALLER, self._caller_pos, ulaw)
+        self._caller_pos += len(ulaw)
+
+    def assistant(self, delta_b64: str) -> None:
+        ulaw = binascii.a2b_base64(delta_b64)
+        position = max(self._caller_pos, self._assistant_end)
+        self._assistant_end = position + len(ulaw)
+        for start in range(0, len(ulaw), _MAX_PAYLOAD):
+            chunk = ulaw[start : start + _MAX_PAYLOAD]
+            self.ring.put(ASSISTANT, position + start, chunk)
+
+    def assistant_cleared(self) -> None:
+        """Twilio dropped Sally's unplayed audio (barge-in)."""
+        self._assistant_end = self._caller_pos
+        self.ring.put(CLEAR, self._caller_pos)
+
+    def close(self) -> None:
+        self.closed = True
+
+    # ---- writer thread side ----
+    def write_pending(self) -> None:
+        records = self.ring.drain()
+        if self._failed or not records:
+            return
+        try:
+            if self._file is None:
+                self._open()
+            for kind, position, payload in records:
+                if kind == CALLER:
+                    self._write_caller(position, payload)
+                elif kind == ASSISTANT:
+                    self._queue_assistant(position, payload)
+                else:
+                    del self._pending[max(0, position - self._committed) :]
+        except OSError as e:
+            self._failed = True
+            log.error("Recording to %s failed: %s", self.path, e)
+
+    def finish(self) -> Dict[str, int]:
+        """Drain, fix up the WAV header and close. Sally's unplayed tail is dropped."""
+        self.write_pending()
+        if self._file is not None:
+            try:
+                _finalize_wav(self._file, self._committed)
+            except OSError as e:
+                self._failed = True
+                log.error("Recording to %s failed: %s", self.path, e)
+            try:
+                self._file.close()  # flushes buffered audio: can fail too
+            except OSError as e:
+                self._failed = True
+                log.error("Recording to %s failed: %s", self.path, e)
+        dropped = self.ring.dropped + self._dropped_ahead
+        return {
+            "seconds": self._committed // SAMPLE_RATE,
+            "dropped_frames": dropped,
+            "failed": int(self._failed),
+        }
+
+    def _open(self) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._file = open(self.path, "wb")
+        self._file.write(_wav_header(0))
+
+    def _write_caller(self, position: int, ulaw: bytes) -> None:
+        if position > self._committed:  # caller frames were dropped
+            self._write_frames(ULAW_SILENCE * (position - self._committed))
+        elif position < self._committed:
+            ulaw = ulaw[self._committed - position :]
+        self._write_frames(ulaw)
+
+    def _write_frames(self, caller: bytes) -> None:
+        n = len(caller)
+        assistant = self._pending[:n]
+        del self._pending[:n]
+        if len(assistant) < n:
+            assistant += ULAW_SILENCE * (n - len(assistant))
+        out = bytearray(2 * n)
+        out[0::2] = caller
+        out[1::2] = assistant
+        self._file.write(out)
+        self._committed += n
+
+    def _queue_assistant(self, position: int, ulaw: bytes) -> None:
+        offset = position - self._committed
+        if offset < 0:
+            ulaw = ulaw[-offset:]
+            offset = 0
+        if offset + len(ulaw) > _MAX_AHEAD_BYTES:
+            self._dropped_ahead += 1
+            return
+        if offset > len(self._pending):
+            self._pending += ULAW_SILENCE * (offset - len(self._pending))
+        self._pending[offset : offset + len(ulaw)] = ulaw
+
+
+# =======================
+# WAV (stereo μ-law)
+# =======================
+_WAVE_FORMAT_MULAW = 7
+_CHANNELS = 2
+_HEADER_BYTES = 58  # RIFF + fmt (18) + fact + data headers
+
+
+def _wav_header(frames: int) -> bytes:
+    data_bytes = frames * _CHANNELS
+    return b"".join(
+        (
+            b"RIFF",
+            struct.pack("<I", _HEADER_BYTES - 8 + data_bytes),
+            b"WAVE",
+            b"fmt ",
+            struct.pack(
+                "<IHHIIHHH",
+                18,
+                _WAVE_FORMAT_MULAW,
+                _CHANNELS,
+                SAMPLE_RATE,
+                SAMPLE_RATE * _CHANNELS,
+                _CHANNELS,  # block align: one byte per channel
+                8,
+                0,
+            ),
+            b"fact",
+            struct.pack("<II", 4, frames),
+            b"data",
+            struct.pack("<I", data_bytes),
+        )
+    )
+
+
+def _finalize_wav(f, frames: int) -> None:
+    f.seek(0)
+    f.write(_wav_header(frames))
+
+
+# =======================
+# Background writer
+# =======================
+class RecordingWriter:
+    """One thread that drains every active recorder's ring to disk."""
+
+    def __init__(self, flush_sec: float = RECORDING_FLUSH_SEC):
+        self.flush_sec = flush_sec
+        self._recorders: List[CallRecorder] = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = False
+        self._thread: Optional[threading.Thread] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def add(self, recorder: CallRecorder) -> None:
+        """Start writing a recorder's audio. Called from the event loop."""
+        self._loop = asyncio.get_running_loop()
+        with self._lock:
+            self._recorders.append(recorder)
+            if self._thread is None:
+                self._stopping = False
+                self._thread = threading.Thread(
+                    target=self._run, name="recording-writer", daemon=True
+                )
+                self._thread.start()
+
+    def stop(self) -> None:
+        """Finish every open recording and stop the thread."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+            self._stopping = True
+        if thread is not None:
+            self._wake.set()
+            thread.join(timeout=10)
+
+    def _run(self) -> None:
+        while True:
+            self._wake.wait(self.flush_sec)
+            self._wake.clear()
+            with self._lock:
+                recorders = list(self._recorders)
+                stopping = self._stopping
+            for recorder in recorders:
+                # one broken recording must not take the writer down for everyone
+                try:
+                    self._service(recorder, stopping)
+                except Exception:
+                    log.exception("Recording to %s failed", recorder.path)
+                    with self._lock:
+                        if recorder in self._recorders:
+                            self._recorders.remove(recorder)
+            if stopping:
+                return
+
+    def _service(self, recorder: CallRecorder, stopping: bool) -> None:
+        if not (recorder.closed or stopping):
+            recorder.write_pending()
+            return
+        stats = recorder.finish()
+        with self._lock:
+            self._recorders.remove(recorder)
+        if stats["dropped_frames"]:
+            self._count_dropped(stats["dropped_frames"])
+        log.info(
+            "Recording saved",
+            extra={"fields": {"path": recorder.path, **stats}},
+        )
+
+    def _count_dropped(self, frames: int) -> None:
+        # the metrics registry belongs to the event loop
+        try:
+            self._loop.call_soon_threadsafe(_count_dropped, frames)
+        except RuntimeError:  # loop already closed at shutdown
+            pass
+
+
+def _count_dropped(frames: int) -> None:
+    counter(RECORDING_DROPPED).inc(frames)
+
+
+recording_writer = RecordingWriter()
+
+
+def recording_path(call_sid: str, when: Optional[datetime.datetime] = None) -> str:
+    when = when or datetime.datetime.now()
+    name = f"{when:%H%M%S}-{call_sid or 'unknown'}.wav"
+    return os.path.join(RECORDING_DIR, f"{when:%Y-%m-%d}", name)
+
+
+def start_recording(call_sid: str) -> Optional[CallRecorder]:
+    """A recorder for this call, or None when recording is disabled."""
+    if not CALL_RECORDING_ENABLED:
+        return None
+    recorder = CallRecorder(recording_path(call_sid))
+    recording_writer.add(recorder)
+    return recorder
@@ -0,0 +1,128 @@
+# response_cache.py
+"""In-process cache for the admin read endpoints.
+
+Dashboards poll /admin/stats, /admin/calls and /debug/records far more
+often than calls come in. Each cached response is kept for
+``ADMIN_CACHE_TTL_SEC``, and the least recently used entries are evicted
+past ``ADMIN_CACHE_MAX_ENTRIES``. Keys are the path plus the sorted,
+non-empty query parameters.
+
+Every call record write in this process (``invalidate()``) empties the
+cache. Writes from other workers show up once the TTL runs out.
+
+Every response carries a strong ETag, a hash of its body. A request whose
+``If-None-Match`` matches gets a bodiless 304.
+"""
+
+import hashlib
+import os
+import time
+import urllib.parse
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from fastapi import Request, Response
+
+from codec import dumps
+from metrics import ADMIN_CACHE_REQUESTS, counter
+
+ADMIN_CACHE_TTL_SEC = float(os.getenv("ADMIN_CACHE_TTL_SEC", 10))
+ADMIN_CACHE_MAX_ENTRIES = int(os.getenv("ADMIN_CACHE_MAX_ENTRIES", 256))
+
+
+def etag_for(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """RFC 9110 weak comparison of an If-None-Match header against our ETag."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(
+        tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(",")
+    )
+
+
+class ResponseCache:
+    """TTL + LRU cache of serialized JSON responses."""
+
+    def __init__(
+        self,
+        ttl_sec: float = ADMIN_CACHE_TTL_SEC,
+        max_entries: int = ADMIN_CACHE_MAX_ENTRIES,
+    ):
+        self.ttl_sec = ttl_sec
+        self.max_entries = max_entries
+        # key -> (expires_at, body, etag); least recently used first
+        self._entries: "OrderedDict[str, Tuple[float, bytes, str]]" = OrderedDict()
+        # bumped by invalidate(); a result computed across a bump isn't stored
+        self.generation = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def key(request: Request) -> str:
+        params = sorted((k, v) for k, v in request.query_params.multi_items() if v)
+        return request.url.path + "?" + urllib.parse.urlencode(params)
+
+    def get(self, key: str) -> Optional[Tuple[bytes, str]]:
+        item = self._entries.get(key)
+        if item is None:
+            return None
+        expires_at, body, etag = item
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return body, etag
+
+    def put(self, key: str, body: bytes, etag: str) -> None:
+        now = time.monotonic()
+        self._entries[key] = (now + self.ttl_sec, body, etag)
+        self._entries.move_to_end(key)
+        entries = self._entries
+        while entries:
+            oldest, (expires_at, _, _) = next(iter(entries.items()))
+            if expires_at > now and len(entries) <= self.max_entries:
+                break
+            del entries[oldest]
+
+    def invalidate(self) -> None:
+        """Drop everything; called whenever call records are written."""
+        self.generation += 1
+        self._entries.clear()
+
+    async def serve(
+        self, request: Request, compute: Callable[[], Awaitable[Dict[str, Any]]]
+    ) -> Response:
+        """Respond from the cache, or run ``compute`` and cache an ok result."""
+        key = self.key(request)
+        cached = self.get(key) if self.ttl_sec > 0 else None
+        if cached is not None:
+            body, etag = cached
+            result = "hit"
+        else:
+            generation = self.generation
+            payload = await compute()
+            body = dumps(payload).encode()
+            etag = etag_for(body)
+            result = "miss"
+            if (
+                self.ttl_sec > 0
+                and payload.get("ok")
+                and generation == self.generation
+            ):
+                self.put(key, body, etag)
+
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            counter(ADMIN_CACHE_REQUESTS, result="not_modified").inc()
+            return Response(status_code=304, headers=headers)
+        counter(ADMIN_CACHE_REQUESTS, result=result).inc()
+        return Response(body, media_type="application/json", headers=headers)
+
+
+admin_cache = ResponseCache()
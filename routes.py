@@ -1,11 +1,36 @@
+import base64
+import csv
 import datetime
+import io
+from typing import Any, Dict, List, Optional, Tuple
 
+import psycopg2.errors
 from fastapi import Request
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import (
+    HTMLResponse,
+    JSONResponse,
+    PlainTextResponse,
+    StreamingResponse,
+)
 from twilio.twiml.voice_response import Connect, Stream, VoiceResponse
 
 from app_instance import app
-from db_utils import get_call_records, get_db_connection, insert_call_record
+from call_journal import call_journal
+from codec import dumps, loads
+from db_utils import (
+    get_call_records,
+    get_db_pool_stats,
+    insert_call_record,
+    row_to_record,
+    run_db,
+    stream_query,
+)
+from logger import get_logger
+from metrics import metrics
+from realtime_pool import realtime_pool
+from response_cache import admin_cache
+
+log = get_logger("routes")
 
 
 # =======================
@@ -21,6 +46,27 @@ async def health():
     return {"ok": True}
 
 
+def _refresh_pool_gauges() -> None:
+    """Sample pool occupancy at scrape time."""
+    db = get_db_pool_stats()
+    if db.get("enabled"):
+        in_use = metrics.gauge("sentinel_db_pool_in_use", "DB connections checked out")
+        in_use.set(db["in_use"])
+        waiting = metrics.gauge("sentinel_db_pool_waiting", "Callers waiting for a DB")
+        waiting.set(db["waiting"])
+    rt = realtime_pool.stats()
+    metrics.gauge("sentinel_realtime_pool_idle", "Warm Realtime sessions ready").set(
+        rt["idle"]
+    )
+
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Latency histograms and pool gauges in Prometheus text format."""
+    _refresh_pool_gauges()
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
 @app.api_route("/incoming-call", methods=["GET", "POST"])
 async def handle_incoming_call(request: Request):
     """Return TwiML to connect the call to our /media-stream WebSocket."""
@@ -33,7 +79,7 @@ async def handle_incoming_call(request: Request):
     caller_phone = form_data.get("From", "") or ""
     call_sid = form_data.get("CallSid", "") or ""
 
-    print(f"[INCOMING CALL] From: {caller_phone}, CallSid: {call_sid}", flush=True)
+    log.info("[INCOMING CALL] From: %s, CallSid: %s", caller_phone, call_sid)
 
     # Build <Connect><Stream> and pass data with <Parameter>
     connect = Connect()
@@ -53,190 +99,408 @@ async def handle_incoming_call(request: Request):
 # =======================
 # Debug endpoints
 # =======================
+def _select_version(conn):
+    with conn.cursor() as cur:
+        cur.execute("SELECT version();")
+        return cur.fetchone()[0]
+
+
+@app.get("/debug/metrics", response_class=JSONResponse)
+async def debug_metrics():
+    """Metric snapshot with p50/p90/p99 per histogram, for humans."""
+    _refresh_pool_gauges()
+    return {"ok": True, "metrics": metrics.snapshot()}
+
+
 @app.get("/debug/db", response_class=JSONResponse)
 async def debug_db_connection():
     """Debug endpoint to test database connection."""
-    conn = get_db_connection()
-    if not conn:
-        return {"ok": False, "error": "Failed to connect to database"}
-
     try:
-        with conn.cursor() as cur:
-            cur.execute("SELECT version();")
-            version = cur.fetchone()[0]
-            return {"ok": True, "database_version": version}
+        version = await run_db(_select_version)
+        return {
+            "ok": True,
+            "database_version": version,
+            "pool": get_db_pool_stats(),
+            "journal": call_journal.stats(),
+        }
     except Exception as e:
-        return {"ok": False, "error": str(e)}
-    finally:
-        conn.close()
+        return {
+            "ok": False,
+            "error": str(e),
+            "pool": get_db_pool_stats(),
+            "journal": call_journal.stats(),
+        }
 
 
 @app.get("/debug/insert", response_class=JSONResponse)
 async def debug_insert():
     """Debug endpoint to test inserting a call record."""
-    print("[DEBUG] Testing database insert...", flush=True)
+    log.info("[DEBUG] Testing database insert...")
 
-    result = insert_call_record(
+    result = await insert_call_record(
         caller_phone="14155551234",
         task_type="Debug Test",
         call_summary="Test call from /debug/insert endpoint",
         detail_info="This is a test record created for debugging purposes",
     )
 
-    print(f"[DEBUG] Insert result: {result}", flush=True)
+    log.info("[DEBUG] Insert result: %s", result)
     return result
 
 
 @app.get("/debug/records", response_class=JSONResponse)
-async def debug_records(limit: int = 10):
-    """Debug endpoint to retrieve recent call records."""
-    print(f"[DEBUG] Fetching {limit} recent records...", flush=True)
+async def debug_records(request: Request, limit: int = 10):
+    """Debug endpoint to retrieve recent call records (cached)."""
+    log.info("[DEBUG] Fetching %d recent records...", limit)
+    return await admin_cache.serve(request, lambda: get_call_records(limit=limit))
 
-    result = get_call_records(limit=limit)
 
-    print(f"[DEBUG] Retrieved {result.get('count', 0)} records", flush=True)
-    return result
+# =======================
+# Admin endpoints
+# =======================
+ADMIN_MAX_PAGE_SIZE = 500
+EXPORT_FORMATS = ("ndjson", "csv")
+
+_CALL_COLUMNS = """
+    SELECT id, caller_phone, call_date, call_time, task_type,
+           call_summary, detail_info, created_at
+    FROM post_call_analysis
+"""
+_CSV_FIELDS = (
+    "id",
+    "caller_phone",
+    "call_date",
+    "call_time",
+    "task_type",
+    "call_summary",
+    "detail_info",
+    "created_at",
+)
+
+
+def _call_filters(
+    phone: Optional[str],
+    task_type: Optional[str],
+    date: Optional[str],
+    date_from: Optional[str],
+    date_to: Optional[str],
+) -> Tuple[str, List[Any]]:
+    """WHERE clause and parameters for the /admin/calls filters."""
+    where = " WHERE 1=1"
+    params: List[Any] = []
+    if phone:
+        where += " AND caller_phone = %s"
+        params.append(phone)
+    if task_type:
+        where += " AND task_type = %s"
+        params.append(task_type)
+    if date:
+        where += " AND call_date = %s"
+        params.append(date)
+    if date_from:
+        where += " AND call_date >= %s"
+        params.append(date_from)
+    if date_to:
+        where += " AND call_date <= %s"
+        params.append(date_to)
+    return where, params
+
+
+def encode_cursor(record: Dict[str, Any]) -> str:
+    """Opaque cursor pointing just past ``record`` in (created_at, id) order."""
+    raw = dumps([record["created_at"], record["id"]]).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    """Inverse of encode_cursor. Raises ValueError for anything malformed."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, record_id = loads(base64.urlsafe_b64decode(padded))
+        datetime.datetime.fromisoformat(created_at)
+        return created_at, int(record_id)
+    except Exception:
+        raise ValueError(f"invalid cursor: {cursor!r}") from None
 
 
 @app.get("/admin/calls", response_class=JSONResponse)
 async def admin_get_calls(
-    limit: int = 50, phone: str = None, task_type: str = None, date: str = None
+    request: Request,
+    limit: int = 50,
+    phone: str = None,
+    task_type: str = None,
+    date: str = None,
+    date_from: str = None,
+    date_to: str = None,
+    cursor: str = None,
 ):
     """
-    Admin endpoint to retrieve and filter call records.
+    Admin endpoint to retrieve and filter call records, newest first.
 
     Query parameters:
-    - limit: Number of records to return (default: 50)
+    - limit: Number of records per page (default: 50, max: 500)
     - phone: Filter by caller phone number
     - task_type: Filter by task type
     - date: Filter by call date (YYYY-MM-DD)
+    - date_from / date_to: Filter by a call date range (inclusive)
+    - cursor: `next_cursor` from the previous page
+
+    Responses are cached and carry an ETag (see response_cache).
     """
-    conn = get_db_connection()
-    if not conn:
-        return {"ok": False, "error": "Database connection failed"}
+    return await admin_cache.serve(
+        request,
+        lambda: _admin_calls(limit, phone, task_type, date, date_from, date_to, cursor),
+    )
 
-    try:
-        # Build dynamic query based on filters
-        query = """
-            SELECT id, caller_phone, call_date, call_time, task_type, 
-                   call_summary, detail_info, created_at
-            FROM post_call_analysis
-            WHERE 1=1
-        """
-        params = []
-
-        if phone:
-            query += " AND caller_phone = %s"
-            params.append(phone)
-
-        if task_type:
-            query += " AND task_type = %s"
-            params.append(task_type)
-
-        if date:
-            query += " AND call_date = %s"
-            params.append(date)
-
-        query += " ORDER BY created_at DESC LIMIT %s"
-        params.append(limit)
 
+async def _admin_calls(limit, phone, task_type, date, date_from, date_to, cursor):
+    where, params = _call_filters(phone, task_type, date, date_from, date_to)
+    if cursor:
+        try:
+            created_at, record_id = decode_cursor(cursor)
+        except ValueError as e:
+            return {"ok": False, "error": str(e)}
+        # keyset: rows strictly after the cursor, served by idx_created_at_id
+        where += " AND (created_at, id) < (%s, %s)"
+        params += [created_at, record_id]
+
+    limit = max(1, min(limit, ADMIN_MAX_PAGE_SIZE))
+    query = _CALL_COLUMNS + where + " ORDER BY created_at DESC, id DESC LIMIT %s"
+    params.append(limit + 1)  # one extra row tells us whether there's a next page
+
+    def _select(conn):
         with conn.cursor() as cur:
             cur.execute(query, params)
-            rows = cur.fetchall()
-
-            records = []
-            for row in rows:
-                records.append(
-                    {
-                        "id": row[0],
-                        "caller_phone": row[1],
-                        "call_date": str(row[2]) if row[2] else None,
-                        "call_time": str(row[3]) if row[3] else None,
-                        "task_type": row[4],
-                        "call_summary": row[5],
-                        "detail_info": row[6],
-                        "created_at": str(row[7]) if row[7] else None,
-                    }
-                )
-
-            return {"ok": True, "records": records, "count": len(records)}
+            return [row_to_record(row) for row in cur.fetchall()]
+
+    try:
+        records = await run_db(_select)
     except Exception as e:
         return {"ok": False, "error": str(e)}
-    finally:
-        conn.close()
 
+    next_cursor = None
+    if len(records) > limit:
+        records = records[:limit]
+        next_cursor = encode_cursor(records[-1])
+    return {
+        "ok": True,
+        "records": records,
+        "count": len(records),
+        "next_cursor": next_cursor,
+    }
+
+
+@app.get("/admin/calls/export")
+async def admin_export_calls(
+    format: str = "ndjson",
+    phone: str = None,
+    task_type: str = None,
+    date: str = None,
+    date_from: str = None,
+    date_to: str = None,
+):
+    """
+    Stream every matching call record as NDJSON or CSV, newest first.
 
-@app.get("/admin/stats", response_class=JSONResponse)
-async def admin_get_stats():
-    """Get call statistics."""
-    conn = get_db_connection()
-    if not conn:
-        return {"ok": False, "error": "Database connection failed"}
+    Rows come from a server-side cursor a chunk at a time, so memory stays
+    flat however many rows are exported. Takes the same filters as /admin/calls.
+    """
+    if format not in EXPORT_FORMATS:
+        return JSONResponse(
+            {"ok": False, "error": "format must be 'ndjson' or 'csv'"},
+            status_code=400,
+        )
+    where, params = _call_filters(phone, task_type, date, date_from, date_to)
+    query = _CALL_COLUMNS + where + " ORDER BY created_at DESC, id DESC"
+    chunks = stream_query(query, params)
+
+    # Fail before the 200 goes out if the DB is unreachable
+    try:
+        first = await chunks.__anext__()
+    except StopAsyncIteration:
+        first = []
+    except Exception as e:
+        return JSONResponse({"ok": False, "error": str(e)}, status_code=503)
+
+    encode = _csv_chunk if format == "csv" else _ndjson_chunk
+
+    async def body():
+        try:
+            if format == "csv":
+                yield ",".join(_CSV_FIELDS) + "\r\n"
+            if first:
+                yield encode(first)
+            async for rows in chunks:
+                yield encode(rows)
+        finally:
+            await chunks.aclose()
+
+    if format == "csv":
+        return StreamingResponse(
+            body(),
+            media_type="text/csv",
+            headers={"Content-Disposition": 'attachment; filename="calls.csv"'},
+        )
+    return StreamingResponse(body(), media_type="application/x-ndjson")
 
+
+def _ndjson_chunk(rows) -> str:
+    return "".join(dumps(row_to_record(row)) + "\n" for row in rows)
+
+
+def _csv_chunk(rows) -> str:
+    out = io.StringIO()
+    writer = csv.writer(out)
+    for row in rows:
+        record = row_to_record(row)
+        writer.writerow([record[field] for field in _CSV_FIELDS])
+    return out.getvalue()
+
+
+def _select_stats(conn):
+    """Dashboard stats from the rollup tables maintained by triggers."""
     try:
-        stats = {}
+        return _select_stats_rollups(conn)
+    except psycopg2.errors.UndefinedTable:
+        conn.rollback()
+        log.warning(
+            "[STATS] Rollup tables missing (run `python migration.py`); "
+            "scanning post_call_analysis instead"
+        )
+        return _select_stats_scan(conn)
+
+
+def _select_stats_rollups(conn):
+    stats = {}
+
+    with conn.cursor() as cur:
+        # Total calls and calls today: one row per day
+        cur.execute("""
+            SELECT
+                COALESCE(SUM(calls), 0)::bigint,
+                COALESCE(SUM(calls) FILTER (WHERE call_date = CURRENT_DATE), 0)::bigint
+            FROM call_stats_daily
+        """)
+        stats["total_calls"], stats["calls_today"] = cur.fetchone()
+
+        # Calls by task type
+        cur.execute("""
+            SELECT task_type, SUM(calls)::bigint AS count
+            FROM call_stats_task_daily
+            GROUP BY task_type
+            HAVING SUM(calls) > 0
+            ORDER BY count DESC
+        """)
+        stats["by_task_type"] = [
+            {"task_type": row[0], "count": row[1]} for row in cur.fetchall()
+        ]
+
+        # Top callers (idx_call_stats_caller_calls)
+        cur.execute("""
+            SELECT caller_phone, calls
+            FROM call_stats_caller
+            WHERE calls > 0
+            ORDER BY calls DESC
+            LIMIT 10
+        """)
+        stats["top_callers"] = [
+            {"phone": row[0], "count": row[1]} for row in cur.fetchall()
+        ]
+
+        # Recent calls (last 24 hours): whole hours from the rollup, plus the
+        # part of the oldest hour that is inside the window from the table
+        cur.execute("""
+            WITH bounds AS (
+                SELECT NOW() - INTERVAL '24 hours' AS since,
+                       date_trunc('hour', NOW() - INTERVAL '24 hours')
+                           + INTERVAL '1 hour' AS first_full_hour
+            )
+            SELECT
+                (SELECT COALESCE(SUM(calls), 0) FROM call_stats_hourly, bounds
+                 WHERE hour >= first_full_hour)
+                + (SELECT COUNT(*) FROM post_call_analysis, bounds
+                   WHERE created_at >= since AND created_at < first_full_hour)
+        """)
+        stats["calls_last_24h"] = int(cur.fetchone()[0])
+
+    return stats
+
+
+def _select_stats_scan(conn):
+    """The same numbers straight from post_call_analysis (pre-rollup schema)."""
+    stats = {}
+
+    with conn.cursor() as cur:
+        # Total calls
+        cur.execute("SELECT COUNT(*) FROM post_call_analysis")
+        stats["total_calls"] = cur.fetchone()[0]
+
+        # Calls today
+        cur.execute("""
+            SELECT COUNT(*) FROM post_call_analysis 
+            WHERE call_date = CURRENT_DATE
+        """)
+        stats["calls_today"] = cur.fetchone()[0]
+
+        # Calls by task type
+        cur.execute("""
+            SELECT task_type, COUNT(*) as count 
+            FROM post_call_analysis 
+            WHERE task_type IS NOT NULL
+            GROUP BY task_type 
+            ORDER BY count DESC
+        """)
+        stats["by_task_type"] = [
+            {"task_type": row[0], "count": row[1]} for row in cur.fetchall()
+        ]
+
+        # Top callers
+        cur.execute("""
+            SELECT caller_phone, COUNT(*) as count 
+            FROM post_call_analysis 
+            GROUP BY caller_phone 
+            ORDER BY count DESC 
+            LIMIT 10
+        """)
+        stats["top_callers"] = [
+            {"phone": row[0], "count": row[1]} for row in cur.fetchall()
+        ]
+
+        # Recent calls (last 24 hours)
+        cur.execute("""
+            SELECT COUNT(*) FROM post_call_analysis 
+            WHERE created_at >= NOW() - INTERVAL '24 hours'
+        """)
+        stats["calls_last_24h"] = cur.fetchone()[0]
+
+    return stats
 
-        with conn.cursor() as cur:
-            # Total calls
-            cur.execute("SELECT COUNT(*) FROM post_call_analysis")
-            stats["total_calls"] = cur.fetchone()[0]
-
-            # Calls today
-            cur.execute("""
-                SELECT COUNT(*) FROM post_call_analysis 
-                WHERE call_date = CURRENT_DATE
-            """)
-            stats["calls_today"] = cur.fetchone()[0]
-
-            # Calls by task type
-            cur.execute("""
-                SELECT task_type, COUNT(*) as count 
-                FROM post_call_analysis 
-                WHERE task_type IS NOT NULL
-                GROUP BY task_type 
-                ORDER BY count DESC
-            """)
-            stats["by_task_type"] = [
-                {"task_type": row[0], "count": row[1]} for row in cur.fetchall()
-            ]
-
-            # Top callers
-            cur.execute("""
-                SELECT caller_phone, COUNT(*) as count 
-                FROM post_call_analysis 
-                GROUP BY caller_phone 
-                ORDER BY count DESC 
-                LIMIT 10
-            """)
-            stats["top_callers"] = [
-                {"phone": row[0], "count": row[1]} for row in cur.fetchall()
-            ]
-
-            # Recent calls (last 24 hours)
-            cur.execute("""
-                SELECT COUNT(*) FROM post_call_analysis 
-                WHERE created_at >= NOW() - INTERVAL '24 hours'
-            """)
-            stats["calls_last_24h"] = cur.fetchone()[0]
 
+@app.get("/admin/stats", response_class=JSONResponse)
+async def admin_get_stats(request: Request):
+    """Get call statistics (cached; supports If-None-Match)."""
+    return await admin_cache.serve(request, _admin_stats)
+
+
+async def _admin_stats():
+    try:
+        stats = await run_db(_select_stats)
         return {"ok": True, "stats": stats}
     except Exception as e:
         return {"ok": False, "error": str(e)}
-    finally:
-        conn.close()
 
 
 @app.get("/debug/simulate-function-call", response_class=JSONResponse)
 async def debug_simulate_function_call():
     """Debug endpoint to simulate the exact function call process."""
-    print("[DEBUG] Simulating function call...", flush=True)
+    log.info("[DEBUG] Simulating function call...")
 
-    result = insert_call_record(
+    result = await insert_call_record(
         caller_phone="14155559999",
         task_type="Question",
         call_summary="Test call from debug endpoint - simulating real function call",
         detail_info=f"Simulated call at {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
     )
 
-    print(f"[DEBUG] Function call simulation result: {result}", flush=True)
+    log.info("[DEBUG] Function call simulation result: %s", result)
     return result
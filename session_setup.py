@@ -1,6 +1,11 @@
-import json
+import hashlib
+from typing import Dict, Tuple
 
-from app_instance import SYSTEM_MESSAGE, VOICE
+from app_instance import SYSTEM_MESSAGE, TEMPERATURE, VOICE
+from codec import dumps
+from logger import get_logger
+
+log = get_logger("session")
 
 
 # =======================
@@ -20,12 +25,100 @@ async def send_initial_conversation_item(openai_ws):
             ],
         },
     }
-    await openai_ws.send(json.dumps(initial_conversation_item))
-    await openai_ws.send(json.dumps({"type": "response.create"}))
+    await openai_ws.send(dumps(initial_conversation_item))
+    await openai_ws.send(dumps({"type": "response.create"}))
+
+
+# Function tools offered to Sally (handlers live in tools.py)
+SESSION_TOOLS = [
+    {
+        "type": "function",
+        "name": "record_call_data",
+        "description": "Record call information to the database",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "caller_phone": {
+                    "type": "string",
+                    "description": "Caller's phone number in E.164 format (e.g., +14155551234)",
+                },
+                "task_type": {
+                    "type": "string",
+                    "description": "Type of task or request (e.g., 'Policy Question', 'Address Change', 'Payment Inquiry')",
+                },
+                "call_summary": {
+                    "type": "string",
+                    "description": "Brief summary of the call",
+                },
+                "detail_info": {
+                    "type": "string",
+                    "description": "Detailed information about the call, customer requests, and outcomes",
+                },
+            },
+            "required": ["caller_phone", "task_type", "call_summary"],
+        },
+    },
+    {
+        "type": "function",
+        "name": "check_status",
+        "description": "Check availability status of team members' phone lines",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "line_numbers": {
+                    "type": "array",
+                    "items": {"type": "integer"},
+                    "description": "Array of line numbers to check (1, 2, 3)",
+                }
+            },
+            "required": ["line_numbers"],
+        },
+    },
+    {
+        "type": "function",
+        "name": "transfer_to_human",
+        "description": "Transfer the active call to a live human agent via Twilio",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "line_number": {
+                    "type": "integer",
+                    "description": "Preferred: 1, 2, or 3. The server maps this to the correct phone number.",
+                    "enum": [1, 2, 3],
+                },
+                "target_number": {
+                    "type": "string",
+                    "description": "Optional: E.164 phone number to transfer to, e.g. +13526659393 (used if line_number not provided).",
+                },
+                "reason": {
+                    "type": "string",
+                    "description": "Short reason for the transfer (for logging)",
+                },
+            },
+        },
+    },
+    {
+        "type": "function",
+        "name": "end_call",
+        "description": "End the phone call",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "reason": {
+                    "type": "string",
+                    "description": "Reason for ending the call",
+                }
+            },
+            "required": ["reason"],
+        },
+    },
+]
 
 
-async def initialize_session(openai_ws):
-    session_update = {
+def build_session_update(
+    voice: str = VOICE, instructions: str = SYSTEM_MESSAGE
+) -> dict:
+    return {
         "type": "session.update",
         "session": {
             "type": "realtime",
@@ -34,6 +127,8 @@ async def initialize_session(openai_ws):
             "audio": {
                 "input": {
                     "format": {"type": "audio/pcmu"},
+                    # inbound_audio's end-of-turn window and pre-roll follow
+                    # prefix_padding_ms / silence_duration_ms; keep them in step
                     "turn_detection": {
                         "type": "server_vad",
                         "threshold": 0.7,
@@ -41,95 +136,86 @@ async def initialize_session(openai_ws):
                         "silence_duration_ms": 500,
                     },
                 },
-                "output": {"format": {"type": "audio/pcmu"}, "voice": VOICE},
+                "output": {"format": {"type": "audio/pcmu"}, "voice": voice},
             },
-            "instructions": SYSTEM_MESSAGE,
-            "tools": [
-                {
-                    "type": "function",
-                    "name": "record_call_data",
-                    "description": "Record call information to the database",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "caller_phone": {
-                                "type": "string",
-                                "description": "Caller's phone number in E.164 format (e.g., +14155551234)",
-                            },
-                            "task_type": {
-                                "type": "string",
-                                "description": "Type of task or request (e.g., 'Policy Question', 'Address Change', 'Payment Inquiry')",
-                            },
-                            "call_summary": {
-                                "type": "string",
-                                "description": "Brief summary of the call",
-                            },
-                            "detail_info": {
-                                "type": "string",
-                                "description": "Detailed information about the call, customer requests, and outcomes",
-                            },
-                        },
-                        "required": ["caller_phone", "task_type", "call_summary"],
-                    },
-                },
-                {
-                    "type": "function",
-                    "name": "check_status",
-                    "description": "Check availability status of team members' phone lines",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "line_numbers": {
-                                "type": "array",
-                                "items": {"type": "integer"},
-                                "description": "Array of line numbers to check (1, 2, 3)",
-                            }
-                        },
-                        "required": ["line_numbers"],
-                    },
-                },
-                {
-                    "type": "function",
-                    "name": "transfer_to_human",
-                    "description": "Transfer the active call to a live human agent via Twilio",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "line_number": {
-                                "type": "integer",
-                                "description": "Preferred: 1, 2, or 3. The server maps this to the correct phone number.",
-                                "enum": [1, 2, 3],
-                            },
-                            "target_number": {
-                                "type": "string",
-                                "description": "Optional: E.164 phone number to transfer to, e.g. +13526659393 (used if line_number not provided).",
-                            },
-                            "reason": {
-                                "type": "string",
-                                "description": "Short reason for the transfer (for logging)",
-                            },
-                        },
-                    },
-                },
-                {
-                    "type": "function",
-                    "name": "end_call",
-                    "description": "End the phone call",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "reason": {
-                                "type": "string",
-                                "description": "Reason for ending the call",
-                            }
-                        },
-                        "required": ["reason"],
-                    },
-                },
-            ],
+            "instructions": instructions,
+            "tools": SESSION_TOOLS,
             "tool_choice": "auto",
         },
     }
-    print("Sending Princeton Insurance session update:", json.dumps(session_update))
-    await openai_ws.send(json.dumps(session_update))
-    await send_initial_conversation_item(openai_ws)
+
+
+# =======================
+# Compiled session.update cache
+# =======================
+# The full config (whole system prompt + tool schemas) is identical for every
+# call, so it is serialized once per (voice, temperature, prompt hash).
+# Temperature travels in the connection URL but is part of the key so a
+# config change never reuses a stale payload.
+_compiled: Dict[Tuple[str, float, str], str] = {}
+
+
+def session_config_key(
+    voice: str = VOICE,
+    temperature: float = TEMPERATURE,
+    instructions: str = SYSTEM_MESSAGE,
+) -> Tuple[str, float, str]:
+    prompt_hash = hashlib.sha256(instructions.encode("utf-8")).hexdigest()[:16]
+    return voice, temperature, prompt_hash
+
+
+def compiled_session_update(
+    voice: str = VOICE,
+    temperature: float = TEMPERATURE,
+    instructions: str = SYSTEM_MESSAGE,
+) -> str:
+    """The serialized session.update frame for this config, built on first use."""
+    key = session_config_key(voice, temperature, instructions)
+    payload = _compiled.get(key)
+    if payload is None:
+        payload = dumps(build_session_update(voice, instructions))
+        _compiled[key] = payload
+        log.info(
+            "Compiled session.update",
+            extra={
+                "fields": {
+                    "voice": voice,
+                    "temperature": temperature,
+                    "prompt_hash": key[2],
+                    "bytes": len(payload),
+                }
+            },
+        )
+    return payload
+
+
+def reload_session_config() -> str:
+    """Drop cached payloads (e.g. after editing the prompt) and recompile."""
+    _compiled.clear()
+    return compiled_session_update()
+
+
+def session_metadata_update(caller_phone: str, call_sid: str, stream_sid: str) -> str:
+    """Small per-call session.update carrying only the caller metadata."""
+    return dumps(
+        {
+            "type": "session.update",
+            "session": {
+                "metadata": {
+                    "caller_phone": caller_phone,
+                    "call_sid": call_sid,
+                    "stream_sid": stream_sid,
+                },
+            },
+        }
+    )
+
+
+async def initialize_session(openai_ws, greet: bool = True):
+    """
+    Send the session config. With greet=False the greeting is left to the caller
+    (pre-warmed sessions greet only once a call is bound to them).
+    """
+    await openai_ws.send(compiled_session_update())
+    if greet:
+        await send_initial_conversation_item(openai_ws)
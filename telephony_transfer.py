@@ -1,14 +1,21 @@
 # telephony_transfer.py
+import asyncio
 import os
-from typing import Dict, Optional
+import random
+from typing import Any, Dict, Optional
 from urllib.parse import urlencode
 
+import aiohttp
 from dotenv import load_dotenv
 from fastapi import APIRouter, Request
 from fastapi.responses import Response
+from twilio.base.exceptions import TwilioRestException
 from twilio.rest import Client
 from twilio.twiml.voice_response import Dial, Number, VoiceResponse
 
+from logger import get_logger
+from transfer_state import create_transfer_state_backend
+
 load_dotenv(override=True)
 
 TWILIO_ACCOUNT_SID = os.getenv("TWILIO_ACCOUNT_SID", "")
@@ -22,6 +29,8 @@ TWILIO_CALLBACK_BASE = os.getenv(
 TWILIO_CALLER_ID = os.getenv(
     "TWILIO_CALLER_ID"
 )  # optional: your Twilio number in E.164
+TWILIO_HTTP_TIMEOUT = float(os.getenv("TWILIO_HTTP_TIMEOUT", 10))
+TWILIO_HTTP_MAX_RETRIES = int(os.getenv("TWILIO_HTTP_MAX_RETRIES", 3))
 
 if not TWILIO_ACCOUNT_SID or not TWILIO_AUTH_TOKEN:
     raise RuntimeError("TWILIO_ACCOUNT_SID / TWILIO_AUTH_TOKEN are required")
@@ -35,25 +44,136 @@ if not TWILIO_CALLBACK_BASE:
 
 client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
 router = APIRouter()
+log = get_logger("transfer")
+
 
 # ----------------------------
-# In-memory transfer state
+# Async call control
+# ----------------------------
+class AsyncCallControl:
+    """
+    Non-blocking Twilio Calls API client built from the sync `client`'s credentials.
+    Reuses one keep-alive aiohttp session; retries with exponential backoff on
+    connection errors and 429/5xx. Timeouts are not retried, because the redirect
+    may already have been applied and repeating it would restart the <Dial>.
+    """
+
+    RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+    def __init__(
+        self,
+        rest_client: Client,
+        timeout: float = TWILIO_HTTP_TIMEOUT,
+        max_retries: int = TWILIO_HTTP_MAX_RETRIES,
+        backoff_base: float = 0.25,
+    ):
+        self.account_sid = rest_client.account_sid
+        self.base_url = (
+            f"https://api.twilio.com/2010-04-01/Accounts/{self.account_sid}"
+        )
+        self._auth = aiohttp.BasicAuth(rest_client.username, rest_client.password)
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        # Created lazily so it binds to the running event loop
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=20, keepalive_timeout=60),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                auth=self._auth,
+            )
+        return self._session
+
+    async def update_call(self, call_sid: str, **params: str) -> Dict[str, Any]:
+        """POST /Calls/{call_sid}.json (e.g. Url=..., Method=POST); returns the call."""
+        url = f"{self.base_url}/Calls/{call_sid}.json"
+        attempt = 0
+        while True:
+            try:
+                async with self._get_session().post(url, data=params) as resp:
+                    if resp.status < 400:
+                        return await _json_body(resp)
+                    retryable = resp.status in self.RETRY_STATUSES
+                    if not retryable or attempt >= self.max_retries:
+                        # an edge proxy's 502/503 page isn't JSON
+                        body = await _json_body(resp)
+                        raise TwilioRestException(
+                            resp.status,
+                            url,
+                            msg=body.get("message", "Twilio request failed"),
+                            code=body.get("code"),
+                            method="POST",
+                        )
+            except aiohttp.ClientConnectionError:
+                if attempt >= self.max_retries:
+                    raise
+
+            delay = self.backoff_base * (2**attempt) * (1 + random.random())
+            attempt += 1
+            log.warning(
+                "[TWILIO] Retrying call update for %s in %.2fs (attempt %d/%d)",
+                call_sid,
+                delay,
+                attempt,
+                self.max_retries,
+            )
+            await asyncio.sleep(delay)
+
+    def max_duration(self) -> float:
+        """Worst-case seconds for one update_call, every retry included."""
+        backoff = sum(
+            self.backoff_base * (2**attempt) * 2 for attempt in range(self.max_retries)
+        )
+        return (self.max_retries + 1) * self.timeout + backoff
+
+    async def close(self) -> None:
+        session, self._session = self._session, None
+        if session is not None and not session.closed:
+            await session.close()
+
+
+async def _json_body(resp: aiohttp.ClientResponse) -> Dict[str, Any]:
+    """Response body as a dict; {} when it isn't a JSON object."""
+    try:
+        body = await resp.json(content_type=None)
+    except ValueError:
+        return {}
+    return body if isinstance(body, dict) else {}
+
+
+async_client = AsyncCallControl(client)
+
+# ----------------------------
+# Transfer state
 # ----------------------------
 #  call_sid -> {"status": "pending"|"answered"|"busy"|"no-answer"|"failed"|"completed", "to": "+1..."}
-TRANSFER_STATE: Dict[str, Dict[str, str]] = {}
+# Backend is chosen by TRANSFER_STATE_BACKEND (memory | sqlite); see transfer_state.py
+TRANSFER_STATE = create_transfer_state_backend()
 
 
-def set_transfer_pending(call_sid: str, to_number: str):
-    TRANSFER_STATE[call_sid] = {"status": "pending", "to": to_number}
+async def set_transfer_pending(call_sid: str, to_number: str):
+    await TRANSFER_STATE.set_pending(call_sid, to_number)
 
 
-def set_transfer_status(call_sid: str, status: str):
-    if call_sid in TRANSFER_STATE:
-        TRANSFER_STATE[call_sid]["status"] = status
+async def set_transfer_status(call_sid: str, status: str):
+    # Final statuses also wake the bridge waiting in wait_for_transfer_result,
+    # whichever worker it lives on (sqlite backend).
+    await TRANSFER_STATE.set_status(call_sid, status)
 
 
-def get_transfer_status(call_sid: str) -> Optional[str]:
-    return TRANSFER_STATE.get(call_sid, {}).get("status")
+async def get_transfer_status(call_sid: str) -> Optional[str]:
+    return await TRANSFER_STATE.get_status(call_sid)
+
+
+async def wait_for_transfer_result(call_sid: str, timeout: float) -> Optional[str]:
+    """
+    Wait until a Twilio callback reports a final status for call_sid.
+    Returns the status, or None if nothing final arrived within timeout.
+    """
+    return await TRANSFER_STATE.wait_for_final(call_sid, timeout)
 
 
 def _clean_e164(num: str) -> str:
@@ -125,21 +245,22 @@ async def twiml_transfer(request: Request):
     xml = _build_transfer_twiml(target_number, call_sid).strip()
     # Mark pending so the app can wait on it
     if call_sid:
-        set_transfer_pending(call_sid, _clean_e164(target_number))
+        await set_transfer_pending(call_sid, _clean_e164(target_number))
 
     return Response(content=xml, media_type="text/xml")
 
 
-def transfer_call_via_url(call_sid: str, target_number: str) -> None:
+async def transfer_call_via_url(call_sid: str, target_number: str) -> None:
     """
     Redirect the active call to our TwiML transfer route (POST).
+    Uses the async client so the event loop never waits on Twilio's API.
     """
     to = _clean_e164(target_number)
     qs = urlencode({"target_number": to})
     url = f"{TRANSFER_WEBHOOK_URL}?{qs}"
     # Mark pending immediately (Twilio will then fetch /twiml/transfer and reinforce it)
-    set_transfer_pending(call_sid, to)
-    client.calls(call_sid).update(url=url, method="POST")
+    await set_transfer_pending(call_sid, to)
+    await async_client.update_call(call_sid, Url=url, Method="POST")
 
 
 # -------- Twilio callbacks (state updates) --------
@@ -164,7 +285,8 @@ async def twilio_number_status(request: Request):
         event = event
     elif event in {"busy", "no-answer", "failed", "completed", "answered"}:
         event = event
-    set_transfer_status(call_sid, event or "in-progress")
+    log.info("[TWILIO] Number status for %s: %s", call_sid, event or "in-progress")
+    await set_transfer_status(call_sid, event or "in-progress")
     # Twilio expects 200; no TwiML here
     return Response(content="", media_type="text/plain")
 
@@ -181,7 +303,8 @@ async def twilio_dial_action(request: Request):
     )  # 'completed','busy','no-answer','failed'
 
     if dial_status:
-        set_transfer_status(call_sid, dial_status)
+        log.info("[TWILIO] Dial action for %s: %s", call_sid, dial_status)
+        await set_transfer_status(call_sid, dial_status)
 
     # This is a TwiML response point. We can return an empty <Response/> to let the call end,
     # or say something if needed. Keep it minimal:
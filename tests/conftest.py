@@ -0,0 +1,10 @@
+# tests/conftest.py
+"""Unit tests for the pure-Python parts of the bridge.
+
+No Postgres, Twilio or OpenAI needed: ``python -m pytest -q`` from the repo root.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,193 @@
+# tests/test_call_journal.py
+import asyncio
+import fcntl
+import json
+import os
+
+import pytest
+
+import call_journal
+from call_journal import CallJournal
+
+
+class FakeDB:
+    """Stands in for run_db(_insert_call_records, batch)."""
+
+    def __init__(self):
+        self.batches = []
+        self.fail = False
+
+    async def __call__(self, fn, batch):
+        if self.fail:
+            raise ConnectionError("database is down")
+        self.batches.append(list(batch))
+        return len(batch)
+
+    @property
+    def inserted(self):
+        return [r for batch in self.batches for r in batch]
+
+
+@pytest.fixture
+def db(monkeypatch):
+    fake = FakeDB()
+    monkeypatch.setattr(call_journal, "run_db", fake)
+    return fake
+
+
+def record(n):
+    return {
+        "caller_phone": f"+1555000{n:04d}",
+        "call_date": "2026-10-01",
+        "call_time": "10:00:00",
+        "task_type": "Policy",
+        "call_summary": f"call {n}",
+        "detail_info": "",
+        "recording_path": None,
+        "created_at": "2026-10-01T10:00:00+00:00",
+    }
+
+
+def journal_lines(path):
+    with open(path, "rb") as f:
+        return [json.loads(line) for line in f.read().splitlines()]
+
+
+def write_journal(path, records, tail=b""):
+    with open(path, "wb") as f:
+        for r in records:
+            f.write((json.dumps(r) + "\n").encode())
+        f.write(tail)
+
+
+def make_journal(directory, batch_size=100):
+    # flushes are driven by the tests, not the timer
+    return CallJournal(str(directory), batch_size=batch_size, flush_ms=60_000)
+
+
+def test_append_is_durable_then_flush_truncates(tmp_path, db):
+    async def run():
+        journal = make_journal(tmp_path)
+        await journal.start()
+        try:
+            ids = [await journal.append(record(n)) for n in range(3)]
+            assert [r["journal_id"] for r in journal_lines(journal.path)] == ids
+            assert await journal.flush()
+            assert [r["journal_id"] for r in db.inserted] == ids
+            assert os.path.getsize(journal.path) == 0
+            assert journal.stats()["queue_depth"] == 0
+        finally:
+            await journal.close()
+
+    asyncio.run(run())
+
+
+def test_flush_inserts_in_batches(tmp_path, db):
+    async def run():
+        journal = make_journal(tmp_path, batch_size=2)
+        await journal.start()
+        try:
+            for n in range(5):
+                await journal.append(record(n))
+            assert await journal.flush()
+            # a full batch also wakes the background flusher, so order varies
+            assert sorted(len(b) for b in db.batches) == [1, 2, 2]
+            assert len(db.inserted) == 5
+        finally:
+            await journal.close()
+
+    asyncio.run(run())
+
+
+def test_failed_flush_keeps_records_for_retry(tmp_path, db):
+    async def run():
+        journal = make_journal(tmp_path)
+        await journal.start()
+        try:
+            await journal.append(record(1))
+            db.fail = True
+            assert not await journal.flush()
+            assert journal.stats()["queue_depth"] == 1
+            assert journal.stats()["flush_failures"] == 1
+            assert len(journal_lines(journal.path)) == 1
+
+            db.fail = False
+            assert await journal.flush()
+            assert len(db.inserted) == 1
+            assert os.path.getsize(journal.path) == 0
+        finally:
+            await journal.close()
+
+    asyncio.run(run())
+
+
+def test_replay_drops_torn_last_line(tmp_path, db):
+    path = tmp_path / "calls-0.jsonl"
+    kept = [{"journal_id": f"id-{n}", **record(n)} for n in range(2)]
+    write_journal(path, kept, tail=b'{"journal_id": "id-2", "caller_ph')
+
+    async def run():
+        journal = make_journal(tmp_path)
+        await journal.start()
+        try:
+            assert journal.path == str(path)
+            assert journal.stats()["replayed"] == 2
+            assert journal_lines(path) == kept  # partial record cut off
+            assert await journal.flush()
+            assert [r["journal_id"] for r in db.inserted] == ["id-0", "id-1"]
+        finally:
+            await journal.close()
+
+    asyncio.run(run())
+
+
+def test_adopts_orphans_but_not_live_journals(tmp_path, db):
+    live = tmp_path / "calls-0.jsonl"
+    orphan = tmp_path / "calls-1.jsonl"
+    write_journal(live, [{"journal_id": "live", **record(0)}])
+    write_journal(orphan, [{"journal_id": "orphan", **record(1)}])
+
+    # another worker is alive and holds calls-0
+    fd = os.open(live, os.O_RDWR)
+    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+    async def run():
+        journal = make_journal(tmp_path)
+        await journal.start()
+        try:
+            assert journal.path == str(orphan)
+            assert journal.stats()["replayed"] == 1
+            assert await journal.flush()
+            assert [r["journal_id"] for r in db.inserted] == ["orphan"]
+        finally:
+            await journal.close()
+
+    try:
+        asyncio.run(run())
+    finally:
+        os.close(fd)
+    assert [r["journal_id"] for r in journal_lines(live)] == ["live"]
+
+
+def test_orphan_records_move_into_own_journal(tmp_path, db):
+    orphan = tmp_path / "calls-1.jsonl"
+    write_journal(orphan, [{"journal_id": "orphan", **record(1)}])
+
+    async def run():
+        journal = make_journal(tmp_path)
+        await journal.start()
+        try:
+            assert journal.path == str(tmp_path / "calls-0.jsonl")
+            # moved, not copied: a crash now can't replay it from both files
+            assert os.path.getsize(orphan) == 0
+            assert [r["journal_id"] for r in journal_lines(journal.path)] == [
+                "orphan"
+            ]
+        finally:
+            db.fail = True  # keep it journaled through close()
+            await journal.close()
+
+    asyncio.run(run())
+    assert [r["journal_id"] for r in journal_lines(tmp_path / "calls-0.jsonl")] == [
+        "orphan"
+    ]
@@ -0,0 +1,114 @@
+# tests/test_frame_queue.py
+import asyncio
+import itertools
+
+from frame_queue import FrameQueue
+from metrics import QUEUE_DEPTH, gauge
+
+_names = itertools.count()
+
+
+def make_queue(max_audio_frames=3) -> FrameQueue:
+    # a fresh name per queue keeps its depth gauge to itself
+    return FrameQueue(f"test-{next(_names)}", max_audio_frames=max_audio_frames)
+
+
+def drain(queue: FrameQueue):
+    async def run():
+        queue.close()
+        frames = []
+        while (frame := await queue.get()) is not None:
+            frames.append(frame)
+        return frames
+
+    return asyncio.run(run())
+
+
+def test_full_queue_drops_oldest_audio():
+    queue = make_queue(max_audio_frames=3)
+    for n in range(5):
+        assert queue.put_audio(f"a{n}")
+    assert len(queue) == 3
+    assert queue.dropped_overflow == 2
+    assert drain(queue) == ["a2", "a3", "a4"]
+
+
+def test_control_frames_are_never_dropped():
+    queue = make_queue(max_audio_frames=2)
+    queue.put_control("mark-0")
+    queue.put_audio("a0")
+    queue.put_control("mark-1")
+    queue.put_audio("a1")
+    queue.put_audio("a2")  # drops a0, not a mark
+    for n in range(10):
+        queue.put_control(f"extra-{n}")  # control frames don't count
+    assert queue.dropped_overflow == 1
+    assert drain(queue) == ["mark-0", "mark-1", "a1", "a2"] + [
+        f"extra-{n}" for n in range(10)
+    ]
+
+
+def test_purge_counts_stale_audio():
+    queue = make_queue(max_audio_frames=10)
+    queue.put_audio("a0")
+    queue.put_control("mark")
+    queue.put_audio("a1")
+    assert queue.purge() == 3
+    assert queue.dropped_stale == 2
+    assert len(queue) == 0
+    queue.put_audio("a2")
+    assert drain(queue) == ["a2"]
+
+
+def test_get_waits_for_a_frame():
+    async def run():
+        queue = make_queue()
+        getter = asyncio.create_task(queue.get())
+        await asyncio.sleep(0)
+        assert not getter.done()
+        queue.put_audio("a0")
+        return await asyncio.wait_for(getter, 1)
+
+    assert asyncio.run(run()) == "a0"
+
+
+def test_close_drains_then_returns_none():
+    async def run():
+        queue = make_queue()
+        queue.put_audio("a0")
+        queue.close()
+        assert not queue.put_audio("late")
+        assert not queue.put_control("late")
+        return [await queue.get(), await queue.get(), await queue.get()]
+
+    assert asyncio.run(run()) == ["a0", None, None]
+
+
+def test_close_wakes_a_waiting_consumer():
+    async def run():
+        queue = make_queue()
+        getter = asyncio.create_task(queue.get())
+        await asyncio.sleep(0)
+        queue.close()
+        return await asyncio.wait_for(getter, 1)
+
+    assert asyncio.run(run()) is None
+
+
+def test_peak_and_finish():
+    queue = make_queue(max_audio_frames=2)
+    depth = gauge(QUEUE_DEPTH, queue=queue.name)
+    queue.put_audio("a0")
+    queue.put_control("mark")
+    queue.put_audio("a1")
+    queue.put_audio("a2")  # overflow: depth stays at 3
+    assert depth.value == 3
+    queue.purge()
+    queue.put_audio("a3")
+    assert queue.finish() == {
+        "peak": 3,
+        "dropped_overflow": 1,
+        "dropped_stale": 2,
+    }
+    assert len(queue) == 0
+    assert depth.value == 0
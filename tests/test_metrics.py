@@ -0,0 +1,101 @@
+# tests/test_metrics.py
+import math
+import random
+
+import pytest
+
+from metrics import SUB_BUCKETS, Histogram, MetricsRegistry
+
+
+def exact_percentile(values, q):
+    ordered = sorted(values)
+    rank = max(1, math.ceil(len(ordered) * q / 100))
+    return ordered[rank - 1]
+
+
+def test_empty_histogram():
+    hist = Histogram()
+    assert hist.percentile(50) == 0.0
+    assert hist.snapshot() == {
+        "count": 0,
+        "sum": 0.0,
+        "max": 0.0,
+        "p50": 0.0,
+        "p90": 0.0,
+        "p99": 0.0,
+    }
+
+
+@pytest.mark.parametrize("q", [1, 25, 50, 90, 99, 99.9, 100])
+def test_percentiles_within_relative_error(q):
+    rng = random.Random(q)
+    # microseconds to minutes, like the latencies we record
+    values = [10 ** rng.uniform(-6, 2) for _ in range(5000)]
+    hist = Histogram()
+    for v in values:
+        hist.observe(v)
+
+    exact = exact_percentile(values, q)
+    got = hist.percentile(q)
+    # the bucket's upper bound: never below, at most one bucket above
+    assert exact <= got <= exact * (1 + 1 / SUB_BUCKETS)
+
+
+def test_percentile_never_exceeds_max():
+    hist = Histogram()
+    for v in (0.1, 0.2, 0.3):
+        hist.observe(v)
+    assert hist.percentile(100) == 0.3
+    assert hist.max == 0.3
+
+
+def test_zero_lands_in_its_own_bucket():
+    hist = Histogram()
+    hist.observe(0.0)
+    hist.observe(0.0)
+    hist.observe(1.0)
+    assert hist.percentile(50) == 0.0
+    assert hist.percentile(100) == 1.0
+
+
+def test_cumulative_counts_exact_integers_in_their_le_bucket():
+    hist = Histogram()
+    for depth in (1, 1, 2, 5, 5, 5, 10, 250):
+        hist.observe(depth)
+    assert hist.cumulative((1, 2, 5, 10, 100, 500)) == [
+        (1, 2),
+        (2, 3),
+        (5, 6),
+        (10, 7),
+        (100, 7),
+        (500, 8),
+    ]
+
+
+def test_snapshot_and_render():
+    registry = MetricsRegistry()
+    hist = registry.histogram("latency_seconds", "Some latency", route="a")
+    for v in (0.002, 0.02, 0.2):
+        hist.observe(v)
+    registry.counter("calls_total").inc(3)
+
+    snap = registry.snapshot()
+    assert snap["calls_total"] == {"_": 3.0}
+    stats = snap["latency_seconds"]['{route="a"}']
+    assert stats["count"] == 3
+    assert stats["max"] == 0.2
+    assert stats["p50"] == pytest.approx(0.02, rel=1 / SUB_BUCKETS)
+
+    text = registry.render()
+    assert '# HELP latency_seconds Some latency' in text
+    assert 'latency_seconds_bucket{route="a",le="0.005"} 1' in text
+    assert 'latency_seconds_bucket{route="a",le="+Inf"} 3' in text
+    assert 'latency_seconds_count{route="a"} 3' in text
+    assert "calls_total 3" in text
+
+
+def test_kind_mismatch_is_rejected():
+    registry = MetricsRegistry()
+    registry.counter("things")
+    with pytest.raises(ValueError):
+        registry.gauge("things")
@@ -0,0 +1,159 @@
+# tests/test_response_cache.py
+import asyncio
+import json
+
+import pytest
+from starlette.requests import Request
+
+import response_cache
+from response_cache import ResponseCache, etag_for, etag_matches
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(response_cache.time, "monotonic", fake)
+    return fake
+
+
+def make_request(path="/admin/stats", query="", if_none_match=None) -> Request:
+    headers = []
+    if if_none_match is not None:
+        headers.append((b"if-none-match", if_none_match.encode()))
+    return Request(
+        {
+            "type": "http",
+            "method": "GET",
+            "path": path,
+            "query_string": query.encode(),
+            "headers": headers,
+        }
+    )
+
+
+class Compute:
+    """Counts calls and returns the payload it's given."""
+
+    def __init__(self, payload=None):
+        self.payload = payload or {"ok": True, "calls": 3}
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        return self.payload
+
+
+def test_key_ignores_order_and_empty_params():
+    a = make_request("/admin/calls", "limit=50&phone=&task_type=Claim")
+    b = make_request("/admin/calls", "task_type=Claim&limit=50")
+    assert ResponseCache.key(a) == ResponseCache.key(b)
+
+
+def test_etag_matching():
+    etag = etag_for(b"{}")
+    assert etag_matches(etag, etag)
+    assert etag_matches(f'"other", W/{etag}', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches('"other"', etag)
+    assert not etag_matches(None, etag)
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = ResponseCache(ttl_sec=10)
+    cache.put("k", b"body", '"e"')
+    clock.now += 9
+    assert cache.get("k") == (b"body", '"e"')
+    clock.now += 2
+    assert cache.get("k") is None
+    assert len(cache) == 0
+
+
+def test_least_recently_used_is_evicted(clock):
+    cache = ResponseCache(ttl_sec=60, max_entries=2)
+    cache.put("a", b"a", '"a"')
+    cache.put("b", b"b", '"b"')
+    assert cache.get("a") is not None  # "b" is now least recently used
+    cache.put("c", b"c", '"c"')
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+
+
+def test_serve_hits_cache_until_invalidated(clock):
+    async def run():
+        cache = ResponseCache(ttl_sec=10)
+        compute = Compute()
+        first = await cache.serve(make_request(), compute)
+        second = await cache.serve(make_request(), compute)
+        assert compute.calls == 1
+        assert first.body == second.body
+        assert json.loads(first.body) == {"ok": True, "calls": 3}
+        assert first.headers["etag"] == etag_for(first.body)
+        assert first.headers["cache-control"] == "no-cache"
+
+        cache.invalidate()
+        await cache.serve(make_request(), compute)
+        assert compute.calls == 2
+
+    asyncio.run(run())
+
+
+def test_matching_if_none_match_gets_304(clock):
+    async def run():
+        cache = ResponseCache(ttl_sec=10)
+        compute = Compute()
+        first = await cache.serve(make_request(), compute)
+        etag = first.headers["etag"]
+        again = await cache.serve(make_request(if_none_match=etag), compute)
+        assert again.status_code == 304
+        assert again.body == b""
+        assert again.headers["etag"] == etag
+        stale = await cache.serve(make_request(if_none_match='"old"'), compute)
+        assert stale.status_code == 200
+
+    asyncio.run(run())
+
+
+def test_errors_are_not_cached(clock):
+    async def run():
+        cache = ResponseCache(ttl_sec=10)
+        compute = Compute({"ok": False, "error": "db down"})
+        await cache.serve(make_request(), compute)
+        await cache.serve(make_request(), compute)
+        assert compute.calls == 2
+
+    asyncio.run(run())
+
+
+def test_result_computed_across_invalidation_is_not_stored(clock):
+    async def run():
+        cache = ResponseCache(ttl_sec=10)
+
+        async def racing_compute():
+            cache.invalidate()  # a call record lands mid-query
+            return {"ok": True}
+
+        await cache.serve(make_request(), racing_compute)
+        assert len(cache) == 0
+
+    asyncio.run(run())
+
+
+def test_zero_ttl_disables_caching():
+    async def run():
+        cache = ResponseCache(ttl_sec=0)
+        compute = Compute()
+        await cache.serve(make_request(), compute)
+        await cache.serve(make_request(), compute)
+        assert compute.calls == 2
+        assert len(cache) == 0
+
+    asyncio.run(run())
@@ -0,0 +1,153 @@
+# tests/test_transfer_state.py
+import asyncio
+import os
+
+import pytest
+
+import transfer_state
+from transfer_state import (
+    InMemoryTransferState,
+    SQLiteTransferState,
+    TransferStateBackend,
+    is_final_transfer_status,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(transfer_state.time, "monotonic", fake)
+    return fake
+
+
+def test_final_statuses():
+    assert is_final_transfer_status("answered")
+    assert is_final_transfer_status("busy")
+    assert not is_final_transfer_status("ringing")
+    assert not is_final_transfer_status("pending")
+    assert not is_final_transfer_status(None)
+
+
+def test_incomplete_backend_fails_at_construction():
+    class ReadOnly(TransferStateBackend):
+        def _get(self, call_sid):
+            return None
+
+    with pytest.raises(TypeError):
+        ReadOnly()
+
+
+def test_memory_entries_expire(clock):
+    async def run():
+        state = InMemoryTransferState(ttl_sec=10)
+        await state.set_pending("CA1", "+15550001111")
+        assert await state.get("CA1") == {"status": "pending", "to": "+15550001111"}
+        clock.now += 11
+        assert await state.get("CA1") is None
+        assert len(state) == 0
+
+    asyncio.run(run())
+
+
+def test_memory_evicts_oldest_past_max_entries(clock):
+    async def run():
+        state = InMemoryTransferState(ttl_sec=60, max_entries=2)
+        for sid in ("CA1", "CA2", "CA3"):
+            await state.set_pending(sid, "+1")
+        assert await state.get("CA1") is None
+        assert await state.get_status("CA2") == "pending"
+        assert await state.get_status("CA3") == "pending"
+
+    asyncio.run(run())
+
+
+def test_set_status_ignores_unknown_calls():
+    async def run():
+        state = InMemoryTransferState()
+        await state.set_status("CA404", "answered")
+        assert await state.get("CA404") is None
+
+    asyncio.run(run())
+
+
+def test_final_status_wakes_waiter():
+    async def run():
+        state = InMemoryTransferState()
+        await state.set_pending("CA1", "+1")
+        waiter = asyncio.create_task(state.wait_for_final("CA1", timeout=5))
+        await asyncio.sleep(0)
+        await state.set_status("CA1", "ringing")
+        await asyncio.sleep(0)
+        assert not waiter.done()
+        await state.set_status("CA1", "answered")
+        assert await asyncio.wait_for(waiter, 1) == "answered"
+        assert state._waiters == {}
+
+    asyncio.run(run())
+
+
+def test_wait_returns_existing_final_status():
+    async def run():
+        state = InMemoryTransferState()
+        await state.set_pending("CA1", "+1")
+        await state.set_status("CA1", "busy")
+        assert await state.wait_for_final("CA1", timeout=0.01) == "busy"
+
+    asyncio.run(run())
+
+
+def test_wait_times_out_and_cleans_up():
+    async def run():
+        state = InMemoryTransferState()
+        await state.set_pending("CA1", "+1")
+        assert await state.wait_for_final("CA1", timeout=0.01) is None
+        assert state._waiters == {}
+
+    asyncio.run(run())
+
+
+def test_sqlite_opens_on_start_and_wakes_local_waiter(tmp_path):
+    path = str(tmp_path / "transfers.sqlite3")
+
+    async def run():
+        state = SQLiteTransferState(path, recheck_sec=0.05)
+        assert not os.path.exists(path)
+        await state.start()
+        try:
+            assert os.path.exists(path)
+            await state.set_pending("CA1", "+1")
+            waiter = asyncio.create_task(state.wait_for_final("CA1", timeout=5))
+            await asyncio.sleep(0.01)
+            await state.set_status("CA1", "no-answer")
+            assert await asyncio.wait_for(waiter, 1) == "no-answer"
+        finally:
+            await state.close()
+
+    asyncio.run(run())
+
+
+def test_sqlite_recheck_sees_status_written_elsewhere(tmp_path):
+    path = str(tmp_path / "transfers.sqlite3")
+
+    async def run():
+        state = SQLiteTransferState(path, recheck_sec=0.05)
+        await state.start()
+        try:
+            await state.set_pending("CA1", "+1")
+            waiter = asyncio.create_task(state.wait_for_final("CA1", timeout=5))
+            await asyncio.sleep(0.01)
+            # another worker's write, without a datagram
+            await state._run(state._write, "CA1", {"status": "failed", "to": "+1"})
+            assert await asyncio.wait_for(waiter, 1) == "failed"
+        finally:
+            await state.close()
+
+    asyncio.run(run())
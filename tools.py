@@ -0,0 +1,261 @@
+# tools.py
+"""Realtime tool registry and per-call tool runner.
+
+Tools are plain async handlers registered by name with ``@register_tool``.
+``ToolRunner.dispatch`` runs each call as its own task with its own timeout,
+so the Twilio <-> OpenAI audio loop never waits on a tool.
+"""
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+from call_journal import save_call_record
+from codec import dumps, loads
+from logger import get_logger
+from metrics import TOOL_DURATION_SECONDS, TRANSFER_DURATION_SECONDS, observe
+from telephony_transfer import (
+    async_client,
+    transfer_call_via_url,
+    wait_for_transfer_result,
+)
+from twilio_frames import TwilioFrames
+
+log = get_logger("tools")
+
+DEFAULT_TOOL_TIMEOUT = 15.0
+TRANSFER_TIMEOUT_SEC = 70
+
+# Map line_number -> phone number (used when model chooses a line)
+LINE_MAP = {
+    "1": "+13526659393",
+    "2": "+12125551234",
+    "3": "+17185551234",
+}
+
+
+class CallContext:
+    """Per-call state shared between the media-stream bridge and tool handlers."""
+
+    def __init__(self, openai_ws, websocket):
+        self.openai_ws = openai_ws
+        self.websocket = websocket
+        self.caller_phone = ""
+        self.call_sid = ""
+        self.stream_sid: Optional[str] = None
+        self.frames: Optional[TwilioFrames] = None
+        self.transferred = False
+        self.recording_path: Optional[str] = None
+
+
+ToolHandler = Callable[[Dict[str, Any], CallContext], Awaitable[Dict[str, Any]]]
+
+
+class Tool:
+    def __init__(self, name: str, handler: ToolHandler, timeout: float):
+        self.name = name
+        self.handler = handler
+        self.timeout = timeout
+
+
+# name -> Tool
+TOOL_REGISTRY: Dict[str, Tool] = {}
+
+
+def register_tool(name: str, timeout: float = DEFAULT_TOOL_TIMEOUT):
+    """Decorator that registers an async ``handler(args, ctx) -> dict`` as a tool."""
+
+    def decorator(handler: ToolHandler) -> ToolHandler:
+        TOOL_REGISTRY[name] = Tool(name, handler, timeout)
+        return handler
+
+    return decorator
+
+
+# =======================
+# Runner
+# =======================
+class ToolRunner:
+    """Runs tool calls for one media stream as background tasks."""
+
+    def __init__(self, ctx: CallContext):
+        self.ctx = ctx
+        self._tasks: Set[asyncio.Task] = set()
+
+    def dispatch(self, call_id: str, name: str, raw_args: str) -> asyncio.Task:
+        task = asyncio.create_task(self._run(call_id, name, raw_args))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def cancel_all(self) -> None:
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _run(self, call_id: str, name: str, raw_args: str) -> None:
+        log.info("[FUNCTION] Function call complete: %s", name)
+        log.debug("[FUNCTION] Raw arguments: '%s'", raw_args)
+
+        try:
+            args = loads(raw_args) if raw_args else {}
+        except Exception as e:
+            log.warning("[FUNCTION] Failed to parse args for %s: %s", name, e)
+            args = {}
+
+        tool = TOOL_REGISTRY.get(name)
+        if tool is None:
+            tool_output = {"ok": False, "error": f"Unknown tool {name}"}
+        else:
+            log.info("[FUNCTION] Executing tool: %s with args: %s", name, args)
+            started = time.monotonic()
+            try:
+                tool_output = await asyncio.wait_for(
+                    tool.handler(args, self.ctx), tool.timeout
+                )
+            except asyncio.TimeoutError:
+                tool_output = {
+                    "ok": False,
+                    "error": f"{name} timed out after {tool.timeout}s",
+                }
+            except Exception as e:
+                log.exception("[FUNCTION] Tool %s failed", name)
+                tool_output = {"ok": False, "error": str(e)}
+            observe(TOOL_DURATION_SECONDS, time.monotonic() - started, tool=name)
+
+        log.info("[FUNCTION] Tool output: %s", tool_output)
+        await self._post_output(call_id, tool_output)
+
+    async def _post_output(self, call_id: str, tool_output: Dict[str, Any]) -> None:
+        # Once the caller has been handed to a human, the Realtime socket is closed.
+        if self.ctx.transferred:
+            return
+        try:
+            await self.ctx.openai_ws.send(
+                dumps(
+                    {
+                        "type": "conversation.item.create",
+                        "item": {
+                            "type": "function_call_output",
+                            "call_id": call_id,
+                            "output": dumps(tool_output),
+                        },
+                    }
+                )
+            )
+            await self.ctx.openai_ws.send(dumps({"type": "response.create"}))
+        except Exception as e:
+            log.error("[FUNCTION] Failed to post output for %s: %s", call_id, e)
+
+
+# =======================
+# Tools
+# =======================
+def normalize_e164(num: str) -> str:
+    # very light normalization; tweak as needed
+    return num.replace(" ", "").replace("-", "")
+
+
+@register_tool("record_call_data", timeout=10)
+async def record_call_data(args: Dict[str, Any], ctx: CallContext) -> Dict[str, Any]:
+    # 🚫 Never trust the model's caller_phone. Always use the server's.
+    server_phone = normalize_e164(ctx.caller_phone or "")
+    if not server_phone.startswith("+") or len(server_phone) < 8:
+        # Fail fast if we truly don't have it; better than saving a fake number.
+        raise RuntimeError(
+            f"Missing/invalid server caller_phone: '{server_phone}'. "
+            "Refusing to insert with placeholder."
+        )
+
+    log.info("📝 Recording call data for: %s", server_phone)
+
+    tool_output = await save_call_record(
+        caller_phone=server_phone,  # ← force the real one
+        task_type=args.get("task_type", ""),
+        call_summary=args.get("call_summary", ""),
+        detail_info=args.get("detail_info", ""),
+        recording_path=ctx.recording_path,
+    )
+
+    log.info("✅ Call record saved: %s", tool_output)
+    return tool_output
+
+
+@register_tool("check_status", timeout=5)
+async def check_status(args: Dict[str, Any], ctx: CallContext) -> Dict[str, Any]:
+    # simple deterministic mock: line 1 busy, others free
+    req_lines = args.get("line_numbers", [])
+    return {
+        "ok": True,
+        "status": {str(n): ("busy" if int(n) == 1 else "available") for n in req_lines},
+    }
+
+
+@register_tool("end_call", timeout=5)
+async def end_call(args: Dict[str, Any], ctx: CallContext) -> Dict[str, Any]:
+    log.info("📞 Ending call - Reason: %s", args.get("reason", "N/A"))
+    return {"ended": True, "reason": args.get("reason", "")}
+
+
+# the redirect (with every Twilio retry), then the wait for a final status
+@register_tool(
+    "transfer_to_human",
+    timeout=async_client.max_duration() + TRANSFER_TIMEOUT_SEC + 5,
+)
+async def transfer_to_human(args: Dict[str, Any], ctx: CallContext) -> Dict[str, Any]:
+    # Allow either line_number (preferred) or target_number
+    line_number = args.get("line_number")
+    target = args.get("target_number")
+
+    if line_number is not None and target is None:
+        try:
+            target = LINE_MAP[str(int(line_number))]
+        except Exception:
+            return {"ok": False, "error": f"invalid line_number: {line_number}"}
+
+    if not target:
+        return {"ok": False, "error": "missing line_number or target_number"}
+    if not ctx.call_sid:
+        return {"ok": False, "error": "missing_call_sid"}
+
+    try:
+        log.info("📞 Transferring %s to %s...", ctx.caller_phone, target)
+
+        # Redirect active leg to our TwiML route
+        started = time.monotonic()
+        await transfer_call_via_url(ctx.call_sid, target)
+
+        # Wake as soon as the dial-action / number-status webhook reports a final status
+        final_status = await wait_for_transfer_result(
+            ctx.call_sid, TRANSFER_TIMEOUT_SEC
+        )
+        observe(
+            TRANSFER_DURATION_SECONDS,
+            time.monotonic() - started,
+            status=final_status or "timeout",
+        )
+
+        if final_status in ("answered", "completed"):
+            log.info("✅ Transfer successful: %s", final_status)
+            ctx.transferred = True
+            try:
+                await ctx.openai_ws.close()
+            except Exception:
+                pass
+            return {"ok": True, "transferred_to": target, "status": final_status}
+        elif final_status in ("busy", "no-answer", "failed"):
+            log.warning("❌ Transfer failed: %s", final_status)
+            return {
+                "ok": False,
+                "transferred_to": target,
+                "status": final_status,
+                "error": "transfer_failed",
+            }
+        else:
+            log.warning("⏳ Transfer timeout: %s", final_status)
+            return {"ok": True, "transferred_to": target, "status": "pending_timeout"}
+
+    except Exception as e:
+        log.exception("❌ Transfer error: %s", e)
+        return {"ok": False, "error": str(e)}
@@ -0,0 +1,371 @@
+# transfer_state.py
+"""Pluggable storage for live-transfer status.
+
+The media-stream bridge waits for a transfer outcome while Twilio reports it
+through /twilio/dial-action and /twilio/number-status. Both sides talk to a
+TransferStateBackend:
+
+- ``memory``: process-local, TTL + max-size eviction (single worker)
+- ``sqlite``: one SQLite file shared by every worker on the host; writers
+  broadcast the call_sid over Unix datagram sockets so the worker holding
+  the media stream wakes immediately. SQLite calls run on a dedicated
+  thread, so a busy database never stalls the event loop.
+"""
+
+import asyncio
+import glob
+import os
+import socket
+import sqlite3
+import tempfile
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Set
+
+TRANSFER_STATE_BACKEND = os.getenv("TRANSFER_STATE_BACKEND", "memory")
+TRANSFER_STATE_TTL_SEC = float(os.getenv("TRANSFER_STATE_TTL_SEC", 3600))
+TRANSFER_STATE_MAX_ENTRIES = int(os.getenv("TRANSFER_STATE_MAX_ENTRIES", 10000))
+TRANSFER_STATE_SQLITE_PATH = os.getenv(
+    "TRANSFER_STATE_SQLITE_PATH",
+    os.path.join(tempfile.gettempdir(), "princeton-sentinel-transfers.sqlite3"),
+)
+
+# Statuses that mean the <Dial> is still in flight; anything else is final.
+PENDING_TRANSFER_STATUSES = {"pending", "queued", "ringing", "in-progress", "initiated"}
+
+
+def is_final_transfer_status(status: Optional[str]) -> bool:
+    return bool(status) and status not in PENDING_TRANSFER_STATUSES
+
+
+class TransferStateBackend(ABC):
+    """Interface + local waiter bookkeeping shared by all backends.
+
+    Entries look like ``{"status": "pending"|"answered"|..., "to": "+1..."}``.
+    """
+
+    def __init__(self):
+        # call_sid -> futures of bridges in this process waiting for a final status
+        self._waiters: Dict[str, Set[asyncio.Future]] = {}
+
+    # ---------- storage (implemented by backends) ----------
+    @abstractmethod
+    def _get(self, call_sid: str) -> Optional[Dict[str, str]]:
+        """Blocking read of one entry; None if missing or expired."""
+
+    @abstractmethod
+    def _write(self, call_sid: str, entry: Dict[str, str]) -> None:
+        """Blocking insert-or-replace of one entry."""
+
+    def _update_status(self, call_sid: str, status: str) -> bool:
+        entry = self._get(call_sid)
+        if entry is None:
+            return False
+        entry["status"] = status
+        self._write(call_sid, entry)
+        return True
+
+    async def _run(self, fn: Callable[..., Any], *args) -> Any:
+        """Run a storage call; backends whose storage can block move it off the loop."""
+        return fn(*args)
+
+    def _publish(self, call_sid: str, status: str) -> None:
+        """Tell other processes that call_sid reached a final status."""
+
+    # ---------- lifecycle ----------
+    async def start(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+    # ---------- public API ----------
+    async def get(self, call_sid: str) -> Optional[Dict[str, str]]:
+        return await self._run(self._get, call_sid)
+
+    async def set_pending(self, call_sid: str, to_number: str) -> None:
+        await self._run(self._write, call_sid, {"status": "pending", "to": to_number})
+
+    async def set_status(self, call_sid: str, status: str) -> None:
+        if not await self._run(self._update_status, call_sid, status):
+            return
+        if is_final_transfer_status(status):
+            self._wake(call_sid, status)
+            self._publish(call_sid, status)
+
+    async def get_status(self, call_sid: str) -> Optional[str]:
+        return (await self.get(call_sid) or {}).get("status")
+
+    async def wait_for_final(self, call_sid: str, timeout: float) -> Optional[str]:
+        """Wait for a final status for call_sid; None if none arrived within timeout."""
+        # Register before reading: a wakeup during the read must not be lost
+        fut = asyncio.get_running_loop().create_future()
+        waiters = self._waiters.setdefault(call_sid, set())
+        waiters.add(fut)
+        try:
+            status = await self.get_status(call_sid)
+            if is_final_transfer_status(status):
+                return status
+            return await asyncio.wait_for(fut, timeout)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            # Covers timeout and cancellation of the waiting bridge
+            waiters.discard(fut)
+            if not waiters and self._waiters.get(call_sid) is waiters:
+                del self._waiters[call_sid]
+
+    def _wake(self, call_sid: str, status: str) -> None:
+        for fut in self._waiters.pop(call_sid, ()):
+            if not fut.done():
+                fut.set_result(status)
+
+
+# =======================
+# In-process backend
+# =======================
+class InMemoryTransferState(TransferStateBackend):
+    """Process-local dict with TTL and LRU-style max-size eviction."""
+
+    def __init__(
+        self,
+        ttl_sec: float = TRANSFER_STATE_TTL_SEC,
+        max_entries: int = TRANSFER_STATE_MAX_ENTRIES,
+    ):
+        super().__init__()
+        self.ttl_sec = ttl_sec
+        self.max_entries = max_entries
+        # call_sid -> (expires_at, entry); ordered oldest write first
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _get(self, call_sid: str) -> Optional[Dict[str, str]]:
+        item = self._entries.get(call_sid)
+        if item is None:
+            return None
+        expires_at, entry = item
+        if expires_at <= time.monotonic():
+            del self._entries[call_sid]
+            return None
+        return dict(entry)
+
+    def _write(self, call_sid: str, entry: Dict[str, str]) -> None:
+        now = time.monotonic()
+        self._entries[call_sid] = (now + self.ttl_sec, dict(entry))
+        self._entries.move_to_end(call_sid)
+        self._evict(now)
+
+    def _evict(self, now: float) -> None:
+        entries = self._entries
+        # Oldest writes sit at the front, so expired entries are found there first
+        while entries:
+            call_sid, (expires_at, _) = next(iter(entries.items()))
+            if expires_at > now and len(entries) <= self.max_entries:
+                break
+            del entries[call_sid]
+
+
+# =======================
+# Shared (multi-worker) backend
+# =======================
+class SQLiteTransferState(TransferStateBackend):
+    """Host-wide state in SQLite, with Unix-datagram wakeups between workers.
+
+    Every worker binds ``<path>.d/worker-<pid>.sock``. A final status written
+    by any worker is sent to all sockets; receivers re-read the row and
+    resolve their local waiters. Waiters also re-check the row every
+    ``recheck_sec`` as a safety net for workers that were restarting.
+
+    The database is opened by ``start()`` on the backend's executor thread,
+    the only thread that uses it. There the busy timeout can wait out another
+    worker's write without blocking the loop.
+    """
+
+    _EVICT_EVERY = 100
+
+    def __init__(
+        self,
+        path: str = TRANSFER_STATE_SQLITE_PATH,
+        ttl_sec: float = TRANSFER_STATE_TTL_SEC,
+        max_entries: int = TRANSFER_STATE_MAX_ENTRIES,
+        recheck_sec: float = 5.0,
+    ):
+        super().__init__()
+        self.path = path
+        self.ttl_sec = ttl_sec
+        self.max_entries = max_entries
+        self.recheck_sec = recheck_sec
+        self.socket_dir = f"{path}.d"
+        self._sock: Optional[socket.socket] = None
+        self._sock_path: Optional[str] = None
+        self._writes = 0
+        self._rechecks: Set[asyncio.Task] = set()
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="transfer-state"
+        )
+        self._db: Optional[sqlite3.Connection] = None
+
+    # ---------- storage (transfer-state thread) ----------
+    async def _run(self, fn: Callable[..., Any], *args) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, fn, *args)
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is not None:
+            return self._db
+        db = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS transfer_state (
+                call_sid TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                to_number TEXT,
+                updated_at REAL NOT NULL
+            )
+        """
+        )
+        db.execute(
+            "CREATE INDEX IF NOT EXISTS idx_transfer_state_updated "
+            "ON transfer_state (updated_at)"
+        )
+        self._db = db
+        return db
+
+    def _get(self, call_sid: str) -> Optional[Dict[str, str]]:
+        row = self._connect().execute(
+            "SELECT status, to_number FROM transfer_state "
+            "WHERE call_sid = ? AND updated_at > ?",
+            (call_sid, time.time() - self.ttl_sec),
+        ).fetchone()
+        if row is None:
+            return None
+        return {"status": row[0], "to": row[1]}
+
+    def _write(self, call_sid: str, entry: Dict[str, str]) -> None:
+        self._connect().execute(
+            """
+            INSERT INTO transfer_state (call_sid, status, to_number, updated_at)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(call_sid) DO UPDATE SET
+                status = excluded.status,
+                to_number = excluded.to_number,
+                updated_at = excluded.updated_at
+        """,
+            (call_sid, entry.get("status"), entry.get("to"), time.time()),
+        )
+        self._writes += 1
+        if self._writes % self._EVICT_EVERY == 0:
+            self._evict()
+
+    def _evict(self) -> None:
+        self._db.execute(
+            "DELETE FROM transfer_state WHERE updated_at <= ?",
+            (time.time() - self.ttl_sec,),
+        )
+        self._db.execute(
+            """
+            DELETE FROM transfer_state WHERE call_sid NOT IN (
+                SELECT call_sid FROM transfer_state
+                ORDER BY updated_at DESC LIMIT ?
+            )
+        """,
+            (self.max_entries,),
+        )
+
+    # ---------- cross-process notifications ----------
+    async def start(self) -> None:
+        if self._sock is not None:
+            return
+        await self._run(self._connect)
+        os.makedirs(self.socket_dir, exist_ok=True)
+        self._sock_path = os.path.join(self.socket_dir, f"worker-{os.getpid()}.sock")
+        if os.path.exists(self._sock_path):
+            os.unlink(self._sock_path)
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        sock.setblocking(False)
+        sock.bind(self._sock_path)
+        self._sock = sock
+        asyncio.get_running_loop().add_reader(sock.fileno(), self._on_datagram)
+
+    async def close(self) -> None:
+        sock, self._sock = self._sock, None
+        if sock is not None:
+            try:
+                asyncio.get_running_loop().remove_reader(sock.fileno())
+            except Exception:
+                pass
+            sock.close()
+        if self._sock_path and os.path.exists(self._sock_path):
+            os.unlink(self._sock_path)
+        await self._run(self._close_db)
+        self._executor.shutdown(wait=False)
+
+    def _close_db(self) -> None:
+        db, self._db = self._db, None
+        if db is not None:
+            db.close()
+
+    def _publish(self, call_sid: str, status: str) -> None:
+        payload = call_sid.encode()
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sender:
+            sender.setblocking(False)
+            for path in glob.glob(os.path.join(self.socket_dir, "worker-*.sock")):
+                if path == self._sock_path:
+                    continue  # local waiters were already woken
+                try:
+                    sender.sendto(payload, path)
+                except (ConnectionRefusedError, FileNotFoundError):
+                    # Worker died without cleaning up its socket
+                    try:
+                        os.unlink(path)
+                    except OSError:
+                        pass
+                except BlockingIOError:
+                    pass  # receiver is backed up; its recheck will catch up
+
+    def _on_datagram(self) -> None:
+        while self._sock is not None:
+            try:
+                data = self._sock.recv(512)
+            except (BlockingIOError, InterruptedError):
+                return
+            call_sid = data.decode(errors="ignore")
+            if call_sid in self._waiters:
+                task = asyncio.ensure_future(self._recheck(call_sid))
+                self._rechecks.add(task)
+                task.add_done_callback(self._rechecks.discard)
+
+    async def _recheck(self, call_sid: str) -> None:
+        status = await self.get_status(call_sid)
+        if is_final_transfer_status(status):
+            self._wake(call_sid, status)
+
+    async def wait_for_final(self, call_sid: str, timeout: float) -> Optional[str]:
+        await self.start()
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            status = await super().wait_for_final(
+                call_sid, min(remaining, self.recheck_sec)
+            )
+            if status is not None:
+                return status
+
+
+def create_transfer_state_backend(
+    kind: str = TRANSFER_STATE_BACKEND,
+) -> TransferStateBackend:
+    if kind == "memory":
+        return InMemoryTransferState()
+    if kind == "sqlite":
+        return SQLiteTransferState()
+    raise ValueError(f"Unknown TRANSFER_STATE_BACKEND: {kind!r} (use memory or sqlite)")
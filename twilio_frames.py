@@ -0,0 +1,31 @@
+# twilio_frames.py
+"""Pre-templated outbound Twilio Media Stream frames.
+
+Realtime audio deltas are already base64 μ-law, which is exactly what Twilio
+wants in ``media.payload``. Base64 never contains ``"`` or ``\\``, so the
+payload can be spliced into a pre-serialized frame untouched: no decode,
+no re-encode, no dict, no json.dumps per frame.
+"""
+
+import json
+
+
+class TwilioFrames:
+    """Serialized frame templates for one stream_sid."""
+
+    def __init__(self, stream_sid: str):
+        self.stream_sid = stream_sid
+        sid = json.dumps(stream_sid)
+        self._media_prefix = (
+            '{"event":"media","streamSid":' + sid + ',"media":{"payload":"'
+        )
+        self._media_suffix = '"}}'
+        self._mark_prefix = '{"event":"mark","streamSid":' + sid + ',"mark":{"name":'
+        self.clear = '{"event":"clear","streamSid":' + sid + "}"
+
+    def media(self, payload_b64: str) -> str:
+        """Twilio `media` frame carrying an already base64-encoded μ-law payload."""
+        return self._media_prefix + payload_b64 + self._media_suffix
+
+    def mark(self, name: str) -> str:
+        return self._mark_prefix + json.dumps(name) + "}}"
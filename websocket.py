@@ -1,42 +1,56 @@
 # websocket_bridge.py
 import asyncio
 import base64
-import json
-import traceback
-from typing import Dict
+import logging
+from typing import Dict, Optional
 
-import websockets
 from fastapi import WebSocket, WebSocketDisconnect
 from starlette.websockets import WebSocketState
 
 from app_instance import (
+    AUDIO_PASSTHROUGH,
     LOG_EVENT_TYPES,
-    OPENAI_API_KEY,
     SHOW_TIMING_MATH,
-    TEMPERATURE,
     app,
 )
-from db_utils import insert_call_record
-from interruption import handle_speech_started_event
-from session_setup import initialize_session
-from telephony_transfer import get_transfer_status, transfer_call_via_url
+from codec import (
+    AUDIO_DELTA_EVENT,
+    FAST_FRAME_PARSING,
+    dumps,
+    loads,
+    parse_audio_delta,
+    parse_twilio_media,
+)
+from frame_queue import FrameQueue
+from inbound_audio import FrameCoalescer
+from interruption import InterruptionEngine
+from logger import bind_call, get_logger, log_event, new_call_context
+from metrics import (
+    ACTIVE_CALLS,
+    CALLS_TOTAL,
+    INBOUND_FRAMES,
+    CallLatency,
+    counter,
+    gauge,
+)
+from playback import PlaybackTracker
+from realtime_pool import realtime_pool
+from recording import CallRecorder, start_recording
+from session_setup import send_initial_conversation_item, session_metadata_update
+from tools import CallContext, ToolRunner
+from twilio_frames import TwilioFrames
 
-# Map line_number -> phone number (used when model chooses a line)
-LINE_MAP = {
-    "1": "+13526659393",
-    "2": "+12125551234",
-    "3": "+17185551234",
-}
+log = get_logger("bridge")
 
 
-async def try_send_media(websocket: WebSocket, payload: dict) -> bool:
+async def try_send_text(websocket: WebSocket, text: str) -> bool:
     """
-    Safely send JSON to Twilio WebSocket. Returns False if the WS is already closed.
+    Send an already-serialized frame to Twilio. Returns False if the WS is already closed.
     """
     try:
         if websocket.client_state != WebSocketState.CONNECTED:
             return False
-        await websocket.send_json(payload)
+        await websocket.send_text(text)
         return True
     except Exception:
         return False
@@ -48,235 +62,248 @@ async def try_send_media(websocket: WebSocket, payload: dict) -> bool:
 @app.websocket("/media-stream")
 async def handle_media_stream(websocket: WebSocket):
     """Bridge audio and events between Twilio and OpenAI Realtime."""
-    print("Client connected to Princeton Insurance system")
+    new_call_context()
+    log.info("Client connected to Princeton Insurance system")
     await websocket.accept()
-
-    # Initialize - will be populated from Twilio's 'start' event
-    caller_phone = ""
-    call_sid = ""
-    stream_sid = None
+    latency = CallLatency()
+    counter(CALLS_TOTAL).inc()
 
     # buffers for function args (call_id -> json string)
     function_arg_buffers: Dict[str, str] = {}
 
-    async with websockets.connect(
-        f"wss://api.openai.com/v1/realtime?model=gpt-realtime&temperature={TEMPERATURE}",
-        extra_headers={"Authorization": f"Bearer {OPENAI_API_KEY}"},
-    ) as openai_ws:
-        await initialize_session(openai_ws)
-
-        # per-connection state
-        transferred = False
+    # Pre-warmed session when one is ready (already connected and configured).
+    # Sally greets from the 'start' handler, once Twilio has given us a stream.
+    async with realtime_pool.session() as openai_ws:
+        # per-connection state (caller metadata is populated from Twilio's 'start' event)
+        call = CallContext(openai_ws, websocket)
+        tools = ToolRunner(call)
         latest_media_timestamp = 0
-        last_assistant_item = None
-        mark_queue = []
-        response_start_timestamp_twilio = None
-        last_interruption_time = 0
+        playback = PlaybackTracker()
+        # bounded hand-off between each socket reader and the opposite writer
+        to_twilio = FrameQueue("to_twilio")
+        to_openai = FrameQueue("to_openai")
+        # batches caller frames into fewer appends (and gates silence if enabled)
+        inbound = FrameCoalescer()
+        recorder: Optional[CallRecorder] = None  # set on 'start' if enabled
+        interruptions = InterruptionEngine(
+            openai_ws, to_twilio, playback, show_timing_math=SHOW_TIMING_MATH
+        )
 
         async def receive_from_twilio():
-            nonlocal stream_sid, call_sid, caller_phone, latest_media_timestamp
+            nonlocal latest_media_timestamp, recorder
             try:
                 async for message in websocket.iter_text():
-                    data = json.loads(message)
+                    # Fast path: ~50 media frames/sec, only timestamp + payload needed
+                    media = parse_twilio_media(message) if FAST_FRAME_PARSING else None
+                    if media is not None:
+                        if recorder is not None:
+                            recorder.caller(media.payload)
+                        if openai_ws.state.name == "OPEN":
+                            latest_media_timestamp = media.timestamp
+                            frame = inbound.push(media.payload)
+                            if frame is not None:
+                                to_openai.put_audio(frame)
+                        continue
+
+                    data = loads(message)
+
+                    if data["event"] == "media" and recorder is not None:
+                        recorder.caller(data["media"]["payload"])
 
                     if data["event"] == "media" and openai_ws.state.name == "OPEN":
                         latest_media_timestamp = int(data["media"]["timestamp"])
-                        await openai_ws.send(
-                            json.dumps(
-                                {
-                                    "type": "input_audio_buffer.append",
-                                    "audio": data["media"]["payload"],
-                                }
-                            )
-                        )
+                        frame = inbound.push(data["media"]["payload"])
+                        if frame is not None:
+                            to_openai.put_audio(frame)
 
                     elif data["event"] == "start":
-                        stream_sid = data["start"]["streamSid"]
-                        call_sid = data["start"].get("callSid", "")
+                        call.stream_sid = data["start"]["streamSid"]
+                        call.frames = TwilioFrames(call.stream_sid)
+                        call.call_sid = data["start"].get("callSid", "")
 
                         # ⭐ Extract caller info from customParameters
                         custom_params = data["start"].get("customParameters", {})
-                        caller_phone = custom_params.get("caller_phone", "")
-
-                        # ⭐ ENHANCED LOGGING - This is where caller info gets logged
-                        print("=" * 70, flush=True)
-                        print("🔵 PRINCETON INSURANCE CALL STARTED", flush=True)
-                        print("=" * 70, flush=True)
-                        print(
-                            f"📞 CALLER PHONE:  {caller_phone or '⚠️ MISSING'}",
-                            flush=True,
+                        call.caller_phone = custom_params.get("caller_phone", "")
+
+                        bind_call(call_sid=call.call_sid, stream_sid=call.stream_sid)
+
+                        if recorder is None:
+                            recorder = start_recording(call.call_sid or call.stream_sid)
+                            if recorder is not None:
+                                call.recording_path = recorder.path
+                        log.info(
+                            "🔵 PRINCETON INSURANCE CALL STARTED",
+                            extra={
+                                "fields": {
+                                    "caller_phone": call.caller_phone,
+                                    "custom_params": custom_params,
+                                }
+                            },
                         )
-                        print(f"📋 CALL SID:      {call_sid}", flush=True)
-                        print(f"🌊 STREAM SID:    {stream_sid}", flush=True)
-                        print(f"📦 CUSTOM PARAMS: {custom_params}", flush=True)
-                        print("=" * 70, flush=True)
 
                         # ⭐ Validation - warn if caller_phone is missing
-                        if not caller_phone:
-                            print(
-                                "⚠️⚠️⚠️ WARNING: caller_phone is EMPTY! Check TwiML <Parameter> tags ⚠️⚠️⚠️",
-                                flush=True,
+                        if not call.caller_phone:
+                            log.warning(
+                                "caller_phone is EMPTY! Check TwiML <Parameter> tags"
                             )
 
                         # ⭐ Update OpenAI session metadata with caller info
                         try:
                             await openai_ws.send(
-                                json.dumps(
-                                    {
-                                        "type": "session.update",
-                                        "session": {
-                                            "metadata": {
-                                                "caller_phone": caller_phone,
-                                                "call_sid": call_sid,
-                                                "stream_sid": stream_sid,
-                                            }
-                                        },
-                                    }
+                                session_metadata_update(
+                                    call.caller_phone, call.call_sid, call.stream_sid
                                 )
                             )
-                            print(
-                                f"✅ Updated OpenAI session metadata with caller: {caller_phone}",
-                                flush=True,
+                            log.info(
+                                "Updated OpenAI session metadata with caller: %s",
+                                call.caller_phone,
                             )
                         except Exception as e:
-                            print(
-                                f"❌ Failed to update session metadata: {e}", flush=True
-                            )
+                            log.error("Failed to update session metadata: %s", e)
+
+                        # Greet only now: audio needs call.frames (streamSid), and
+                        # a warm session would otherwise answer before 'start'
+                        try:
+                            await send_initial_conversation_item(openai_ws)
+                        except Exception as e:
+                            log.error("Failed to send the initial greeting: %s", e)
 
                         reset_state()
 
                     elif data["event"] == "mark":
-                        if mark_queue:
-                            mark_queue.pop(0)
+                        playback.on_mark(data.get("mark", {}).get("name", ""))
+
+                    elif data["event"] == "stop":
+                        frame = inbound.flush()
+                        if frame is not None:
+                            to_openai.put_audio(frame)
 
             except WebSocketDisconnect:
-                print("=" * 70, flush=True)
-                print(
-                    f"🔴 CALL DISCONNECTED - Caller: {caller_phone}, CallSid: {call_sid}",
-                    flush=True,
+                log.info(
+                    "🔴 CALL DISCONNECTED",
+                    extra={"fields": {"caller_phone": call.caller_phone}},
                 )
-                print("=" * 70, flush=True)
                 if openai_ws.state.name == "OPEN":
                     await openai_ws.close()
+            finally:
+                to_openai.close()
+
+        async def pump_to_openai():
+            """Writer: caller audio -> Realtime."""
+            while True:
+                frame = await to_openai.get()
+                if frame is None:
+                    break
+                try:
+                    await openai_ws.send(frame)
+                except Exception:
+                    break
+            to_openai.close()
+            # The caller side is finished; release the Realtime session too
+            if openai_ws.state.name == "OPEN":
+                await openai_ws.close()
+
+        async def pump_to_twilio():
+            """Writer: Sally's audio, marks and clears -> Twilio."""
+            while True:
+                frame = await to_twilio.get()
+                if frame is None:
+                    return
+                if not await try_send_text(websocket, frame):
+                    # Twilio WS closed; producers now get False from put_*
+                    to_twilio.close()
+                    return
 
         def reset_state():
-            nonlocal \
-                latest_media_timestamp, \
-                last_assistant_item, \
-                response_start_timestamp_twilio, \
-                last_interruption_time
+            nonlocal latest_media_timestamp
             latest_media_timestamp = 0
-            response_start_timestamp_twilio = None
-            last_assistant_item = None
-            last_interruption_time = 0
-            mark_queue.clear()
+            interruptions.reset()
+            playback.reset()
+            inbound.reset()
 
         async def send_to_twilio():
-            nonlocal \
-                stream_sid, \
-                last_assistant_item, \
-                response_start_timestamp_twilio, \
-                last_interruption_time, \
-                transferred
             try:
                 async for openai_message in openai_ws:
-                    response = json.loads(openai_message)
-                    evt_type = response.get("type")
-
                     # If we've transferred, close Realtime socket and stop loop
-                    if transferred:
+                    if call.transferred:
                         try:
                             await openai_ws.close()
                         except Exception:
                             pass
                         return
 
+                    # Fast path: audio deltas never need a full parse
+                    audio = (
+                        parse_audio_delta(openai_message) if FAST_FRAME_PARSING else None
+                    )
+                    if audio is not None:
+                        if not forward_audio(audio.item_id, audio.delta):
+                            return
+                        continue
+
+                    response = loads(openai_message)
+                    evt_type = response.get("type", "")
+
                     # lightweight logging
                     if evt_type in LOG_EVENT_TYPES:
-                        if evt_type == "response.output_audio.delta":
-                            clean = {
-                                "type": evt_type,
-                                "response_id": response.get("response_id"),
-                                "item_id": response.get("item_id"),
-                                "delta_length": len(response.get("delta", ""))
-                                if "delta" in response
-                                else 0,
-                            }
-                            print(f"Received event: {evt_type}", clean)
-                        else:
-                            print(f"Received event: {evt_type}")
+                        log_event(log, evt_type, "Received event")
 
                     if evt_type == "response.done":
-                        print(
-                            f"[AI] Response completed. Status: {response.get('response', {}).get('status')}",
-                            flush=True,
+                        log.info(
+                            "[AI] Response completed. Status: %s",
+                            response.get("response", {}).get("status"),
                         )
 
                     if evt_type == "conversation.item.created":
                         item = response.get("item", {})
-                        print(
-                            f"[CONVERSATION] New item: {item.get('type')} from {item.get('role')}",
-                            flush=True,
+                        log.info(
+                            "[CONVERSATION] New item: %s from %s",
+                            item.get("type"),
+                            item.get("role"),
                         )
                         if item.get("type") == "function_call":
-                            print(
-                                f"[CONVERSATION] AI wants to call function: {item.get('name')}",
-                                flush=True,
+                            log.info(
+                                "[CONVERSATION] AI wants to call function: %s",
+                                item.get("name"),
                             )
 
-                    # ----- stream audio back to Twilio -----
-                    if (
-                        evt_type == "response.output_audio.delta"
-                        and "delta" in response
-                    ):
-                        # Realtime returns base64-encoded μ-law. Twilio expects base64 again.
-                        audio_payload = base64.b64encode(
-                            base64.b64decode(response["delta"])
-                        ).decode("utf-8")
-
-                        ok = await try_send_media(
-                            websocket,
-                            {
-                                "event": "media",
-                                "streamSid": stream_sid,
-                                "media": {"payload": audio_payload},
-                            },
-                        )
-                        if not ok:
-                            # Twilio WS closed—stop loop
+                    # ----- stream audio back to Twilio (frames the fast path skipped) -----
+                    if evt_type == AUDIO_DELTA_EVENT and "delta" in response:
+                        item_id = response.get("item_id")
+                        if not forward_audio(item_id, response["delta"]):
                             return
+                        continue
 
-                        # track start of assistant response for smart interruption
-                        if (
-                            response.get("item_id")
-                            and response["item_id"] != last_assistant_item
-                        ):
-                            response_start_timestamp_twilio = latest_media_timestamp
-                            last_assistant_item = response["item_id"]
-                            if SHOW_TIMING_MATH:
-                                print(
-                                    f"Sally started new response @ {response_start_timestamp_twilio}ms (ID: {last_assistant_item})"
-                                )
-
-                        if not await send_mark(websocket, stream_sid):
-                            return
+                    if evt_type == "response.created":
+                        interruptions.on_response_created()
+                    elif evt_type == "response.done":
+                        interruptions.on_response_done()
 
                     # ----- intelligent interruption: caller started talking -----
                     if evt_type == "input_audio_buffer.speech_started":
-                        if last_assistant_item:
-                            speaking_dur = latest_media_timestamp - (
-                                response_start_timestamp_twilio or 0
-                            )
-                            since_last = latest_media_timestamp - last_interruption_time
-                            if speaking_dur > 500 and since_last > 1000:
-                                last_interruption_time = latest_media_timestamp
-                                await handle_speech_started_event(
-                                    openai_ws, websocket, stream_sid
-                                )
+                        latency.on_speech_started()
+                        cut = await interruptions.on_speech_started(
+                            latest_media_timestamp, call.frames
+                        )
+                        if cut and recorder is not None:
+                            recorder.assistant_cleared()
+                    elif evt_type == "input_audio_buffer.speech_stopped":
+                        latency.on_speech_stopped()
+
+                    # close out the item's audio with a final mark
+                    if evt_type in ("response.output_audio.done", "response.done"):
+                        if not send_mark(playback.flush()):
+                            return
 
                     # ====== FUNCTION CALL HANDLING ======
                     if evt_type.startswith("response.function_call"):
-                        print(f"[FUNCTION] Event: {evt_type} - {response}", flush=True)
+                        log_event(
+                            log,
+                            evt_type,
+                            "[FUNCTION] Event",
+                            logging.DEBUG,
+                            call_id=response.get("call_id"),
+                        )
 
                     # 1) accumulate streamed JSON args
                     if evt_type == "response.function_call_arguments.delta":
@@ -285,237 +312,112 @@ async def handle_media_stream(websocket: WebSocket):
                         function_arg_buffers[cid] = (
                             function_arg_buffers.get(cid, "") + delta
                         )
-                        print(
-                            f"[FUNCTION] Accumulating args for {cid}: +'{delta}' (total: '{function_arg_buffers[cid]}')",
-                            flush=True,
+                        log_event(
+                            log,
+                            evt_type,
+                            "[FUNCTION] Accumulating args",
+                            logging.DEBUG,
+                            call_id=cid,
+                            delta_length=len(delta),
+                            total_length=len(function_arg_buffers[cid]),
                         )
 
-                    # 2) on done, dispatch the tool
+                    # 2) on done, run the tool in the background so audio keeps flowing
                     elif evt_type == "response.function_call_arguments.done":
                         cid = response["call_id"]
                         tool_name = response.get("name")
                         raw_args = function_arg_buffers.pop(cid, "{}")
+                        tools.dispatch(cid, tool_name, raw_args)
+
+            except Exception:
+                log.exception("Error in send_to_twilio")
+            finally:
+                to_twilio.close()
+
+        def forward_audio(item_id: str | None, delta: str) -> bool:
+            """Queue one Realtime audio delta for Twilio; False once Twilio is gone."""
+            # Stragglers from an item the caller already talked over
+            if interruptions.should_drop(item_id):
+                return True
+
+            if AUDIO_DELTA_EVENT in LOG_EVENT_TYPES and log.isEnabledFor(logging.DEBUG):
+                log_event(
+                    log,
+                    AUDIO_DELTA_EVENT,
+                    "Received event",
+                    logging.DEBUG,
+                    item_id=item_id,
+                    delta_length=len(delta),
+                )
 
-                        print(
-                            f"[FUNCTION] Function call complete: {tool_name}",
-                            flush=True,
-                        )
-                        print(f"[FUNCTION] Raw arguments: '{raw_args}'", flush=True)
-
-                        try:
-                            args = json.loads(raw_args) if raw_args else {}
-                            print(f"[FUNCTION] Parsed arguments: {args}", flush=True)
-                        except Exception as e:
-                            print(
-                                f"[FUNCTION] Failed to parse args for {tool_name}: {e}",
-                                flush=True,
-                            )
-                            args = {}
-
-                        print(
-                            f"[FUNCTION] Executing tool: {tool_name} with args: {args}",
-                            flush=True,
-                        )
-
-                        # Handle each tool
-                        if tool_name == "record_call_data":
-                            # 🚫 Never trust the model's caller_phone. Always use the server's.
-                            def normalize_e164(num: str) -> str:
-                                # very light normalization; tweak as needed
-                                return num.replace(" ", "").replace("-", "")
-
-                            server_phone = normalize_e164(caller_phone or "")
-                            if (
-                                not server_phone.startswith("+")
-                                or len(server_phone) < 8
-                            ):
-                                # Fail fast if we truly don't have it; better than saving a fake number.
-                                raise RuntimeError(
-                                    f"Missing/invalid server caller_phone: '{server_phone}'. "
-                                    "Refusing to insert with placeholder."
-                                )
-
-                            print(
-                                f"📝 Recording call data for: {server_phone}",
-                                flush=True,
-                            )
-
-                            tool_output = insert_call_record(
-                                caller_phone=server_phone,  # ← force the real one
-                                task_type=args.get("task_type", ""),
-                                call_summary=args.get("call_summary", ""),
-                                detail_info=args.get("detail_info", ""),
-                            )
-
-                            print(f"✅ Call record inserted: {tool_output}", flush=True)
-
-                        elif tool_name == "check_status":
-                            # simple deterministic mock: line 1 busy, others free
-                            req_lines = args.get("line_numbers", [])
-                            tool_output = {
-                                "ok": True,
-                                "status": {
-                                    str(n): ("busy" if int(n) == 1 else "available")
-                                    for n in req_lines
-                                },
-                            }
-
-                        elif tool_name == "end_call":
-                            print(
-                                f"📞 Ending call - Reason: {args.get('reason', 'N/A')}",
-                                flush=True,
-                            )
-                            tool_output = {
-                                "ended": True,
-                                "reason": args.get("reason", ""),
-                            }
-
-                        elif tool_name == "transfer_to_human":
-                            # Allow either line_number (preferred) or target_number
-                            line_number = args.get("line_number")
-                            target = args.get("target_number")
-
-                            if line_number is not None and target is None:
-                                try:
-                                    target = LINE_MAP[str(int(line_number))]
-                                except Exception:
-                                    tool_output = {
-                                        "ok": False,
-                                        "error": f"invalid line_number: {line_number}",
-                                    }
-                                    await openai_ws.send(
-                                        json.dumps({"type": "response.create"})
-                                    )
-                                    continue
-
-                            if not target:
-                                tool_output = {
-                                    "ok": False,
-                                    "error": "missing line_number or target_number",
-                                }
-                            elif not call_sid:
-                                tool_output = {"ok": False, "error": "missing_call_sid"}
-                            else:
-                                try:
-                                    print(
-                                        f"📞 Transferring {caller_phone} to {target}...",
-                                        flush=True,
-                                    )
-
-                                    # Redirect active leg to our TwiML route
-                                    transfer_call_via_url(call_sid, target)
-
-                                    # Wait for Dial action webhook to set final status
-                                    timeout_sec = 70
-                                    poll_every = 0.5
-                                    waited = 0.0
-                                    final_status = None
-
-                                    while waited < timeout_sec:
-                                        status = get_transfer_status(call_sid)
-                                        if status and status not in (
-                                            "pending",
-                                            "queued",
-                                            "ringing",
-                                            "in-progress",
-                                            "initiated",
-                                        ):
-                                            final_status = status
-                                            break
-                                        await asyncio.sleep(poll_every)
-                                        waited += poll_every
-
-                                    if final_status in ("answered", "completed"):
-                                        print(
-                                            f"✅ Transfer successful: {final_status}",
-                                            flush=True,
-                                        )
-                                        tool_output = {
-                                            "ok": True,
-                                            "transferred_to": target,
-                                            "status": final_status,
-                                        }
-                                        transferred = True
-                                        try:
-                                            await openai_ws.close()
-                                        except Exception:
-                                            pass
-                                    elif final_status in (
-                                        "busy",
-                                        "no-answer",
-                                        "failed",
-                                    ):
-                                        print(
-                                            f"❌ Transfer failed: {final_status}",
-                                            flush=True,
-                                        )
-                                        tool_output = {
-                                            "ok": False,
-                                            "transferred_to": target,
-                                            "status": final_status,
-                                            "error": "transfer_failed",
-                                        }
-                                    else:
-                                        print(
-                                            f"⏳ Transfer timeout: {final_status}",
-                                            flush=True,
-                                        )
-                                        tool_output = {
-                                            "ok": True,
-                                            "transferred_to": target,
-                                            "status": "pending_timeout",
-                                        }
-
-                                except Exception as e:
-                                    print(f"❌ Transfer error: {e}", flush=True)
-                                    tool_output = {"ok": False, "error": str(e)}
-
-                        else:
-                            tool_output = {
-                                "ok": False,
-                                "error": f"Unknown tool {tool_name}",
-                            }
-
-                        print(f"[FUNCTION] Tool output: {tool_output}", flush=True)
-
-                        # Send function output back to OpenAI
-                        await openai_ws.send(
-                            json.dumps(
-                                {
-                                    "type": "conversation.item.create",
-                                    "item": {
-                                        "type": "function_call_output",
-                                        "call_id": cid,
-                                        "output": json.dumps(tool_output),
-                                    },
-                                }
-                            )
-                        )
+            # track start of assistant response for smart interruption
+            interruptions.on_assistant_audio(item_id, latest_media_timestamp)
 
-                        # Continue conversation if not transferred
-                        if not transferred:
-                            await openai_ws.send(
-                                json.dumps({"type": "response.create"})
-                            )
+            # a new assistant item closes out the previous one's audio with a mark
+            if not send_mark(playback.begin_audio(item_id)):
+                return False
 
-            except Exception as e:
-                print(f"Error in send_to_twilio: {e}")
-                traceback.print_exc()
+            # Realtime returns base64-encoded μ-law, which is exactly
+            # what Twilio expects: splice it into a pre-serialized frame.
+            if AUDIO_PASSTHROUGH and call.frames is not None:
+                ok = to_twilio.put_audio(call.frames.media(delta))
+            else:
+                audio_payload = base64.b64encode(base64.b64decode(delta)).decode(
+                    "utf-8"
+                )
 
-        async def send_mark(connection: WebSocket, stream_sid_val: str | None) -> bool:
-            if stream_sid_val:
-                try:
-                    await connection.send_json(
+                ok = to_twilio.put_audio(
+                    dumps(
                         {
-                            "event": "mark",
-                            "streamSid": stream_sid_val,
-                            "mark": {"name": "part"},
+                            "event": "media",
+                            "streamSid": call.stream_sid,
+                            "media": {"payload": audio_payload},
                         }
                     )
-                    mark_queue.append("part")
-                    return True
-                except Exception:
-                    return False
-            return False
-
-        await asyncio.gather(receive_from_twilio(), send_to_twilio())
+                )
+            if not ok:
+                # Twilio WS closed—stop loop
+                return False
+            latency.on_output_audio()
+            if recorder is not None:
+                recorder.assistant(delta)
+
+            # coalesced: one mark per MARK_INTERVAL_MS of audio, not per delta
+            return send_mark(playback.audio_sent(delta))
+
+        def send_mark(name: str | None) -> bool:
+            """Queue a mark if the tracker asked for one. False once Twilio is gone."""
+            if name is None:
+                return True
+            if call.frames is None:
+                return False
+            return to_twilio.put_control(call.frames.mark(name))
+
+        active_calls = gauge(ACTIVE_CALLS)
+        active_calls.inc()
+        try:
+            await asyncio.gather(
+                receive_from_twilio(),
+                send_to_twilio(),
+                pump_to_openai(),
+                pump_to_twilio(),
+            )
+        finally:
+            active_calls.dec()
+            if recorder is not None:
+                recorder.close()  # the writer thread finishes the file
+            await tools.cancel_all()
+            suppressed = inbound.frames_suppressed
+            counter(INBOUND_FRAMES, result="suppressed").inc(suppressed)
+            counter(INBOUND_FRAMES, result="forwarded").inc(
+                inbound.frames_in - suppressed
+            )
+            log.info(
+                "Bridge queue stats",
+                extra={
+                    "fields": {
+                        **{q.name: q.finish() for q in (to_twilio, to_openai)},
+                        "inbound": inbound.stats(),
+                    }
+                },
+            )